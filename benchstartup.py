@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Compare the App startup time when the yaml schema is interpreted and
+when it is loaded from the module written by compileschema()
+
+  python benchstartup.py [configyaml] [-n N]
+"""
+import sys, os, time, argparse, tempfile
+import tkyamlgui as tkyg
+
+def timestartup(N, **kwargs):
+    """Returns the startup times for N Apps created with kwargs"""
+    times = []
+    for i in range(N):
+        tstart = time.time()
+        app = tkyg.App(withdraw=True, **kwargs)
+        app.update_idletasks()
+        times.append(time.time() - tstart)
+        app.destroy()
+    return times
+
+def report(label, times):
+    print("%-12s min %8.4f s  mean %8.4f s"%(label, min(times),
+                                          sum(times)/len(times)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark App startup")
+    parser.add_argument('configyaml', nargs='?', default='default.yaml')
+    parser.add_argument('-n', type=int, default=5, help='number of runs')
+    parser.add_argument('--localconfigdir', default='')
+    args = parser.parse_args()
+
+    modfile = os.path.join(tempfile.mkdtemp(), 'compiledschema.py')
+    yamldict, sources = tkyg.loadschema(args.configyaml, args.localconfigdir)
+    tkyg.compileschema(yamldict, modfile, sources=sources,
+                       localconfigdir=args.localconfigdir)
+
+    report('interpreted', timestartup(args.n, configyaml=args.configyaml,
+                                      localconfigdir=args.localconfigdir))
+    report('compiled',    timestartup(args.n, configyaml=args.configyaml,
+                                      localconfigdir=args.localconfigdir,
+                                      compiledschema=modfile))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Replay a session recorded with tkyamlgui.sessionrecorder and report how
+long each operation takes.  With --baseline, exit with status 1 if any
+operation got slower than the baseline report.
+
+  python replaysession.py session.json [configyaml] [-n N]
+                          [--save report.json] [--baseline report.json]
+"""
+import sys, json, argparse
+import tkyamlgui as tkyg
+
+def replay(sessionfile, N, **kwargs):
+    """Returns the best replay report from N Apps created with kwargs"""
+    best = None
+    for i in range(N):
+        app = tkyg.App(withdraw=True, **kwargs)
+        report = tkyg.sessionreplayer(app, sessionfile).run()
+        app.destroy()
+        if best is None:
+            best = report
+            continue
+        for op, s in report.items():
+            if (op not in best) or (s['mean'] < best[op]['mean']):
+                best[op] = s
+    return best
+
+def printreport(report):
+    print("%-32s %6s %10s %10s"%('operation', 'count', 'mean [s]', 'max [s]'))
+    for op, s in report.items():
+        print("%-32s %6i %10.5f %10.5f"%(op, s['count'], s['mean'], s['max']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded session")
+    parser.add_argument('sessionfile')
+    parser.add_argument('configyaml', nargs='?', default=None)
+    parser.add_argument('-n', type=int, default=3, help='number of runs')
+    parser.add_argument('--localconfigdir', default='')
+    parser.add_argument('--save', default=None, help='write the report here')
+    parser.add_argument('--baseline', default=None,
+                        help='report to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args()
+
+    configyaml = args.configyaml
+    if configyaml is None:
+        with open(args.sessionfile) as f:
+            configyaml = json.load(f).get('configyaml', None) or 'default.yaml'
+
+    report = replay(args.sessionfile, args.n, configyaml=configyaml,
+                    localconfigdir=args.localconfigdir)
+    printreport(report)
+    if args.save is not None:
+        with open(args.save, 'w') as f: json.dump(report, f, indent=1)
+    if args.baseline is not None:
+        with open(args.baseline) as f: baseline = json.load(f)
+        slower = tkyg.slowerops(baseline, report, tolerance=args.tolerance)
+        for op, (base, new) in slower.items():
+            print("SLOWER: %s %.5f s -> %.5f s"%(op, base, new))
+        if len(slower)>0: sys.exit(1)
@@ -0,0 +1,958 @@
+"""
+Checks for tkyamlgui.  The ones which build widgets need a display and
+are skipped without one.
+"""
+import os, sys
+from collections import OrderedDict
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('matplotlib')
+repodir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repodir)
+import tkyamlgui as tkyg
+Tk = tkyg.Tk
+
+needsdisplay = pytest.mark.skipif(not os.environ.get('DISPLAY'),
+                                  reason='needs a display')
+
+@pytest.fixture
+def makeapp(tmp_path):
+    """Builds withdrawn Apps from a yaml string, or from default.yaml"""
+    apps = []
+    def make(schema=None, **kwargs):
+        configyaml = os.path.join(repodir, 'default.yaml')
+        if schema is not None:
+            configyaml = str(tmp_path/'schema.yaml')
+            with open(configyaml, 'w') as f: f.write(schema)
+        app = tkyg.App(configyaml=configyaml, withdraw=True, **kwargs)
+        apps.append(app)
+        return app
+    yield make
+    for app in apps: app.destroy()
+
+# -- Input files --
+def test_convertinputstr_scalars():
+    assert tkyg.convertinputstr(int, '3.0') == 3
+    assert tkyg.convertinputstr(float, '2.5') == 2.5
+    assert tkyg.convertinputstr(bool, 'true') is True
+    assert tkyg.convertinputstr(str, "'abc'") == 'abc'
+    # Values which don't convert are left as strings
+    assert tkyg.convertinputstr(int, 'abc') == 'abc'
+
+def test_convertinputstr_lists():
+    assert tkyg.convertinputstr([int, float], '1 2.5') == [1, 2.5]
+    assert tkyg.convertinputstr(tkyg.moretypes.listbox, 'a b') == ['a', 'b']
+
+def test_parseinputfile():
+    lines = ['# comment\n',
+             'incflo.int1 = 5   # trailing comment\n',
+             'no equals sign\n',
+             ' = novalue\n',
+             'incflo.list1 = 1 2 3\n']
+    assert list(tkyg.parseinputfile(lines)) == [('incflo.int1', '5'),
+                                                ('incflo.list1', '1 2 3')]
+
+@needsdisplay
+def test_loadinputfile(makeapp):
+    app = makeapp()
+    extra = app.loadinputfile(['incflo.int1 = 42\n',
+                               'incflo.list1 = 5 6.5 abc\n',
+                               'not.in.schema = 1\n'], 'AMR-Wind')
+    assert app.inputvars['input_1'].getval() == 42
+    assert app.inputvars['input_2'].getval() == [5, 6.5, 'abc']
+    assert dict(extra) == {'not.in.schema':'1'}
+
+# -- Tool tips --
+class fakeevent(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class fakeroot(object):
+    """Enough of a Tk root for the classes which only bind and schedule"""
+    def __init__(self):
+        self.bindings = {}
+        self.pending  = OrderedDict()
+        self.count    = 0
+    def bind_class(self, tag, sequence, func):
+        self.bindings[(tag, sequence)] = func
+    def after(self, ms, func):
+        self.count += 1
+        self.pending[self.count] = func
+        return self.count
+    def after_cancel(self, afterid):
+        self.pending.pop(afterid, None)
+
+class fakewidget(object):
+    def __init__(self, path):
+        self.path = path
+        self.tags = (path, 'Entry', '.', 'all')
+    def __str__(self):
+        return self.path
+    def bindtags(self, tags=None):
+        if tags is None: return self.tags
+        self.tags = tags
+
+def test_tooltipmanager():
+    root    = fakeroot()
+    manager = tkyg.ToolTipManager(root)
+    a, b    = fakewidget('.a'), fakewidget('.b')
+    manager.register(a, 'tip a')
+    manager.register(b, 'tip b')
+    manager.register(a, 'new tip a')
+    # One set of class bindings, and the tag is added to each widget once
+    assert len(root.bindings) == 4
+    assert a.bindtags() == (manager.bindtag, '.a', 'Entry', '.', 'all')
+    assert manager.tiptext == {'.a':'new tip a', '.b':'tip b'}
+    # Only one tip is waiting to show at a time
+    manager.enter(fakeevent(widget=a))
+    manager.enter(fakeevent(widget=b))
+    assert len(root.pending) == 1 and manager.widget is b
+    manager.leave()
+    assert len(root.pending) == 0 and manager.widget is None
+    manager.unregister(fakeevent(widget=a))
+    assert list(manager.tiptext) == ['.b']
+
+# -- Scrolled frames --
+class fakecanvas(object):
+    def __init__(self):
+        self.idle     = []
+        self.scrolled = []
+        self.region   = None
+    def after_idle(self, func):
+        self.idle.append(func)
+        return len(self.idle)
+    def bbox(self, tag):
+        return (0, 0, 100, 400)
+    def winfo_height(self):
+        return 200
+    def config(self, scrollregion=None):
+        self.region = scrollregion
+    def yview_scroll(self, number, what):
+        self.scrolled.append(number)
+
+def scrolledframe():
+    """A VerticalScrolledFrame on a fakecanvas, without Tk"""
+    frame = object.__new__(tkyg.VerticalScrolledFrame)
+    frame.canvas          = fakecanvas()
+    frame.extraconfigfunc = None
+    frame._configpending  = None
+    return frame
+
+def test_scrolledframe_coalesces_configure():
+    frame = scrolledframe()
+    for i in range(100): frame._on_frame_configure()
+    assert len(frame.canvas.idle) == 1
+    frame.canvas.idle[0]()
+    assert frame.canvas.region == (0, 0, 100, 400)
+    frame._on_frame_configure()
+    assert len(frame.canvas.idle) == 2
+
+def test_scrolledframe_mousewheel_dispatch():
+    a, b = scrolledframe(), scrolledframe()
+    dispatch = tkyg.VerticalScrolledFrame._dispatch_mousewheel
+    a._bind_mouse()
+    dispatch(fakeevent(num=5, delta=0))
+    b._unbind_mouse()          # Leaving b does not unbind a
+    dispatch(fakeevent(num=4, delta=0))
+    assert a.canvas.scrolled == [1, -1] and b.canvas.scrolled == []
+    a._unbind_mouse()
+    dispatch(fakeevent(num=5, delta=0))
+    assert a.canvas.scrolled == [1, -1]
+
+# -- Grid layout --
+class fakegridtk(object):
+    def __init__(self, gridsize):
+        self.gridsize = gridsize
+        self.calls    = []
+    def call(self, *args):
+        self.calls.append(args)
+        if args[:2] == ('grid', 'size'): return self.gridsize
+        if args[:2] == ('grid', 'propagate') and len(args) == 3: return 1
+    def splitlist(self, s):
+        return s.split()
+
+class fakemaster(object):
+    def __init__(self, path, gridsize='0 0'):
+        self._w = path
+        self.tk = fakegridtk(gridsize)
+
+class fakegridwidget(object):
+    def __init__(self, master):
+        self.master   = master
+        self.gridopts = None
+    def grid_configure(self, **kwargs):
+        self.gridopts = kwargs
+
+def test_gridlayout():
+    master  = fakemaster('.f', gridsize='1 2')
+    layout  = tkyg.gridlayout()
+    a, b, c = [fakegridwidget(master) for i in range(3)]
+    # Rows follow what is already gridded in master
+    assert layout.grid(a) == 2
+    assert layout.grid(b, row=5, rowspan=2) == 5
+    assert layout.grid(c, column=1) == 7
+    layout.rowconfigure(master, weight=1)
+    assert a.gridopts is None
+    layout.apply()
+    assert a.gridopts == {'row':2, 'column':0}
+    assert b.gridopts == {'row':5, 'column':0, 'rowspan':2}
+    assert c.gridopts == {'row':7, 'column':1}
+    calls = master.tk.calls
+    assert ('grid', 'propagate', '.f', 0) in calls
+    assert calls[-1] == ('grid', 'propagate', '.f', 1)
+    assert ('grid', 'rowconfigure', '.f', tuple(range(8)), '-weight', 1) in calls
+    assert len(layout.masters) == 0
+
+# -- Input specs --
+def test_inputspec_interned_per_schema():
+    yamldict = {'inputwidgets':[{'name':'a', 'inputtype':'int',
+                                 'defaultval':1}],
+                'popupwindow':{'p':{'inputwidgets':[{'name':'b'}]}}}
+    d, popupd = yamldict['inputwidgets'][0], \
+                yamldict['popupwindow']['p']['inputwidgets'][0]
+    tkyg.inputspec.internschema(yamldict)
+    try:
+        spec = tkyg.inputspec.fromdict(d)
+        assert tkyg.inputspec.fromdict(d) is spec
+        assert tkyg.inputspec.fromdict(popupd) is tkyg.inputspec.fromdict(popupd)
+        # An equal dict which isn't in the schema gets its own spec
+        other = tkyg.inputspec.fromdict(dict(d))
+        assert (other is not spec) and (other.defaultval == 1)
+    finally:
+        tkyg.inputspec.evictschema(yamldict)
+    assert tkyg.inputspec.fromdict(d) is not spec
+    with pytest.raises(AttributeError):
+        spec.label = 'changed'
+
+def test_inputwidget_has_no_dict():
+    assert not hasattr(object.__new__(tkyg.inputwidget), '__dict__')
+
+# -- Progressive startup --
+@needsdisplay
+def test_progressive_build(makeapp):
+    app = makeapp(progressive=True)
+    assert not app.buildcomplete
+    app.finishbuild()
+    assert app.buildcomplete
+    assert sorted(app.inputvars) == sorted(makeapp().inputvars)
+
+# -- Lazy toggled frames --
+LAZYSCHEMA = """
+tabs:
+  - Tab 1
+frames:
+  - name: collapsed
+    tab: Tab 1
+    title: Collapsed
+    toggled: True
+inputwidgets:
+  - name: n
+    tab: Tab 1
+    inputtype: int
+    defaultval: 1
+  - name: x
+    frame: collapsed
+    inputtype: float
+    defaultval: 2.5
+  - name: options
+    frame: collapsed
+    inputtype: listbox
+    optionlist: "['a', 'b', 'c']"
+    defaultval: ['c']
+"""
+
+def placeholder(widget, parent=None, allinputs=None):
+    """A placeholderwidget for the yaml input dict widget"""
+    return tkyg.placeholderwidget.fromspec(None,
+                                           tkyg.inputspec.fromdict(widget),
+                                           parent=parent, allframes={},
+                                           allinputs={} if allinputs is None
+                                           else allinputs)
+
+def test_findlazyframes_keeps_ctrlframes():
+    frames = [{'name':'f1', 'toggled':True},
+              {'name':'f2', 'toggled':True},
+              {'name':'f2a', 'frame':'f2'}]
+    inputs = [{'name':'b', 'inputtype':'bool', 'ctrlframe':'f2a'}]
+    assert tkyg.findlazyframes(frames) == {'f1':'f1', 'f2':'f2', 'f2a':'f2'}
+    assert tkyg.findlazyframes(frames, inputs=inputs) == \
+        {'f1':'f1', 'f2':None, 'f2a':None}
+
+def test_samevalue():
+    assert tkyg.samevalue(1.5, 1.5)
+    assert tkyg.samevalue(np.array([1, 2]), np.array([1, 2]))
+    assert not tkyg.samevalue(np.array([1, 2]), np.array([1, 3]))
+    assert not tkyg.samevalue(np.array([1, 2]), '1 2')
+
+def test_placeholder_values():
+    iw = placeholder({'name':'x', 'inputtype':'float', 'defaultval':2.5})
+    assert not hasattr(iw, '__dict__')
+    assert iw.getval() == 2.5
+    assert iw.builddefaults()['defaultval'] == 2.5
+    iw.setval(4.0)
+    assert iw.getval() == 4.0
+    assert iw.builddefaults()['defaultval'] == 4.0
+
+def test_placeholder_listbox_with_option_expression():
+    iw = placeholder({'name':'options', 'inputtype':'listbox',
+                      'optionlist':"['a', 'b', 'c']", 'defaultval':['c']})
+    assert iw.getval() == ['c']
+
+@needsdisplay
+def test_lazy_frame_expansion(makeapp):
+    app = makeapp(LAZYSCHEMA)
+    assert isinstance(app.inputvars['x'], tkyg.placeholderwidget)
+    assert not isinstance(app.inputvars['n'], tkyg.placeholderwidget)
+    app.inputvars['x'].setval(4.5)
+    app.toggledframes['collapsed'].setstate(1)
+    assert not isinstance(app.inputvars['x'], tkyg.placeholderwidget)
+    assert app.inputvars['x'].getval() == 4.5
+    assert app.inputvars['options'].getval() == ['c']
+
+# -- Compiled schemas --
+def test_compileschema(tmp_path):
+    configyaml = str(tmp_path/'schema.yaml')
+    with open(os.path.join(repodir, 'default.yaml')) as f: schema = f.read()
+    with open(configyaml, 'w') as f: f.write(schema)
+    yamldict, sources = tkyg.loadschema(configyaml)
+    outfile = str(tmp_path/'compiledschema.py')
+    tkyg.compileschema(yamldict, outfile, sources=sources)
+    compiled = tkyg.loadcompiledschema(outfile)
+    assert compiled.yamldict == tkyg.plainyaml(yamldict)
+    # The specs are built by the compiled module
+    d    = compiled.yamldict['inputwidgets'][1]
+    spec = tkyg.inputspec.fromdict(d)
+    assert spec is tkyg.inputspec.fromdict(d)
+    assert (spec.name, spec.inputtype, spec.defaultval) == \
+        (d['name'], int, d['defaultval'])
+    tkyg.inputspec.evictschema(compiled.yamldict)
+    # Not used once a source changes
+    with open(configyaml, 'a') as f: f.write('\n# changed\n')
+    assert tkyg.loadcompiledschema(outfile) is None
+
+# -- Bulk reads and writes --
+def test_tclextractval():
+    assert tkyg.tclextractval(bool, '1') is True
+    assert tkyg.tclextractval(int, '3.0') == 3
+    assert tkyg.tclextractval(float, '2.5') == 2.5
+    assert tkyg.tclextractval(str, 12) == '12'
+
+@needsdisplay
+def test_bulkgetvals_bulksetvals(makeapp):
+    app = makeapp()
+    app.finishbuild()
+    vals = tkyg.bulkgetvals(app.inputvars)
+    for name, iwidget in app.inputvars.items():
+        assert vals[name] == iwidget.getval(), name
+    tkyg.bulksetvals([(app.inputvars['input_1'], 5, False),
+                      (app.inputvars['input_2'], [2, 3.5, 'x'], False)],
+                     forcechange=True)
+    assert app.inputvars['input_1'].getval() == 5
+    assert app.inputvars['input_2'].getval() == [2, 3.5, 'x']
+
+# -- Instrumentation --
+def test_tclinstrument(tmp_path):
+    root  = Tk.Tcl()
+    instr = tkyg.tclinstrument(root)
+    try:
+        @tkyg.instrumented('setvars')
+        def setvars():
+            root.tk.call('set', 'x', 1)
+            root.tk.setvar('y', 2)
+            return root.tk.getvar('y')
+        setvars()
+        setvars()
+        stats = instr.stats()
+        assert stats['ops']['setvars']['count'] == 2
+        assert stats['ops']['setvars']['tclcalls'] == 6
+        instr.dump(str(tmp_path/'stats.json'))
+        assert os.path.exists(str(tmp_path/'stats.json'))
+    finally:
+        instr.stop()
+    assert tkyg.tclinstrument.active is None
+
+# -- Array inputs --
+ARRAYSCHEMA = """
+tabs:
+  - Tab 1
+frames:
+  - name: collapsed1
+    tab: Tab 1
+    toggled: True
+  - name: collapsed2
+    tab: Tab 1
+    toggled: True
+inputwidgets:
+  - name: heights
+    frame: collapsed1
+    inputtype: array
+    defaultval: [10, 20, 30]
+  - name: speeds
+    frame: collapsed2
+    inputtype: array
+    defaultval: [1, 2, 3]
+"""
+
+def test_convertinputstr_array_dtype():
+    val = tkyg.convertinputstr(tkyg.moretypes.array, '1, 2; 3')
+    assert val.dtype == float
+    assert val.tolist() == [1.0, 2.0, 3.0]
+    val = tkyg.convertinputstr(tkyg.moretypes.array, '1 2', {'dtype':'int'})
+    assert val.dtype.kind == 'i'
+
+def test_parsearray_formatarray():
+    arr = tkyg.parsearray('1,2;3  4\n5')
+    assert arr.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert tkyg.parsearray('').size == 0
+    assert tkyg.parsearray('1 2', dtype=int).dtype.kind == 'i'
+    assert tkyg.formatarray(np.array([1, 2, 3])) == '1 2 3'
+    assert tkyg.parsearray(tkyg.formatarray(arr)).tolist() == arr.tolist()
+    assert tkyg.exportval(arr) == tkyg.formatarray(arr)
+
+def test_hasdata():
+    assert not tkyg.hasdata('')
+    assert not tkyg.hasdata(np.array([]))
+    assert tkyg.hasdata(np.array([0.0]))
+    assert tkyg.hasdata(0)
+
+def test_placeholder_array_defaults():
+    iw = placeholder({'name':'heights', 'inputtype':'array',
+                      'defaultval':[10, 20, 30]})
+    assert iw.getval().tolist() == [10.0, 20.0, 30.0]
+    # Unchanged, the real widget is built from the yaml default
+    assert iw.builddefaults()['defaultval'] == [10, 20, 30]
+    iw.setval(np.array([4.0, 5.0]))
+    assert iw.builddefaults()['defaultval'].tolist() == [4.0, 5.0]
+
+@needsdisplay
+def test_lazy_frame_with_array(makeapp):
+    app = makeapp(ARRAYSCHEMA)
+    assert isinstance(app.inputvars['heights'], tkyg.placeholderwidget)
+    app.inputvars['speeds'].setval('4 5', strinput=True)
+    app.toggledframes['collapsed1'].setstate(1)
+    app.toggledframes['collapsed2'].setstate(1)
+    assert app.inputvars['heights'].getval().tolist() == [10.0, 20.0, 30.0]
+    assert app.inputvars['speeds'].getval().tolist() == [4.0, 5.0]
+
+# -- Table columns --
+def test_table_columns():
+    col = tkyg.tablecolumn([int, int], [[1, 2], [3, 4]])
+    assert col.shape == (2, 2) and col.dtype.kind == 'i'
+    assert tkyg.columnvalues([int, int], col) == [[1, 2], [3, 4]]
+    # As read back from a CSV file
+    assert tkyg.columnvalues([int, int], np.array(['1 2', '3 4'])) == \
+        [[1, 2], [3, 4]]
+    assert tkyg.columnvalues(bool, np.array(['True', 'false'])) == \
+        [True, False]
+    assert tkyg.columnvalues(float, np.array(['1.5', '2'])) == [1.5, 2.0]
+    # Anything else is kept as strings
+    assert tkyg.tablecolumn(str, ['a', None]).tolist() == ['a', '']
+    assert tkyg.tablecolumn(float, [1.5, 'x']).tolist() == ['1.5', 'x']
+
+# -- Table view --
+def test_numsortkey():
+    vals = ['10', 20, None, 'abc', 3.5]
+    assert sorted(vals, key=lambda v: tkyg.numsortkey(int, v)) == \
+        [3.5, '10', 20, 'abc', None]
+
+# -- Dirty tracking --
+class headlessapp(tkyg.App):
+    """
+    An App with a Tcl interpreter but no Tk, so no display, where every
+    input is a placeholderwidget
+    """
+    def __init__(self, widgets, frames=[]):
+        Tk.Tk.__init__(self, useTk=False)
+        self.yamldict  = {'frames':frames, 'inputwidgets':widgets}
+        self.inputvars = OrderedDict()
+        self.listboxpopupwindict = OrderedDict()
+        self.popup_storteddata   = OrderedDict()
+        self.exportcache  = {}
+        self.dirtytracker = tkyg.dirtytracker(fakeroot(), self.inputvars,
+                                              self.listboxpopupwindict,
+                                              self.yamldict)
+        for widget in widgets:
+            self.inputvars[widget['name']] = placeholder(widget, parent=self,
+                                                allinputs=self.inputvars)
+
+    def finishbuild(self):
+        pass
+
+def test_dirtytracker():
+    frames  = [{'name':'outer', 'tab':'Tab 1'},
+               {'name':'inner', 'frame':'outer'}]
+    widgets = [{'name':'a', 'inputtype':'int', 'defaultval':1,
+                'frame':'inner'},
+               {'name':'b', 'inputtype':'float', 'defaultval':2.0,
+                'tab':'Tab 2'}]
+    app     = headlessapp(widgets, frames)
+    tracker = app.dirtytracker
+    since   = tracker.stamp
+    app.inputvars['a'].setval(5)
+    assert tracker.dirtyinputs(since) == ['a']
+    assert tracker.dirtyframes(since) == set(['inner', 'outer'])
+    assert tracker.dirtytabs(since) == set(['Tab 1'])
+    since = tracker.stamp
+    app.inputvars['b'].setval(3.0)
+    assert tracker.dirtyinputs(since) == ['b']
+    assert tracker.dirtytabs(since) == set(['Tab 2'])
+    # Inputs which aren't the App's are not tracked
+    since = tracker.stamp
+    placeholder(widgets[0], parent=app).setval(7)
+    assert tracker.stamp == since
+    tracker.markentry('lb', 'e1')
+    assert tracker.dirtyentries('lb', since) == ['e1']
+    tracker.markentry('lb')
+    assert tracker.dirtyentries('lb', since) is None
+
+def test_incremental_export():
+    widgets = [{'name':'a', 'inputtype':'int', 'defaultval':1,
+                'outputdef':{'AMR-Wind':'x.a'}},
+               {'name':'b', 'inputtype':'str', 'defaultval':'s',
+                'outputdef':{'AMR-Wind':'x.b'}}]
+    app = headlessapp(widgets)
+    full        = lambda: app.getDictFromInputs('AMR-Wind')
+    incremental = lambda: app.getDictFromInputs('AMR-Wind', incremental=True)
+    assert incremental() == full() == {'x.a':1, 'x.b':'s'}
+    app.inputvars['a'].setval(7)
+    assert incremental() == full() == {'x.a':7, 'x.b':'s'}
+    # No data, so not active
+    app.inputvars['b'].setval('')
+    assert incremental() == full() == {'x.a':7}
+
+# -- Export cache --
+def exportvals(app):
+    return (app.inputvars['a'].getval(), np.array([0.5]))
+
+def test_contenthash():
+    a = OrderedDict([('x', 1), ('y', [1, 2])])
+    b = {'y':[1, 2], 'x':1}
+    assert tkyg.contenthash(a) == tkyg.contenthash(b)
+    assert tkyg.contenthash(a) != tkyg.contenthash({'x':2, 'y':[1, 2]})
+    assert tkyg.contenthash(np.array([1.0, 2.0])) == tkyg.contenthash([1.0, 2.0])
+
+def test_funcid():
+    class named(object):
+        def __init__(self, name): self.name = name
+        def dumpdict(self): pass
+    assert tkyg.funcid(named('a').dumpdict) != tkyg.funcid(named('b').dumpdict)
+    assert tkyg.funcid(named('a').dumpdict) == tkyg.funcid(named('a').dumpdict)
+    assert tkyg.funcid(tkyg.partial(tkyg.contenthash, 1)) != \
+           tkyg.funcid(tkyg.partial(tkyg.contenthash, 2))
+
+def test_deckcache(tmp_path):
+    cache = tkyg.deckcache(str(tmp_path/'decks'), maxbytes=200)
+    cache.put('k', OrderedDict([('a', [1, 2])]))
+    assert cache.get('k') == {'a':[1, 2]}
+    assert cache.get('nothing', 'missing') == 'missing'
+    for i in range(10): cache.put('k%i'%i, {'data':'x'*50})
+    files = [os.path.join(cache.cachedir, f) for f in os.listdir(cache.cachedir)]
+    assert 0 < len(files) < 10
+    assert sum([os.path.getsize(f) for f in files]) <= 200
+    cache.clear()
+    assert os.listdir(cache.cachedir) == []
+
+def test_statehash_and_cachedexport(tmp_path):
+    widgets = [{'name':'a', 'inputtype':'int', 'defaultval':1},
+               {'name':'v', 'inputtype':['float', 'float'],
+                'defaultval':[1.0, 2.0]}]
+    app = headlessapp(widgets)
+    app.schemahash = None
+    app.deckcache  = tkyg.deckcache(str(tmp_path))
+    start = app.statehash()
+    assert app.statehash() == start
+    app.inputvars['a'].setval(2)
+    assert app.statehash() != start
+    app.inputvars['a'].setval(1)
+    assert app.statehash() == start
+    # Only the changed input is hashed again, with the same result as
+    # hashing everything
+    app.inputvars['v'].setval([3.0, 4.0])
+    changed = app.statehash()
+    app.schemahash = None
+    assert app.statehash() == changed
+    # A hit returns the same as the miss which stored it
+    miss = app.cachedexport(exportvals, app)
+    hit  = app.cachedexport(exportvals, app)
+    assert miss == hit == [1, [0.5]]
+    app.inputvars['a'].setval(5)
+    assert app.cachedexport(exportvals, app) == [5, [0.5]]
+
+# -- Local config overlays --
+def test_loadoverlays(tmp_path, monkeypatch):
+    files = [str(tmp_path/'a.yaml'), str(tmp_path/'b.yaml')]
+    with open(files[0], 'w') as f: f.write('tabs: [A]\n')
+    with open(files[1], 'w') as f: f.write('x: {y: 1}\n')
+    cachefile = str(tmp_path/'.overlaycache.json')
+    assert tkyg.loadoverlays(files, cachefile) == [{'tabs':['A']},
+                                                   {'x':{'y':1}}]
+    assert os.path.exists(cachefile)
+    # Unchanged files come from the cache file in the next session
+    tkyg.overlaycache.clear()
+    def noparse(fname): raise AssertionError('parsed '+fname)
+    monkeypatch.setattr(tkyg, 'parseyamlfile', noparse)
+    results = tkyg.loadoverlays(files, cachefile)
+    assert results == [{'tabs':['A']}, {'x':{'y':1}}]
+    results[1]['x']['y'] = 2            # Callers get copies
+    assert tkyg.loadoverlays(files, cachefile)[1] == {'x':{'y':1}}
+    monkeypatch.undo()
+    with open(files[1], 'w') as f: f.write('x: {y: 10}\n')
+    assert tkyg.loadoverlays(files, cachefile)[1] == {'x':{'y':10}}
+
+# -- Schema reload --
+def test_diffschema():
+    old = {'inputwidgets':[{'name':'a', 'label':'A'},
+                           {'name':'b', 'label':'B'},
+                           {'name':'c', 'label':'C'}]}
+    new = {'inputwidgets':[{'name':'a', 'label':'A'},
+                           {'name':'c', 'label':'changed'},
+                           {'name':'d', 'label':'D'}]}
+    assert tkyg.diffschema(old, new, 'inputwidgets') == (['d'], ['b'], ['c'])
+    assert tkyg.diffschema(old, old, 'inputwidgets') == ([], [], [])
+    assert tkyg.diffschema(old, new, 'buttons') == ([], [], [])
+
+@needsdisplay
+def test_reloadschema(makeapp):
+    app = makeapp(LAZYSCHEMA)
+    app.inputvars['n'].setval(3)
+    app.inputvars['x'].setval(4.5)
+    unchanged = app.inputvars['n']
+    schema = LAZYSCHEMA.replace('defaultval: 2.5',
+                                'defaultval: 2.5\n    label: Changed')
+    schema += '  - name: m\n    tab: Tab 1\n    inputtype: str\n' \
+              '    defaultval: new\n'
+    with open(app.schemaargs[0], 'w') as f: f.write(schema)
+    app.reloadschema()
+    assert app.inputvars['n'] is unchanged
+    assert app.inputvars['n'].getval() == 3
+    assert app.inputvars['x'].getval() == 4.5
+    assert app.inputvars['m'].getval() == 'new'
+    assert list(app.inputvars) == ['n', 'x', 'options', 'm']
+
+# -- Search --
+def test_searchindex():
+    yamldict = {'inputwidgets':[{'name':'incflo_gravity', 'label':'Gravity'},
+                                {'name':'gravity', 'label':'g'},
+                                {'name':'density', 'label':'Fluid density',
+                                 'outputdef':{'AMR-Wind':'incflo.density'}}],
+                'popupwindow':{'p1':{'inputwidgets':[{'name':'turbine_x'}]}}}
+    index = tkyg.searchindex(yamldict)
+    names = [r['name'] for r in index.search('gravity')]
+    assert names == ['gravity', 'incflo_gravity']
+    assert [r['name'] for r in index.search('incflo.dens')] == ['density']
+    assert [r['popup'] for r in index.search('turb')] == ['p1']
+    assert [r['name'] for r in index.search('fl')] == ['density']
+    assert index.search('') == []
+    assert index.search('nothing here') == []
+    assert len(index.search('i', limit=1)) == 1
+
+# -- Computed inputs --
+def computed(exprs):
+    yamldict = {'inputwidgets':[{'name':n, 'computed':e} if e else {'name':n}
+                                for n, e in exprs]}
+    return tkyg.computedinputs(None, {}, yamldict)
+
+def test_computed_toposort():
+    c = computed([('a', None), ('c', 'b*2'), ('b', 'a+1'), ('d', 'np.pi*c')])
+    assert c.order == ['b', 'c', 'd']
+    assert c.downstream('a') == set(['b', 'c', 'd'])
+
+def test_computed_dependencies():
+    # np.pi is not a dependency on pi, comprehensions are seen through
+    c = computed([('pi', None), ('a', None), ('s', None),
+                  ('x', 'np.pi*a'), ('y', 'sum(v*s for v in [a])')])
+    assert c.deps['x'] == ['a']
+    assert sorted(c.deps['y']) == ['a', 's']
+
+def test_computed_cycle():
+    with pytest.raises(ValueError) as e:
+        computed([('a', 'c+1'), ('b', 'a+1'), ('c', 'b+1')])
+    assert 'cycle' in str(e.value)
+    with pytest.raises(ValueError):
+        computed([('a', 'a+1')])
+
+def test_computed_recompute():
+    widgets = [{'name':'d', 'inputtype':'float', 'defaultval':2.0},
+               {'name':'r', 'inputtype':'float', 'defaultval':0.0,
+                'computed':'d/2'},
+               {'name':'area', 'inputtype':'float', 'defaultval':0.0,
+                'computed':'np.pi*r**2'}]
+    app = headlessapp(widgets)
+    c   = tkyg.computedinputs(app, app.inputvars, app.yamldict)
+    c.recompute()
+    assert app.inputvars['area'].getval() == pytest.approx(np.pi)
+    app.inputvars['d'].setval(4.0)
+    c.recompute()
+    assert app.inputvars['r'].getval() == 2.0
+    assert app.inputvars['area'].getval() == pytest.approx(4*np.pi)
+
+# -- Collection sourced listboxes --
+COLLECTIONSCHEMA = """
+tabs:
+  - Tab 1
+popupwindow:
+  turbine:
+    datakeyname: turbine_name
+    loadonstart: False
+    inputwidgets:
+    - name: turbine_name
+      inputtype: str
+      defaultval: T0
+listboxpopupwindows:
+  - name: turbines
+    label: Turbines
+    tab: Tab 1
+    popupinput: turbine
+inputwidgets:
+  - name: selected
+    tab: Tab 1
+    inputtype: listbox
+    optionsource: turbines
+"""
+TURBINES = OrderedDict([('T1', {'turbine_name':'T1'}),
+                        ('T2', {'turbine_name':'T2'})])
+
+def test_listboxoptions():
+    iw = placeholder({'name':'options', 'inputtype':'listbox',
+                      'optionlist':"['a', 'b']"})
+    assert iw.listboxoptions() == ['a', 'b']
+
+def test_findlazyframes_keeps_optionsource_frames():
+    frames = [{'name':'f1', 'toggled':True}]
+    inputs = [{'name':'lb', 'frame':'f1', 'inputtype':'listbox',
+               'optionsource':'turbines'}]
+    assert tkyg.findlazyframes(frames, inputs=inputs) == {'f1':None}
+
+@needsdisplay
+def test_collection_listbox_setval(makeapp):
+    app = makeapp(COLLECTIONSCHEMA)
+    app.listboxpopupwindict['turbines'].populatefromdict(TURBINES)
+    selected = app.inputvars['selected']
+    assert selected.listboxoptions() == ['T1', 'T2']
+    selected.setval(['T2'])
+    assert selected.getval() == ['T2']
+    tkyg.bulksetvals([(selected, ['T1'], False)])
+    assert selected.getval() == ['T1']
+
+# -- Log console --
+@pytest.fixture
+def tkroot():
+    root = Tk.Tk()
+    root.withdraw()
+    yield root
+    root.destroy()
+
+@needsdisplay
+def test_logconsole_keeps_hits_on_their_lines(tkroot):
+    console = tkyg.logconsole(tkroot, maxlines=5)
+    console.write(''.join(['line %i\n'%i for i in range(4)]))
+    assert console.search('line 0') == [(1, 0, 6)]
+    assert console.search('line 3') == [(4, 0, 6)]
+    console.findnext()
+    # Two more lines push line 0 out of the buffer
+    console.write('more\nmore\n')
+    console.drain()
+    assert console.hits == [(3, 0, 6)]
+    assert console.hits == console.search('line 3')
+    console.write(''.join(['new %i\n'%i for i in range(10)]))
+    console.drain()
+    assert console.hits == [] and console.hitindex == -1
+    console.quit()
+
+# -- Plot data --
+def test_lrucache():
+    cache = tkyg.lrucache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1     # a is now the most recently used
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert ('a' in cache) and ('c' in cache) and len(cache) == 2
+    assert cache.get('b', 'missing') == 'missing'
+    cache.clear()
+    assert len(cache) == 0
+
+def test_plotdata():
+    widgets = [{'name':'a', 'inputtype':'float', 'defaultval':1.0,
+                'outputdef':{'AMR-Wind':'x.a'}},
+               {'name':'b', 'inputtype':'float', 'defaultval':2.0}]
+    app   = headlessapp(widgets)
+    app.plotcache, app.plotinputmap = tkyg.lrucache(8), {}
+    calls = []
+    def scaled(scale):
+        calls.append(scale)
+        return app.inputvars['a'].getval()*scale
+    assert app.plotdata('scaled', scaled, ['x.a'], 2) == 2.0
+    assert app.plotdata('scaled', scaled, ['x.a'], 2) == 2.0
+    app.inputvars['b'].setval(5.0)      # Not a dependency
+    assert app.plotdata('scaled', scaled, ['x.a'], 2) == 2.0
+    assert len(calls) == 1
+    app.inputvars['a'].setval(3.0)
+    assert app.plotdata('scaled', scaled, ['x.a'], 2) == 6.0
+    assert len(calls) == 2
+    with pytest.raises(ValueError):
+        app.plotdata('scaled', scaled, ['nosuch'], 2)
+
+# -- JSON-RPC server --
+def test_checkparams():
+    def setval(name, val, forcechange=False): pass
+    tkyg.checkparams(setval, ['a', 1])
+    tkyg.checkparams(setval, {'name':'a', 'val':1})
+    with pytest.raises(TypeError): tkyg.checkparams(setval, ['a'])
+    with pytest.raises(TypeError): tkyg.checkparams(setval, {'value':1})
+    with pytest.raises(TypeError): tkyg.checkparams(setval, 'a')
+
+def rpcrequest(reqid, method, *params):
+    return {'jsonrpc':'2.0', 'id':reqid, 'method':method,
+            'params':list(params)}
+
+def test_rpcserver_batches(tmp_path):
+    import json
+    app = headlessapp([{'name':'n', 'inputtype':'int', 'defaultval':3}])
+    server = tkyg.rpcserver(app, path=str(tmp_path/'rpc.sock'))
+    run = lambda request: json.loads(server.handleline(
+        json.dumps(request).encode('utf-8')))
+    try:
+        replies = run([rpcrequest(1, 'setval', 'n', 9),
+                       rpcrequest(2, 'getval', 'nosuch'),
+                       rpcrequest(3, 'getval', 'n')])
+        assert [r['error']['code'] for r in replies] == [-32001, -32000, -32001]
+        # The setval was rolled back
+        assert app.inputvars['n'].getval() == 3
+        # Batches which change nothing fail the same way
+        replies = run([rpcrequest(4, 'getval', 'n'),
+                       rpcrequest(5, 'getval', 'nosuch')])
+        assert [r['error']['code'] for r in replies] == [-32001, -32000]
+        assert run([])['error']['code'] == -32600
+        replies = run([rpcrequest(6, 'setval', 'n', 4),
+                       rpcrequest(7, 'getval', 'n')])
+        assert [r['result'] for r in replies] == [None, 4]
+    finally:
+        server.stop()
+    assert not os.path.exists(str(tmp_path/'rpc.sock'))
+
+def test_rpcclient(tmp_path):
+    import threading, time
+    app = headlessapp([{'name':'n', 'inputtype':'int', 'defaultval':3}])
+    server  = tkyg.rpcserver(app, path=str(tmp_path/'rpc.sock'))
+    results = {}
+    def client():
+        c = tkyg.rpcclient(server.address, timeout=10)
+        try:
+            c.call('setval', 'n', 5)
+            results['get'] = c.call('getval', 'n')
+            results['batch'] = c.batch([('setval', ['n', 6]),
+                                        ('getval', ['n'])])
+            try:
+                c.batch([])
+            except RuntimeError as e:
+                results['empty'] = str(e)
+        finally:
+            c.close()
+    thread = threading.Thread(target=client)
+    thread.start()
+    # Run the Tcl event loop, which gets woken up by the server
+    try:
+        while thread.is_alive():
+            app.dooneevent(Tk._tkinter.DONT_WAIT) or time.sleep(0.001)
+    finally:
+        thread.join()
+        server.stop()
+    assert results['get'] == 5
+    assert results['batch'] == [None, 6]
+    assert results['empty'].startswith('-32600')
+
+# -- Session replay --
+def test_record_replay(tmp_path):
+    widgets = [{'name':'d', 'inputtype':'float', 'defaultval':10.0},
+               {'name':'n', 'inputtype':'int', 'defaultval':1}]
+    app = headlessapp(widgets)
+    app.computed   = None
+    app.schemaargs = ('schema.yaml', '', '')
+    recorder = tkyg.sessionrecorder(app)
+    for val in [1.0, 12.0]: app.inputvars['d'].setval(val)
+    app.inputvars['n'].setval(3)
+    recorder.stop()
+    sessionfile = str(tmp_path/'session.json')
+    recorder.save(sessionfile)
+    other = headlessapp(widgets)
+    other.computed = None
+    report = tkyg.sessionreplayer(other, sessionfile).run()
+    assert other.inputvars['d'].getval() == 12.0
+    assert other.inputvars['n'].getval() == 3
+    # Typing in d is one setval, of the last value
+    assert report['input.setval']['count'] == 2
+
+def test_slowerops():
+    baseline = {'setval':{'mean':0.010}, 'dumpdict':{'mean':0.020},
+                'tiny':{'mean':1.0e-5}}
+    report   = {'setval':{'mean':0.011}, 'dumpdict':{'mean':0.030},
+                'tiny':{'mean':5.0e-4}, 'new':{'mean':1.0}}
+    slower = tkyg.slowerops(baseline, report)
+    assert list(slower.keys()) == ['dumpdict']
+    assert slower['dumpdict'] == (0.020, 0.030)
+    # Times below mintime are not compared
+    assert 'tiny' in tkyg.slowerops(baseline, report, mintime=0)
+
+# -- Workspace --
+def test_workspace_cases():
+    widgets = [{'name':'d', 'inputtype':'float', 'defaultval':10.0},
+               {'name':'heights', 'inputtype':'array',
+                'defaultval':[1, 2, 3]}]
+    app = headlessapp(widgets)
+    app.casemenu, app.linkedctrl, app.computed = None, set(), None
+    workspace = tkyg.workspace(app)
+    workspace.setdefaults()
+    vals = lambda: (app.inputvars['d'].getval(),
+                    app.inputvars['heights'].getval().tolist())
+    app.inputvars['d'].setval(5.0)
+    second = workspace.duplicate()
+    assert workspace.active == second
+    app.inputvars['heights'].setval(np.array([4.0]))
+    third = workspace.new()
+    workspace.switch(third)
+    assert vals() == (10.0, [1.0, 2.0, 3.0])
+    workspace.switch('Case 1')
+    assert vals() == (5.0, [1.0, 2.0, 3.0])
+    workspace.switch(second)
+    assert vals() == (5.0, [4.0])
+    # Inactive cases only keep what differs from the defaults
+    assert workspace.cases[third] == {}
+    workspace.delete(second)
+    assert workspace.names() == ['Case 1', third]
+
+@needsdisplay
+def test_workspace_switch_restores_widgets(makeapp):
+    app     = makeapp()
+    listbox = app.listboxpopupwindict['listboxpopup1']
+    initial = (app.inputvars['input_3'].getval(),
+               app.inputvars['input_4'].getval())
+    listbox.populatefromdict(app.yamldict['setlistboxfromdict']['listboxpopup1'])
+    entries = listbox.getitemlist()
+    app.inputvars['input_3'].setval('optionB')
+    workspace = app.workspace
+    second = workspace.new()
+    workspace.switch(second)
+    assert (app.inputvars['input_3'].getval(),
+            app.inputvars['input_4'].getval()) == initial
+    assert listbox.getitemlist() == []
+    app.inputvars['input_4'].setval('case 2')
+    workspace.switch('Case 1')
+    assert app.inputvars['input_3'].getval() == 'optionB'
+    assert app.inputvars['input_4'].getval() == initial[1]
+    assert listbox.getitemlist() == entries
+    workspace.switch(second)
+    assert app.inputvars['input_4'].getval() == 'case 2'
+
+@needsdisplay
+def test_workspace_restores_collection_listbox(makeapp):
+    app = makeapp(COLLECTIONSCHEMA)
+    app.listboxpopupwindict['turbines'].populatefromdict(TURBINES)
+    app.inputvars['selected'].setval(['T2'])
+    second = app.workspace.duplicate()
+    app.inputvars['selected'].setval(['T1'])
+    app.workspace.switch('Case 1')
+    assert app.inputvars['selected'].getval() == ['T2']
+    app.workspace.switch(second)
+    assert app.inputvars['selected'].getval() == ['T1']
@@ -21,10 +21,23 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.backend_bases import key_press_handler
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
-from functools import partial
-from collections import OrderedDict 
-import sys, os, re
+from functools import partial, wraps
+from collections import OrderedDict, deque
+import sys, os, re, time, json, csv, hashlib, heapq, ast
 from enum import Enum
+import copy, inspect, stat
+
+import socket, threading
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = ProcessPoolExecutor = None
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
 
 if sys.version_info[0] < 3:
     import Tkinter as Tk
@@ -32,12 +45,14 @@ if sys.version_info[0] < 3:
     import tkFileDialog as filedialog
     import collections as collectionsabc
     import ScrolledText as scrolledtext
+    import Queue as queue
 else:
     import tkinter as Tk
     from tkinter import ttk
     from tkinter import filedialog as filedialog
     import collections.abc as collectionsabc
     import tkinter.scrolledtext as scrolledtext
+    import queue
 
 # Load NavigationToolbar2TkAgg
 try:
@@ -66,6 +81,14 @@ except:
 # Helpful function for pulling things out of dicts
 getdictval = lambda d, key, default: default if key not in d else d[key]
 
+# Compiled code for the python expressions in the yaml file
+evalcodecache = {}
+def evalcode(expr):
+    """Returns the (cached) code object for the expression string expr"""
+    if expr not in evalcodecache:
+        evalcodecache[expr] = compile(expr, '<yaml expression>', 'eval')
+    return evalcodecache[expr]
+
 # Function to evaluate the string escapes
 escapestr  = lambda s: s.decode('string_escape') if sys.version_info[0] < 3 else bytes(s, "utf-8").decode("unicode_escape")
 
@@ -77,6 +100,7 @@ class moretypes(Enum):
     listbox        = 2
     filename       = 3
     textbox        = 4
+    array          = 5
 
 # Map some strings to types
 typemap={}
@@ -88,6 +112,29 @@ typemap['mergedboollist'] = moretypes.mergedboollist
 typemap['listbox']        = moretypes.listbox
 typemap['filename']       = moretypes.filename
 typemap['textbox']        = moretypes.textbox
+typemap['array']          = moretypes.array
+
+def parsearray(valstr, dtype=float):
+    """
+    Parses the numbers in valstr (separated by spaces, commas or
+    semicolons) into a numpy array with a single vectorized conversion
+    """
+    items = re.split(r'[,;\s]+', valstr.strip())
+    if items == ['']: return np.array([], dtype=dtype)
+    return np.array(items, dtype=float).astype(dtype)
+
+def formatarray(arr):
+    """Returns the values in arr joined by spaces"""
+    return ' '.join(np.asarray(arr).ravel().astype(str))
+
+def hasdata(val):
+    """True unless val (from getval) is empty, e.g., '' or an empty array"""
+    if isinstance(val, np.ndarray): return val.size > 0
+    return str(val) != ''
+
+def exportval(val):
+    """Returns val in the form it is written through outputdef"""
+    return formatarray(val) if isinstance(val, np.ndarray) else val
 
 def to_bool(bool_str):
     """Parse the string and return the boolean value encoded or raise an
@@ -102,6 +149,397 @@ def to_bool(bool_str):
     #if here we couldn't parse it
     raise ValueError("[%s] is not recognized as a boolean value" % bool_str)
 
+# Timer used by the instrumentation
+timer = getattr(time, 'perf_counter', time.time)
+
+def instrumented(opname):
+    """
+    Decorator which charges the Tcl calls made inside the function to
+    the operation opname when a tclinstrument is active
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            instr = tclinstrument.active
+            if instr is None: return func(*args, **kwargs)
+            instr.begin(opname)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                instr.end(opname)
+        return wrapper
+    return decorator
+
+class tclproxy(object):
+    """
+    Stands in for the Tcl interpreter of an instrumented App, timing every
+    call() and eval(), every Tcl variable read and write (the get() and
+    set() of IntVar, StringVar, ...), and every python callback run by Tcl
+    """
+    def __init__(self, tk, instr):
+        self._tk    = tk
+        self._instr = instr
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+    def timed(self, func, *args):
+        t0 = timer()
+        try:
+            return func(*args)
+        finally:
+            self._instr.record(timer()-t0)
+
+    def call(self, *args):
+        return self.timed(self._tk.call, *args)
+
+    def eval(self, script):
+        return self.timed(self._tk.eval, script)
+
+    def getvar(self, *args):
+        return self.timed(self._tk.getvar, *args)
+
+    def setvar(self, *args):
+        return self.timed(self._tk.setvar, *args)
+
+    def globalgetvar(self, *args):
+        return self.timed(self._tk.globalgetvar, *args)
+
+    def globalsetvar(self, *args):
+        return self.timed(self._tk.globalsetvar, *args)
+
+    def createcommand(self, name, func):
+        return self._tk.createcommand(name, self._instr.wrapcallback(func))
+
+class tclinstrument(object):
+    """
+    Opt-in instrumentation for App.  Counts and times the Tcl calls made
+    by each high-level operation (getval, setval, onoffctrlelem, dumpdict,
+    updateplot, ...), and runs a heartbeat with after() which records
+    main loop stalls along with the slowest callback run during each.
+    If dumpfile is given, stats() is written to it as JSON every
+    dumpinterval ms.
+    """
+    active = None
+
+    def __init__(self, root, heartbeat=100, stallthreshold=0.05,
+                 dumpfile=None, dumpinterval=10000, maxstalls=1000):
+        self.root           = root
+        self.heartbeat      = heartbeat
+        self.stallthreshold = stallthreshold
+        self.dumpfile       = dumpfile
+        self.dumpinterval   = dumpinterval
+        self.stalls         = deque(maxlen=maxstalls)
+        self.reset()
+        root.tk             = tclproxy(root.tk, self)
+        self.enabled        = True
+        tclinstrument.active = self
+        self.afterids       = {}
+        self.lastbeat       = timer()
+        self.afterids['beat'] = root.after(heartbeat, self.beat)
+        if dumpfile is not None:
+            self.afterids['dump'] = root.after(dumpinterval, self.periodicdump)
+
+    def reset(self):
+        """Clears all of the counters and stalls"""
+        self.tstart       = timer()
+        self.ops          = OrderedDict()
+        self.stack        = []
+        self.slowcallback = None
+        self.stalls.clear()
+
+    def opstats(self, opname):
+        if opname not in self.ops:
+            self.ops[opname] = {'count':0, 'time':0.0,
+                                'tclcalls':0, 'tcltime':0.0}
+        return self.ops[opname]
+
+    def begin(self, opname):
+        self.stack.append((opname, timer()))
+
+    def end(self, opname):
+        opname, t0 = self.stack.pop()
+        stats = self.opstats(opname)
+        stats['count'] += 1
+        stats['time']  += timer()-t0
+
+    def record(self, dt):
+        """Charges a Tcl call taking dt seconds to the current operation"""
+        if not self.enabled: return
+        stats = self.opstats(self.stack[-1][0] if self.stack else 'other')
+        stats['tclcalls'] += 1
+        stats['tcltime']  += dt
+
+    def wrapcallback(self, func):
+        """Wraps a python callback so the slowest one can be found"""
+        # Unwrap Tk's CallWrapper, and use the name after() gives callit
+        target = getattr(getattr(func, '__self__', None), 'func', func)
+        name   = getattr(target, '__qualname__', '')
+        if (name == '') or ('<locals>' in name):
+            name = getattr(target, '__name__', repr(target))
+        def callback(*args):
+            t0 = timer()
+            try:
+                return func(*args)
+            finally:
+                dt = timer()-t0
+                if self.enabled and ((self.slowcallback is None) or
+                                     (dt > self.slowcallback[1])):
+                    self.slowcallback = (name, dt)
+        return callback
+
+    def beat(self):
+        now   = timer()
+        stall = now - self.lastbeat - self.heartbeat/1000.0
+        if stall > self.stallthreshold:
+            culprit = self.slowcallback
+            self.stalls.append({'time':now-self.tstart, 'stall':stall,
+                                'callback':None if culprit is None else culprit[0],
+                                'callbacktime':None if culprit is None else culprit[1]})
+        self.slowcallback = None
+        self.lastbeat     = timer()
+        if self.enabled:
+            self.afterids['beat'] = self.root.after(self.heartbeat, self.beat)
+
+    def stats(self):
+        """Returns the counters and stalls as a dict"""
+        return {'uptime':timer()-self.tstart,
+                'tclcalls':sum(x['tclcalls'] for x in self.ops.values()),
+                'ops':OrderedDict((k, dict(v)) for k, v in self.ops.items()),
+                'stalls':list(self.stalls)}
+
+    def dump(self, filename=None):
+        """Writes stats() to filename (or dumpfile) as JSON"""
+        filename = self.dumpfile if filename is None else filename
+        with open(filename, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def periodicdump(self):
+        try:
+            self.dump()
+        except (IOError, OSError) as e:
+            print("Cannot write %s: %s"%(self.dumpfile, str(e)))
+        if self.enabled:
+            self.afterids['dump'] = self.root.after(self.dumpinterval,
+                                                    self.periodicdump)
+
+    def stop(self):
+        """Stops the heartbeat and recording"""
+        self.enabled = False
+        for afterid in self.afterids.values():
+            try:
+                self.root.after_cancel(afterid)
+            except Tk.TclError:
+                pass
+        if tclinstrument.active is self: tclinstrument.active = None
+
+def recorded(op):
+    """
+    Decorator for the methods which a sessionrecorder logs as operation
+    op.  Calls made while a recorded call runs are not logged.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            recorder = sessionrecorder.active
+            if (recorder is None) or (recorder.depth > 0):
+                return func(self, *args, **kwargs)
+            return recorder.call(op, func, self, args, kwargs)
+        return wrapper
+    return decorator
+
+class sessionrecorder(object):
+    """
+    Records what is done in an App as a list of events, which
+    sessionreplayer can run again.  The events are the input changes,
+    listbox selections, toggled frames, pop-up windows (new, edit,
+    Save & Close), buttons and exports.  Each event is a dict with
+      t       time since start() [s]
+      target  what it acts on: ['app'], ['input', name],
+              ['listbox', name], ['popup', id], ['frame', name] or
+              ['button', key]
+      op, args, kwargs  the method called on the target
+      dt      how long it took [s], for the calls timed here
+    """
+    active = None
+
+    def __init__(self, app):
+        self.app     = app
+        self.events  = []
+        self.depth   = 0
+        # The last setval event, whose value is read when the next event
+        # comes (setval() tells the dirtytracker before it sets the value)
+        self.pending = None
+        self.start()
+
+    def start(self):
+        self.tstart = timer()
+        self.app.dirtytracker.listeners.append(self.oninput)
+        sessionrecorder.active = self
+
+    def stop(self):
+        self.flushinput()
+        if self.oninput in self.app.dirtytracker.listeners:
+            self.app.dirtytracker.listeners.remove(self.oninput)
+        if sessionrecorder.active is self: sessionrecorder.active = None
+
+    def target(self, obj):
+        if obj is self.app:                        return ['app']
+        if isinstance(obj, listboxpopupwindows):   return ['listbox', obj.name]
+        if isinstance(obj, popupwindow):
+            return ['popup', getattr(obj, 'recordid', None)]
+        if isinstance(obj, ToggledFrame):          return ['frame', obj.framename]
+        if isinstance(obj, Tk.Button):
+            return ['button', getattr(obj, 'recordkey', None)]
+        return None
+
+    def record(self, target, op, args=[], kwargs={}, **extra):
+        """Adds an event, unless inside a recorded call, and returns it"""
+        if (self.depth > 0) or (target is None) or (None in target):
+            return None
+        self.flushinput()
+        event = {'t':timer()-self.tstart, 'target':target, 'op':op,
+                 'args':list(args), 'kwargs':dict(kwargs)}
+        event.update(extra)
+        self.events.append(event)
+        return event
+
+    def call(self, op, func, obj, args, kwargs):
+        """Runs func(obj, *args, **kwargs) and records it"""
+        extra = {}
+        if isinstance(obj, popupwindow):
+            # What was entered in the pop-up, so it can be replayed
+            extra['vals'] = OrderedDict(
+                (k, exportval(obj.temp_inputvars[k].getval()))
+                for k in obj.stored_inputvars if k in obj.temp_inputvars)
+        event = self.record(self.target(obj), op, args, kwargs, **extra)
+        if event is None: return func(obj, *args, **kwargs)
+        self.depth += 1
+        t0 = timer()
+        try:
+            result = func(obj, *args, **kwargs)
+        finally:
+            event['dt'] = timer()-t0
+            self.depth -= 1
+        if isinstance(result, popupwindow):
+            result.recordid = event['id'] = len(self.events)-1
+        return result
+
+    def oninput(self, name):
+        computed = getattr(self.app, 'computed', None)
+        if (computed is not None) and \
+           (computed.updating or (name in computed.exprs)): return
+        iwidget = self.app.inputvars.get(name, None)
+        if (iwidget is None) or iwidget.labelonly or (self.depth > 0): return
+        if (self.pending is not None) and (self.pending[1] == name):
+            # Typing into an input gives one event for the final value
+            self.pending[0]['t'] = timer()-self.tstart
+            return
+        event = self.record(['input', name], 'setval', [None],
+                            {'forcechange':True})
+        self.pending = (event, name)
+
+    def flushinput(self):
+        """Fills in the value of the last setval event"""
+        if self.pending is None: return
+        event, name = self.pending
+        self.pending = None
+        if name in self.app.inputvars:
+            event['args'] = [exportval(self.app.inputvars[name].getval())]
+
+    def save(self, filename):
+        self.flushinput()
+        configyaml = self.app.schemaargs[0]
+        with open(filename, 'w') as f:
+            json.dump({'version':1, 'configyaml':configyaml,
+                       'events':self.events}, f, indent=1,
+                      default=jsondefault)
+
+def recordedcommand(widget, command):
+    """Returns command for widget, which a sessionrecorder logs as invoke"""
+    def invoke():
+        recorder = sessionrecorder.active
+        if recorder is None: return command()
+        return recorder.call('invoke', lambda w: command(), widget, (), {})
+    return invoke
+
+def recordevent(target, op, args=[], kwargs={}):
+    """Adds an event to the active sessionrecorder, if any"""
+    recorder = sessionrecorder.active
+    if recorder is not None: recorder.record(target, op, args, kwargs)
+
+class sessionreplayer(object):
+    """
+    Runs the events from a sessionrecorder (a list, or the file it saved)
+    against app as fast as possible, and times each one, including the
+    Tk idle work it causes
+    """
+    def __init__(self, app, events):
+        if not isinstance(events, list):
+            with open(events) as f: events = json.load(f)['events']
+        self.app    = app
+        self.events = events
+        self.popups = {}
+        self.times  = []
+
+    def resolve(self, target):
+        kind = target[0]
+        if kind == 'app':     return self.app
+        if kind == 'input':   return self.app.inputvars[target[1]]
+        if kind == 'listbox': return self.app.listboxpopupwindict[target[1]]
+        if kind == 'popup':   return self.popups[target[1]]
+        if kind == 'frame':   return self.app.toggledframes[target[1]]
+        if kind == 'button':  return self.app.buttonwidgets[target[1]]
+        raise ValueError("Unknown event target %s"%repr(target))
+
+    def runevent(self, i, event):
+        obj = self.resolve(event['target'])
+        for key, val in getdictval(event, 'vals', {}).items():
+            obj.temp_inputvars[key].setval(val, forcechange=True)
+        result = getattr(obj, event['op'])(*event['args'], **event['kwargs'])
+        if 'id' in event: self.popups[event['id']] = result
+        self.app.update_idletasks()
+
+    def run(self):
+        """Replays all events, and returns report()"""
+        self.app.finishbuild()
+        self.app.update_idletasks()
+        self.times = []
+        for i, event in enumerate(self.events):
+            t0 = timer()
+            try:
+                self.runevent(i, event)
+            except Exception as e:
+                print("Event %i %s %s failed: %s"%(i, repr(event['target']),
+                                                   event['op'], repr(e)))
+            self.times.append(timer()-t0)
+        return self.report()
+
+    def report(self):
+        """Returns {operation: {count, total, mean, max}} in seconds"""
+        stats = OrderedDict()
+        for event, dt in zip(self.events, self.times):
+            op = '%s.%s'%(event['target'][0], event['op'])
+            s  = stats.setdefault(op, {'count':0, 'total':0.0, 'max':0.0})
+            s['count'] += 1
+            s['total'] += dt
+            s['max']    = max(s['max'], dt)
+        for s in stats.values(): s['mean'] = s['total']/s['count']
+        return stats
+
+def slowerops(baseline, report, tolerance=1.25, mintime=1.0e-3):
+    """
+    Returns the operations whose mean time in report is more than
+    tolerance times the one in baseline (both from sessionreplayer)
+    """
+    slower = OrderedDict()
+    for op, s in report.items():
+        if op not in baseline: continue
+        base = max(baseline[op]['mean'], mintime)
+        if s['mean'] > tolerance*base:
+            slower[op] = (baseline[op]['mean'], s['mean'])
+    return slower
+
 class ToggledFrame(Tk.Frame):
     """
     Create a toggled/expandable frame
@@ -132,20 +570,33 @@ class ToggledFrame(Tk.Frame):
 
         self.sub_frame = Tk.Frame(self.title_frame, #relief="sunken",
                                   borderwidth=1)
+        # Called once, the first time the frame is shown
+        self.onfirstshow = None
+        # The frame name in the yaml, for sessionrecorder
+        self.framename   = None
         self.toggle()
 
+    def destroy(self):
+        # title_frame (with the header and sub_frame) is a child of parent
+        self.title_frame.destroy()
+        Tk.Frame.destroy(self)
+
     def toggle(self):
+        self.setstate(self.show.get())
+
+    @recorded('setstate')
+    def setstate(self, state):
+        self.show.set(state)
         if bool(self.show.get()):
+            if self.onfirstshow is not None:
+                onfirstshow, self.onfirstshow = self.onfirstshow, None
+                onfirstshow()
             self.sub_frame.grid(row=1)
             self.toggle_button.configure(text='[hide]')
         else:
             self.sub_frame.grid_forget()
             self.toggle_button.configure(text='[show]')
 
-    def setstate(self, state):
-        self.show.set(state)
-        self.toggle()
-
 class VerticalScrolledFrame:
     """
     A vertically scrolled Frame that can be treated like any other Frame
@@ -158,12 +609,20 @@ class VerticalScrolledFrame:
     You need to provide the controller separately.
     """
     # See https://gist.github.com/novel-yet-trivial/3eddfce704db3082e38c84664fc1fdf8
+
+    # geometry attributes etc (eg pack, destroy, tkraise) are passed on
+    # to self.outer
+    outer_attr = frozenset(dir(Tk.Widget))
+    # The scrolled frame currently under the mouse pointer
+    _activeframe = None
+
     def __init__(self, master, extraconfigfunc=None, **kwargs):
         width = kwargs.pop('width', None)
         height = kwargs.pop('height', None)
         bg = kwargs.pop('bg', kwargs.pop('background', None))
         self.outer = Tk.Frame(master, **kwargs)
         self.extraconfigfunc = extraconfigfunc;
+        self._configpending  = None
 
         self.vsb = Tk.Scrollbar(self.outer, orient=Tk.VERTICAL)
         self.vsb.pack(fill=Tk.Y, side=Tk.RIGHT)
@@ -171,8 +630,9 @@ class VerticalScrolledFrame:
         self.canvas.pack(side=Tk.LEFT, fill=Tk.BOTH, expand=True)
         self.canvas['yscrollcommand'] = self.vsb.set
         # mouse scroll does not seem to work with just "bind"; You have
-        # to use "bind_all". Therefore to use multiple windows you have
-        # to bind_all in the current widget
+        # to use "bind_all".  This is done once per root, and the
+        # dispatcher sends the events to the frame under the pointer
+        self._bind_dispatcher(self.canvas._root())
         self.canvas.bind("<Enter>", self._bind_mouse)
         self.canvas.bind("<Leave>", self._unbind_mouse)
         self.vsb['command'] = self.canvas.yview
@@ -182,8 +642,6 @@ class VerticalScrolledFrame:
         self.canvas.create_window(4, 4, window=self.inner, anchor='nw')
         self.inner.bind("<Configure>", self._on_frame_configure)
 
-        self.outer_attr = set(dir(Tk.Widget))
-
     def __getattr__(self, item):
         if item in self.outer_attr:
             # geometry attributes etc (eg pack, destroy, tkraise) are passed on to self.outer
@@ -193,24 +651,44 @@ class VerticalScrolledFrame:
             return getattr(self.inner, item)
 
     def _on_frame_configure(self, event=None):
-        x1, y1, x2, y2 = self.canvas.bbox("all")
-        height = self.canvas.winfo_height()
+        # Coalesce bursts of configure events into one idle update
+        if self._configpending is None:
+            self._configpending = self.canvas.after_idle(self._update_scrollregion)
+
+    def _update_scrollregion(self):
+        self._configpending = None
         try:
+            x1, y1, x2, y2 = self.canvas.bbox("all")
+            height = self.canvas.winfo_height()
             self.canvas.config(scrollregion = (0,0, x2, max(y2, height)))
             if self.extraconfigfunc is not None:
                 self.extraconfigfunc()
         except:
             pass
 
+    @classmethod
+    def _bind_dispatcher(cls, root):
+        if getattr(root, '_scrolledframe_dispatcher', False): return
+        root.bind_all("<4>", cls._dispatch_mousewheel, add='+')
+        root.bind_all("<5>", cls._dispatch_mousewheel, add='+')
+        root.bind_all("<MouseWheel>", cls._dispatch_mousewheel, add='+')
+        root._scrolledframe_dispatcher = True
+
+    @classmethod
+    def _dispatch_mousewheel(cls, event):
+        if cls._activeframe is not None:
+            try:
+                cls._activeframe._on_mousewheel(event)
+            except Tk.TclError:
+                # The frame was destroyed while under the pointer
+                cls._activeframe = None
+
     def _bind_mouse(self, event=None):
-        self.canvas.bind_all("<4>", self._on_mousewheel)
-        self.canvas.bind_all("<5>", self._on_mousewheel)
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        VerticalScrolledFrame._activeframe = self
 
     def _unbind_mouse(self, event=None):
-        self.canvas.unbind_all("<4>")
-        self.canvas.unbind_all("<5>")
-        self.canvas.unbind_all("<MouseWheel>")
+        if VerticalScrolledFrame._activeframe is self:
+            VerticalScrolledFrame._activeframe = None
 
     def _on_mousewheel(self, event):
         """Linux uses event.num; Windows / Mac uses event.delta"""
@@ -219,6 +697,14 @@ class VerticalScrolledFrame:
         elif event.num == 5 or event.delta < 0:
             self.canvas.yview_scroll(1, "units" )
 
+    def scrollto(self, widget, margin=20):
+        """Scrolls so that widget, somewhere inside the inner frame, shows"""
+        self.canvas.update_idletasks()
+        self._update_scrollregion()
+        height = float(max(self.inner.winfo_height(), 1))
+        y = widget.winfo_rooty() - self.inner.winfo_rooty() - margin
+        self.canvas.yview_moveto(max(y, 0)/height)
+
     def __str__(self):
         return str(self.outer)
 
@@ -282,6 +768,77 @@ class Notebook(ttk.Notebook, object):
     def tab(self, key):
         return self._tab[key] #.content
 
+class gridlayout(object):
+    """
+    Plans the grid() layout for many widgets, then applies it to each
+    master in one pass with geometry propagation suspended
+    """
+    def __init__(self):
+        self.masters  = OrderedDict()  # master path -> master
+        self.requests = OrderedDict()  # master path -> [(widget, gridopts)]
+        self.rowcount = {}             # master path -> first empty row
+        self.rowopts  = {}             # master path -> rowconfigure opts
+
+    def _addmaster(self, master):
+        path = master._w
+        if path not in self.masters:
+            self.masters[path]  = master
+            self.requests[path] = []
+            # Start after anything already gridded in master
+            gridsize = master.tk.splitlist(master.tk.call('grid','size',path))
+            self.rowcount[path] = int(gridsize[1])
+        return path
+
+    def grid(self, widget, row=None, column=0, **kwargs):
+        """
+        Queue widget to be gridded in its master.  Like grid(), if row is
+        None the widget goes in the first empty row.  Returns the row.
+        """
+        path = self._addmaster(widget.master)
+        if row is None: row = self.rowcount[path]
+        row = int(row)
+        rowend = row + int(getdictval(kwargs, 'rowspan', 1))
+        self.rowcount[path] = max(self.rowcount[path], rowend)
+        kwargs['row'], kwargs['column'] = row, column
+        self.requests[path].append((widget, kwargs))
+        return row
+
+    def getnextrow(self, master):
+        """Returns the first empty row in master"""
+        return self.rowcount[self._addmaster(master)]
+
+    def rowconfigure(self, master, **kwargs):
+        """Apply rowconfigure options to all rows of master"""
+        self.rowopts[self._addmaster(master)] = kwargs
+
+    def apply(self):
+        for path, master in self.masters.items():
+            tk = master.tk
+            propagate = tk.call('grid', 'propagate', path)
+            tk.call('grid', 'propagate', path, 0)
+            for widget, kwargs in self.requests[path]:
+                widget.grid_configure(**kwargs)
+            if (path in self.rowopts) and (self.rowcount[path]>0):
+                opts = []
+                for k, v in self.rowopts[path].items(): opts += ['-'+k, v]
+                tk.call('grid', 'rowconfigure', path,
+                        tuple(range(self.rowcount[path])), *opts)
+            tk.call('grid', 'propagate', path, propagate)
+        self.masters.clear()
+        self.requests.clear()
+        self.rowcount.clear()
+        self.rowopts.clear()
+
+def gridwidget(widget, layout=None, row=None, **kwargs):
+    """
+    Grid widget right away, or queue it in layout if given.  Returns the
+    row if known.
+    """
+    if layout is not None:
+        return layout.grid(widget, row=row, **kwargs)
+    widget.grid(row=row, **kwargs)
+    return row
+
 def tkextractval(inputtype, tkvar, tkentry, optionlist=[]):
     if inputtype is bool:
         val = bool(tkvar.get())
@@ -297,98 +854,639 @@ def tkextractval(inputtype, tkvar, tkentry, optionlist=[]):
         val = str(tkentry.get())
     elif (inputtype is int):
         val = int(float(tkentry.get()))
-    else: # float 
+    else: # float
         val = float(tkentry.get())
     return val
 
+# Tcl procs which read and write many widgets in one call.  The widget
+# paths, variable names and values are passed as list arguments, so
+# nothing needs to be quoted into a script.
+bulktclprocs = r"""
+namespace eval ::tkyamlgui {}
+proc ::tkyamlgui::bulkget {items} {
+    set result {}
+    foreach {kind target} $items {
+        switch -- $kind {
+            var     { lappend result [set ::$target] }
+            entry   { lappend result [$target get] }
+            text    { lappend result [$target get 1.0 end-1c] }
+            state   { lappend result [$target cget -state] }
+            listbox {
+                set sel {}
+                foreach i [$target curselection] { lappend sel [$target get $i] }
+                lappend result $sel
+            }
+        }
+    }
+    return $result
+}
+proc ::tkyamlgui::bulkset {items force} {
+    foreach {kind target val} $items {
+        if {$kind eq "var"} { set ::$target $val; continue }
+        set state [$target cget -state]
+        set disabled [expr {$state eq "disable" || $state eq "disabled"}]
+        if {$disabled && $force} { $target configure -state normal }
+        switch -- $kind {
+            entry   { $target delete 0 end; $target insert 0 $val }
+            text    { $target delete 1.0 end; $target insert 1.0 $val }
+            listbox {
+                $target selection clear 0 end
+                foreach i $val { $target selection set $i }
+            }
+        }
+        if {$disabled && $force} { $target configure -state $state }
+    }
+}
+"""
+
+def bulktcl(inputs):
+    """
+    Returns the Tcl interpreter of the first built widget in inputs, with
+    the bulk procs defined, or None if there isn't one
+    """
+    for w in inputs:
+        if isinstance(w, placeholderwidget) or w.labelonly: continue
+        entry = w.tkentry[0] if isinstance(w.tkentry, list) else w.tkentry
+        if entry is None: continue
+        tk = entry.tk
+        if not tk.call('info', 'commands', '::tkyamlgui::bulkget'):
+            tk.eval(bulktclprocs)
+        return tk
+    return None
+
+def tclextractval(inputtype, raw):
+    """Like tkextractval(), but on a raw value returned by bulkget"""
+    if inputtype is bool:
+        val = bool(int(float(str(raw))))
+    elif (inputtype is str) or (inputtype is moretypes.textbox) or \
+         (inputtype is moretypes.filename):
+        val = str(raw)
+    elif (inputtype is int):
+        val = int(float(str(raw)))
+    else: # float
+        val = float(str(raw))
+    return val
+
+@instrumented('bulkgetvals')
+def bulkgetvals(inputs, getactive=False):
+    """
+    Reads the values of all inputwidgets in the dict inputs with a single
+    Tcl call.  Returns a dict of name: val matching getval(), and if
+    getactive is True, also a dict of name: isactive().  Placeholders
+    and labelonly inputs are read in python.
+    """
+    vals   = OrderedDict()
+    active = OrderedDict()
+    items  = []
+    plan   = []
+    tk     = bulktcl(inputs.values())
+    for name, w in inputs.items():
+        t = w.inputtype
+        if (tk is None) or w.labelonly or isinstance(w, placeholderwidget) \
+           or (t == moretypes.mergedboollist):
+            continue
+        if isinstance(t, list):
+            items += ['state', w.tkentry[0]._w]
+            for i in range(w.listN): items += ['entry', w.tkentry[i]._w]
+            n = w.listN
+        elif t is bool or ((t is str) and len(w.optionlist)>0):
+            items += ['state', w.tkentry._w, 'var', str(w.var)]
+            n = 1
+        elif (t is moretypes.textbox) or (t is moretypes.array):
+            items += ['state', w.tkentry._w, 'text', w.tkentry._w]
+            n = 1
+        elif t is moretypes.listbox:
+            items += ['state', w.tkentry._w, 'listbox', w.tkentry._w]
+            n = 1
+        else:
+            items += ['state', w.tkentry._w, 'entry', w.tkentry._w]
+            n = 1
+        plan.append((name, w, n))
+    result = []
+    if len(plan)>0:
+        try:
+            result = tk.splitlist(tk.call('::tkyamlgui::bulkget', tuple(items)))
+        except Tk.TclError:
+            plan = []
+    i = 0
+    for name, w, n in plan:
+        state, raw = str(result[i]), result[i+1:i+1+n]
+        i += 1+n
+        t = w.inputtype
+        try:
+            if isinstance(t, list):
+                val = []
+                for j, x in enumerate(raw):
+                    try:
+                        val.append(tclextractval(t[j], x))
+                    except:
+                        if not w.varlenlist:
+                            if verbose: print("Insufficient items in "+name)
+                            val = None
+                            break
+            elif t is moretypes.listbox:
+                val = list(tk.splitlist(raw[0]))
+            elif t is moretypes.array:
+                val = w.arrayval(str(raw[0]))
+            else:
+                val = tclextractval(t, raw[0])
+        except:
+            if verbose: print("getval(): Error in "+name)
+            val = None
+        vals[name] = val
+        active[name] = (state=='normal') and hasdata(val)
+    # Anything which wasn't read above
+    for name, w in inputs.items():
+        if name in vals: continue
+        if w.inputtype == moretypes.mergedboollist and not w.labelonly:
+            val = []
+            for boolvar, iftrue, iffalse in w.mergedboollist:
+                if boolvar in vals and inputs.get(boolvar) is w.allinputs[boolvar]:
+                    isset = vals[boolvar]
+                else:
+                    isset = w.allinputs[boolvar].getval()
+                val.append(iftrue if isset else iffalse)
+            val = [x for x in val if x != '']
+            vals[name] = val if len(val)>0 else None
+        else:
+            vals[name] = None if w.labelonly else w.getval()
+        if getactive: active[name] = w.isactive()
+    vals = OrderedDict((name, vals[name]) for name in inputs)
+    if getactive:
+        return vals, OrderedDict((name, active[name]) for name in inputs)
+    return vals
+
+@instrumented('bulksetvals')
+def bulksetvals(items, forcechange=False):
+    """
+    Sets the values of many inputwidgets with a single Tcl call.  items
+    is a list of (inputwidget, val, strinput) tuples.  Inputs which can't
+    be batched (placeholders, mergedboollists, and values which don't
+    convert) fall back on setval().
+    """
+    strval   = lambda v: repr(v).strip("'").strip('"')
+    tk       = bulktcl([w for w, val, strinput in items])
+    ops      = []
+    ctrl     = []
+    fallback = []
+    for w, val, strinput in items:
+        markdirty(w)
+        t = w.inputtype
+        if (tk is None) or w.labelonly or isinstance(w, placeholderwidget) \
+           or (t == moretypes.mergedboollist):
+            fallback.append((w, val, strinput))
+            continue
+        try:
+            if isinstance(t, list):
+                listval = re.split(r'[,; ]+', val) if strinput else val
+                if listval is None: continue
+                if (not w.varlenlist) and (len(listval) != len(t)):
+                    print("Insufficient number of inputs in list for "+w.name)
+                    continue
+                if w.varlenlist: w.listN = min(len(listval), len(t))
+                entries = []
+                for i, itkentry in enumerate(w.tkentry):
+                    ival = strval(listval[i]) if i < min(w.listN, len(listval)) else ''
+                    entries += ['entry', itkentry._w, ival]
+                ops += entries
+            elif t is bool:
+                boolval = to_bool(val) if strinput else val
+                ops += ['var', str(w.var), int(bool(boolval))]
+                if w.ctrlelem is not None: ctrl.append(w)
+            elif (t is str) and len(w.optionlist)>0:
+                ops += ['var', str(w.var), val.strip("'").strip('"')]
+            elif t is moretypes.textbox:
+                ops += ['text', w.tkentry._w, escapestr(val).strip("'").strip('"')]
+            elif t is moretypes.array:
+                ops += ['text', w.tkentry._w, val if strinput else formatarray(val)]
+            elif t is moretypes.listbox:
+                listval = re.split(r'[,; ]+', val) if strinput else val
+                allopts = w.listboxoptions()
+                ops += ['listbox', w.tkentry._w,
+                        tuple(allopts.index(v) for v in listval)]
+            else:
+                ops += ['entry', w.tkentry._w, strval(val)]
+        except:
+            fallback.append((w, val, strinput))
+    if len(ops)>0:
+        tk.call('::tkyamlgui::bulkset', tuple(ops), int(bool(forcechange)))
+    for w in ctrl: w.onoffctrlelem(None)
+    for w, val, strinput in fallback:
+        w.setval(val, strinput=strinput, forcechange=forcechange)
+    return
+
+def convertinputstr(inputtype, valstr, arrayopt={}):
+    """
+    Converts the string valstr read from an input file into inputtype.
+    Arrays use the dtype in arrayopt.
+    """
+    if isinstance(inputtype, list):
+        items = valstr.split()
+        Ntype = len(inputtype)
+        return [convertinputstr(inputtype[i] if i < Ntype else str, x)
+                for i, x in enumerate(items)]
+    if (inputtype is moretypes.listbox) or \
+       (inputtype is moretypes.mergedboollist):
+        return valstr.split()
+    if inputtype is moretypes.textbox:
+        return valstr
+    if inputtype is moretypes.array:
+        return parsearray(valstr, dtype=getdictval(arrayopt, 'dtype', 'float'))
+    valstr = valstr.strip("'").strip('"')
+    try:
+        if inputtype is bool:
+            return to_bool(valstr)
+        elif inputtype is int:
+            return int(float(valstr))
+        elif inputtype is float:
+            return float(valstr)
+    except ValueError:
+        # Leave it as a string and let setval() handle it
+        pass
+    return valstr
+
+def parseinputfile(inputfile, commentchar='#'):
+    """
+    Reads the key = value lines in inputfile (a filename or an
+    iterable of lines) and yields (key, valuestring) for each one
+    """
+    fp = open(inputfile) if isinstance(inputfile, str) else inputfile
+    try:
+        for line in fp:
+            line = line.partition(commentchar)[0]
+            key, eq, val = line.partition('=')
+            if not eq: continue
+            key = key.strip()
+            if not key: continue
+            yield key, val.strip()
+    finally:
+        if fp is not inputfile: fp.close()
+
+def cellstr(val):
+    """Returns val as the string stored in a table cell"""
+    if val is None: return ''
+    if isinstance(val, np.ndarray): return formatarray(val)
+    if isinstance(val, (list, tuple)): return ' '.join([str(x) for x in val])
+    return str(val)
+
+def tablecolumn(inputtype, values, varlenlist=False):
+    """
+    Converts the values of one input (one per entry) into a numpy column.
+    Scalars keep their type, fixed length numeric lists become 2D arrays,
+    and everything else is stored as strings.
+    """
+    numeric = (int, float)
+    try:
+        if inputtype is bool:
+            return np.array(values, dtype=bool)
+        if (inputtype is int) or (inputtype is float):
+            return np.array(values, dtype=inputtype)
+        if isinstance(inputtype, list) and (not varlenlist) and \
+           all([(t in numeric) for t in inputtype]):
+            dtype = int if all([t is int for t in inputtype]) else float
+            col   = np.array(values, dtype=dtype)
+            if (col.ndim == 2) and (col.shape[1] == len(inputtype)):
+                return col
+    except (ValueError, TypeError):
+        pass
+    return np.array([cellstr(v) for v in values], dtype=str)
+
+def columnvalues(inputtype, col, varlenlist=False):
+    """
+    Converts a numpy column (from tablecolumn() or read as strings) back
+    into a list of values of inputtype
+    """
+    col = np.asarray(col)
+    if col.dtype.kind in 'biuf': return col.tolist()
+    try:
+        if inputtype is bool:
+            return np.isin(np.char.lower(np.char.strip(col)),
+                           ['true', 't', '1']).tolist()
+        if inputtype is int:
+            return col.astype(float).astype(int).tolist()
+        if inputtype is float:
+            return col.astype(float).tolist()
+        if isinstance(inputtype, list) and (not varlenlist) and \
+           all([(t is int) or (t is float) for t in inputtype]):
+            dtype = int if all([t is int for t in inputtype]) else float
+            return np.array([x.split() for x in col.tolist()],
+                            dtype=float).astype(dtype).tolist()
+    except ValueError:
+        pass
+    if (inputtype is str) or (inputtype is moretypes.filename) or \
+       (inputtype is moretypes.textbox):
+        return col.tolist()
+    return [convertinputstr(inputtype, x) for x in col.tolist()]
+
+def getinputtype(d):
+    """
+    Returns the input type(s) for the yaml input dict d
+    """
+    yamlinputtype = getdictval(d, 'inputtype', 'str')
+    if isinstance(yamlinputtype, list):
+        return [typemap[x.lower()] for x in yamlinputtype]
+    else:
+        return typemap[yamlinputtype.lower()]
+
 class ToolTip(object):
     """
-    Creates a mouse-over tool tip show additional context
+    Creates a mouse-over tool tip show additional context.  Kept for
+    older code: the tip is shown by the shared ToolTipManager of the root
     """
-    # See https://stackoverflow.com/questions/20399243/display-message-when-hovering-over-something-with-mouse-cursor-in-python
     def __init__(self, widget):
-        self.widget = widget
-        self.tipwindow = None
-        self.id = None
-        self.x = self.y = 0
+        self.widget  = widget
+        self.manager = gettooltipmanager(widget)
+        self.text    = None
 
     def showtip(self, text):
         "Display text in tooltip window"
         self.text = text
-        if self.tipwindow or not self.text:
-            return
-        x, y, cx, cy = self.widget.bbox("insert")
-        x = x + self.widget.winfo_rootx() + 57
-        y = y + cy + self.widget.winfo_rooty() +27
-        self.tipwindow = tw = Tk.Toplevel(self.widget)
-        tw.wm_overrideredirect(1)
-        tw.wm_geometry("+%d+%d" % (x, y))
-        label = Tk.Label(tw, text=self.text, justify=Tk.LEFT,
-                         background="#ffffe0", relief=Tk.SOLID, borderwidth=1,
-                         font=("tahoma", "8", "normal"))
-        label.pack(ipadx=1)
+        if not self.text: return
+        self.manager.register(self.widget, text)
+        self.manager.cancel()
+        self.manager.widget = self.widget
+        self.manager.showtip()
 
     def hidetip(self):
-        tw = self.tipwindow
+        if self.manager.widget is self.widget: self.manager.leave()
+
+class ToolTipManager(object):
+    """
+    Shows the tool tips for all registered widgets in one shared window
+    """
+    bindtag = 'tkyamlguiToolTip'
+
+    def __init__(self, root, delay=400):
+        self.root      = root
+        self.delay     = delay
+        self.tiptext   = {}
         self.tipwindow = None
-        if tw:
-            tw.destroy()
+        self.label     = None
+        self.widget    = None
+        self.afterid   = None
+        # One set of bindings shared by all registered widgets
+        root.bind_class(self.bindtag, '<Enter>',       self.enter)
+        root.bind_class(self.bindtag, '<Leave>',       self.leave)
+        root.bind_class(self.bindtag, '<ButtonPress>', self.leave)
+        root.bind_class(self.bindtag, '<Destroy>',     self.unregister)
+
+    def register(self, widget, text):
+        """Set text as the tool tip for widget"""
+        key = str(widget)
+        if key not in self.tiptext:
+            widget.bindtags((self.bindtag,)+widget.bindtags())
+        self.tiptext[key] = text
+
+    def unregister(self, event):
+        if event.widget is self.widget: self.leave()
+        self.tiptext.pop(str(event.widget), None)
+
+    def enter(self, event):
+        self.cancel()
+        self.widget  = event.widget
+        self.afterid = self.root.after(self.delay, self.showtip)
+
+    def leave(self, event=None):
+        self.cancel()
+        self.widget = None
+        if self.tipwindow is not None: self.tipwindow.withdraw()
+
+    def cancel(self):
+        if self.afterid is not None:
+            self.root.after_cancel(self.afterid)
+            self.afterid = None
+
+    def showtip(self):
+        "Display text in tooltip window"
+        self.afterid = None
+        widget = self.widget
+        text   = None if widget is None else self.tiptext.get(str(widget))
+        if not text: return
+        if self.tipwindow is None:
+            self.tipwindow = tw = Tk.Toplevel(self.root)
+            tw.withdraw()
+            tw.wm_overrideredirect(1)
+            self.label = Tk.Label(tw, justify=Tk.LEFT,
+                                  background="#ffffe0", relief=Tk.SOLID,
+                                  borderwidth=1,
+                                  font=("tahoma", "8", "normal"))
+            self.label.pack(ipadx=1)
+        x = widget.winfo_rootx() + 57
+        y = widget.winfo_rooty() + 27
+        self.label.configure(text=text)
+        self.tipwindow.wm_geometry("+%d+%d" % (x, y))
+        self.tipwindow.deiconify()
+        self.tipwindow.lift()
+
+def gettooltipmanager(widget):
+    """Returns the ToolTipManager of the root of widget"""
+    root = widget._root()
+    if getattr(root, 'tooltipmanager', None) is None:
+        root.tooltipmanager = ToolTipManager(root)
+    return root.tooltipmanager
 
 def CreateToolTip(widget, text):
     """
-    Binds a ToolTip to widget with text
+    Registers text as the tool tip for widget with the root ToolTipManager
+    """
+    gettooltipmanager(widget).register(widget, text)
+
+def schemainputs(yamldict):
+    """Returns every input dict in yamldict, including the pop-up ones"""
+    inputs = list(getdictval(yamldict, 'inputwidgets', []))
+    for key, popup in getdictval(yamldict, 'popupwindow', {}).items():
+        inputs += getdictval(popup, 'inputwidgets', [])
+    return inputs
+
+class inputspec(object):
+    """
+    Immutable description of an input widget, parsed once from the yaml
+    input dict and shared by every inputwidget built from it.  Treat the
+    dict and list attributes as read-only.
     """
-    toolTip = ToolTip(widget)
-    def enter(event):
-        toolTip.showtip(text)
-    def leave(event):
-        toolTip.hidetip()
-    widget.bind('<Enter>', enter)
-    widget.bind('<Leave>', leave)
+    __slots__ = ('name', 'row', 'inputtype', 'label', 'defaultval',
+                 'optionlist', 'listboxopt', 'fileopenopt', 'ctrlframe',
+                 'ctrlelem', 'labelonly', 'visible', 'entryopt',
+                 'varlenlist', 'outputdef', 'mergedboollist', 'arrayopt')
+
+    # id(yaml dict) -> (yaml dict, inputspec), filled by internschema()
+    _interned = {}
+
+    def __init__(self, name, row=None, inputtype=str, label='',
+                 defaultval=None, optionlist=[],
+                 listboxopt={}, fileopenopt={},
+                 ctrlframe=None, ctrlelem=None,
+                 labelonly=False, visible=True, entryopt={},
+                 outputdef={}, mergedboollist=[], arrayopt={}, defaultw=12):
+        # Keep our own copies so the yaml dicts are never modified
+        entryopt = dict(entryopt)
+        if 'width' not in entryopt:  entryopt['width'] = defaultw
+        varlenlist = entryopt.pop('varlenlist', False)
+        setattr_ = super(inputspec, self).__setattr__
+        setattr_('name',           name)
+        setattr_('row',            row)
+        setattr_('inputtype',      inputtype)
+        setattr_('label',          label)
+        setattr_('defaultval',     defaultval)
+        setattr_('optionlist',     optionlist)
+        setattr_('listboxopt',     dict(listboxopt))
+        setattr_('fileopenopt',    dict(fileopenopt))
+        setattr_('ctrlframe',      ctrlframe)
+        setattr_('ctrlelem',       None if ctrlelem is None else
+                                   tuple(dict(x) for x in ctrlelem))
+        setattr_('labelonly',      labelonly)
+        setattr_('visible',        visible)
+        setattr_('entryopt',       entryopt)
+        setattr_('varlenlist',     varlenlist)
+        setattr_('outputdef',      dict(outputdef))
+        setattr_('mergedboollist', tuple(tuple(x) for x in mergedboollist))
+        setattr_('arrayopt',       dict(arrayopt))
+
+    def __setattr__(self, key, val):
+        raise AttributeError("inputspec is immutable")
+
+    @staticmethod
+    def parsedict(d):
+        """Returns the inputspec arguments from the yaml input dict d"""
+        return dict(name       = d['name'],
+                    row        = getdictval(d, 'row',        None),
+                    inputtype  = getinputtype(d),
+                    label      = getdictval(d, 'label',      ''),
+                    defaultval = getdictval(d, 'defaultval', None),
+                    optionlist = getdictval(d, 'optionlist', []),
+                    listboxopt = getdictval(d, 'listboxopt', {}),
+                    fileopenopt= getdictval(d, 'fileopenopt', {}),
+                    ctrlframe  = getdictval(d, 'ctrlframe',  None),
+                    ctrlelem   = getdictval(d, 'ctrlelem',   None),
+                    labelonly  = getdictval(d, 'labelonly',  False),
+                    visible    = getdictval(d, 'visible',    True),
+                    entryopt   = getdictval(d, 'entryopt',   {}),
+                    outputdef  = getdictval(d, 'outputdef',  {}),
+                    mergedboollist = getdictval(d, 'mergedboollist', []),
+                    arrayopt   = getdictval(d, 'arrayopt',   {}))
+
+    @classmethod
+    def fromdict(cls, d):
+        """
+        Returns the inputspec for the yaml input dict d, the interned one
+        if d is part of an interned schema
+        """
+        entry = cls._interned.get(id(d))
+        if (entry is not None) and (entry[0] is d): return entry[1]
+        return cls(**cls.parsedict(d))
+
+    @classmethod
+    def intern(cls, d, spec):
+        """Use spec for the yaml input dict d"""
+        # Hold on to d so its id is not reused while it is interned
+        cls._interned[id(d)] = (d, spec)
+        return spec
+
+    @classmethod
+    def internschema(cls, yamldict):
+        """Parses every input dict of yamldict once"""
+        for d in schemainputs(yamldict):
+            if id(d) not in cls._interned:
+                cls.intern(d, cls(**cls.parsedict(d)))
+
+    @classmethod
+    def evictschema(cls, yamldict):
+        """Drops the specs of the input dicts of yamldict"""
+        for d in schemainputs(yamldict):
+            entry = cls._interned.get(id(d))
+            if (entry is not None) and (entry[0] is d): del cls._interned[id(d)]
+
+    @classmethod
+    def clearcache(cls):
+        cls._interned.clear()
+
+# Marks arguments which should fall back to the inputspec value
+_fromspec = object()
 
-class inputwidget:
+def _specproperty(key):
+    return property(lambda self: getattr(self.spec, key),
+                    doc="Read-only %s from the shared inputspec"%key)
+
+class inputwidget(object):
     """
     Creates a general-purpose widget for input 
     """
+    # Everything from the yaml definition lives in the shared self.spec,
+    # only the Tk handles and current state are kept per instance.
+    # Subclasses which need more attributes declare their own __slots__.
+    __slots__ = ('spec', 'parent', 'allinputs', 'defaultval', 'optionlist',
+                 'ctrlframe', 'ctrlelem', 'var', 'tkentry', 'tklabel',
+                 'yscroll', 'button', 'listN', 'collection')
+
+    name           = _specproperty('name')
+    label          = _specproperty('label')
+    labelonly      = _specproperty('labelonly')
+    inputtype      = _specproperty('inputtype')
+    listboxopt     = _specproperty('listboxopt')
+    visible        = _specproperty('visible')
+    outputdef      = _specproperty('outputdef')
+    mergedboollist = _specproperty('mergedboollist')
+    entryopt       = _specproperty('entryopt')
+    varlenlist     = _specproperty('varlenlist')
+    arrayopt       = _specproperty('arrayopt')
+
     def __init__(self, frame, row, inputtype, name, label,
                  parent=None,
                  defaultval=None, optionlist=[], 
                  listboxopt={},  fileopenopt={},
                  ctrlframe=None, ctrlelem=None,
                  labelonly=False, visible=True, entryopt={},
-                 outputdef={}, mergedboollist=[], allinputs=None):
-        defaultw       = 12
-        self.name      = name
-        self.label     = label
+                 outputdef={}, mergedboollist=[], arrayopt={}, allinputs=None,
+                 layout=None):
+        spec = inputspec(name, row=row, inputtype=inputtype, label=label,
+                         defaultval=defaultval, optionlist=optionlist,
+                         listboxopt=listboxopt, fileopenopt=fileopenopt,
+                         ctrlelem=ctrlelem, labelonly=labelonly,
+                         visible=visible, entryopt=entryopt,
+                         outputdef=outputdef, mergedboollist=mergedboollist,
+                         arrayopt=arrayopt)
+        self.build(frame, spec, parent=parent, ctrlframe=ctrlframe,
+                   allinputs=allinputs, layout=layout)
+
+    def setup(self, spec, parent, ctrlframe, allinputs, defaultval,
+              optionlist):
+        """Initializes the per-instance state"""
+        self.spec      = spec
         self.parent    = parent
-        self.labelonly = labelonly
-        self.inputtype = inputtype
-        self.var       = None
-        self.defaultval= defaultval
-        self.optionlist= optionlist
-        self.listboxopt= listboxopt
+        self.allinputs = allinputs
         self.ctrlframe = ctrlframe
-        self.ctrlelem  = ctrlelem
-        self.visible   = visible
-        self.outputdef = outputdef
-        self.mergedboollist = mergedboollist
+        self.ctrlelem  = spec.ctrlelem
+        self.var       = None
+        self.tkentry   = None
+        self.tklabel   = None
+        self.yscroll   = None
         self.button    = None
-        self.allinputs = allinputs
+        self.listN     = 0
+        self.collection= None
+        self.defaultval= spec.defaultval if defaultval is _fromspec else defaultval
+        self.optionlist= spec.optionlist if optionlist is _fromspec else optionlist
+
+    def build(self, frame, spec, parent=None, ctrlframe=None, allinputs=None,
+              layout=None, defaultval=_fromspec, optionlist=_fromspec):
+        """
+        Creates the Tk widgets for spec in frame.  defaultval and
+        optionlist override the values in spec if given.
+        """
+        self.setup(spec, parent, ctrlframe, allinputs, defaultval, optionlist)
+        defaultval     = self.defaultval
+        optionlist     = self.optionlist
+        inputtype      = spec.inputtype
+        visible        = spec.visible
+        labelonly      = spec.labelonly
+        row            = spec.row
         if visible:
-            self.tklabel   = Tk.Label(frame, text=label) 
-        else:
-            self.tklabel   = None
-        if 'width' not in entryopt:  entryopt['width'] = defaultw
-        self.entryopt  = entryopt
+            self.tklabel   = Tk.Label(frame, text=spec.label) 
         if inputtype == moretypes.mergedboollist: return
 
         if visible:
             cspan=3 if labelonly else 1
-            if row is None:  
-                self.tklabel.grid(column=0, columnspan=cspan,sticky='nw',padx=5)
-            else:            
-                self.tklabel.grid(row=row, columnspan=cspan,
-                                  column=0, sticky='nw', padx=5)
+            row = gridwidget(self.tklabel, layout, row=row, columnspan=cspan,
+                             column=0, sticky='nw', padx=5)
             if 'help' in self.outputdef:
                 CreateToolTip(self.tklabel, text=self.outputdef['help'])
 
@@ -404,12 +1502,14 @@ class inputwidget:
                 self.tkentry   = Tk.Checkbutton(frame, variable=self.var, 
                                                 command=partial(self.onoffctrlelem, None))
         elif (inputtype is moretypes.listbox):
-            allopts = eval(optionlist) if isinstance(optionlist,str) else optionlist
-            height=max(3,len(allopts))
-            if 'height' not in listboxopt: listboxopt['height'] = height
+            allopts = eval(evalcode(optionlist)) if isinstance(optionlist,str) else optionlist
+            listboxopt = spec.listboxopt
+            if 'height' not in listboxopt:
+                listboxopt = dict(listboxopt, height=max(3,len(allopts)))
             self.yscroll   = Tk.Scrollbar(frame, orient=Tk.VERTICAL)
             if visible and (row is None): row=self.tklabel.grid_info()['row']
-            if visible: self.yscroll.grid(row=row, column=2, sticky=Tk.NW+Tk.S)
+            if visible: gridwidget(self.yscroll, layout, row=row, column=2,
+                                   sticky=Tk.NW+Tk.S)
             self.tkentry   = Tk.Listbox(frame, #height=height,
                                         exportselection=False,
                                         yscrollcommand=self.yscroll.set, 
@@ -423,14 +1523,14 @@ class inputwidget:
                 if not isinstance(defaultval, list): defaultval = [defaultval]
                 for v in defaultval:
                     # set the value to active
-                    if v in self.optionlist:
-                        self.tkentry.selection_set(self.optionlist.index(v))
+                    if v in allopts:
+                        self.tkentry.selection_set(allopts.index(v))
             if self.ctrlelem is not None:
                 self.tkentry.bind("<<ListboxSelect>>", self.onoffctrlelem)
         elif (inputtype is str) and (len(optionlist)>0):
             # create a dropdown menu
             self.var       = Tk.StringVar()
-            optlist = eval(optionlist) if isinstance(optionlist,str) else optionlist
+            optlist = eval(evalcode(optionlist)) if isinstance(optionlist,str) else optionlist
             if len(optlist)==0: optlist=['']
             self.tkentry   = Tk.OptionMenu(frame, self.var, *optlist)
             #self.tkentry.config(**self.entryopt)
@@ -441,6 +1541,14 @@ class inputwidget:
                                                        **self.entryopt)
             formattedval = escapestr(defaultval)
             self.tkentry.insert('1.0', formattedval.strip("'").strip('"'))
+        elif (inputtype is moretypes.array):
+            # All of the values go in one text box
+            self.tkentry   = scrolledtext.ScrolledText(master=frame,
+                                                       **dict({'height':3,
+                                                               'wrap':'word'},
+                                                              **self.entryopt))
+            if defaultval is not None:
+                self.tkentry.insert('1.0', formatarray(defaultval))
         elif (inputtype is str):
             self.var       = Tk.StringVar()
             self.tkentry   = Tk.Entry(master=frame, **self.entryopt) 
@@ -454,7 +1562,7 @@ class inputwidget:
             self.button    = Tk.Button(master=frame, 
                                        text="Choose file", 
                                        command=partial(self.choosefile, 
-                                                       fileopenopt))
+                                                       spec.fileopenopt))
         elif (isinstance(inputtype, list)):
             # Handle list inputs
             N              = len(inputtype)
@@ -462,8 +1570,6 @@ class inputwidget:
             self.tkentry   = []
             #varlistlength
             self.listN     = N if defaultval is None else len(defaultval)
-            self.varlenlist= entryopt.pop('varlenlist', False)
-            #self.varlenlist= getdictval(entryopt, 'varlenlist', False)
             for i in range(N):
                 self.var.append(None)
                 self.tkentry.append(Tk.Entry(master=frame, **self.entryopt))
@@ -478,14 +1584,16 @@ class inputwidget:
             if row is None: row=self.tklabel.grid_info()['row']
             if (isinstance(inputtype, list)):
                 for i in range(len(inputtype)):
-                    self.tkentry[i].grid(row=row, column=1+i, sticky='w')
+                    gridwidget(self.tkentry[i], layout, row=row, column=1+i,
+                               sticky='w')
             else:
-                self.tkentry.grid(row=row, column=1, sticky='w')
+                gridwidget(self.tkentry, layout, row=row, column=1, sticky='w')
             if self.button is not None: 
-                self.button.grid(row=row, column=2, sticky='nw')
+                gridwidget(self.button, layout, row=row, column=2, sticky='nw')
 
         return
 
+    @instrumented('getval')
     def getval(self):
         """Return the value"""
         try:
@@ -505,6 +1613,8 @@ class inputwidget:
                             val = None
                         else:
                             continue
+            elif (self.inputtype is moretypes.array):
+                val = self.arrayval(self.tkentry.get('1.0', 'end-1c'))
             elif (self.inputtype == moretypes.mergedboollist):
                 val = []
                 for var in self.mergedboollist:
@@ -527,8 +1637,26 @@ class inputwidget:
             val = None
         return val
 
+    def arrayval(self, valstr):
+        """
+        Parses valstr into the array value, checking the length against
+        arrayopt['length'] unless varlenlist is set
+        """
+        val    = parsearray(valstr, dtype=getdictval(self.arrayopt, 'dtype',
+                                                     'float'))
+        length = getdictval(self.arrayopt, 'length', None)
+        if (length is not None) and (len(val) != length):
+            if self.varlenlist:
+                val = val[:length]
+            else:
+                raise ValueError("%s needs %i values, got %i"%(self.name,
+                                                              length, len(val)))
+        return val
+
+    @instrumented('setval')
     def setval(self, val, strinput=False, forcechange=False):
         """Update the contents with val"""
+        markdirty(self)
         if (isinstance(self.inputtype, list)):
             listval=val
             if strinput: listval = re.split(r'[,; ]+', val)
@@ -581,13 +1709,16 @@ class inputwidget:
             elif (self.inputtype is moretypes.textbox):
                 self.tkentry.delete('1.0', 'end')
                 self.tkentry.insert('1.0', escapestr(val).strip("'").strip('"'))
+            elif (self.inputtype is moretypes.array):
+                self.tkentry.delete('1.0', 'end')
+                self.tkentry.insert('1.0', val if strinput else formatarray(val))
             elif self.inputtype==moretypes.listbox:
                 listval = val
                 if strinput: listval = re.split(r'[,; ]+', val)
                 self.tkentry.selection_clear(0, Tk.END)
+                allopts = self.listboxoptions()
                 for v in listval:
                     # set the value to active
-                    allopts = eval(self.optionlist) if isinstance(self.optionlist,str) else self.optionlist
                     self.tkentry.selection_set(allopts.index(v))
             elif self.inputtype==moretypes.mergedboollist:
                 allboolstrs=[item for sublist in self.mergedboollist for item in sublist[1:]]
@@ -631,10 +1762,10 @@ class inputwidget:
         else:  
             state = self.tkentry.cget('state')
         isnormalstate = (state=='normal')
-        hasdata       = False
+        valhasdata    = False
         if isnormalstate: 
-            hasdata = (str(self.getval())!='')
-        return (isnormalstate and hasdata)
+            valhasdata = hasdata(self.getval())
+        return (isnormalstate and valhasdata)
 
     def choosefile(self, optiondict):
         #filewin = Tk.Toplevel()   
@@ -656,6 +1787,7 @@ class inputwidget:
                                                **kwargs)
         self.tkentry.delete(0, Tk.END)
         self.tkentry.insert(0, filename)
+        markdirty(self)
         return filename
 
     def refresh_listbox(self, refreshlist):
@@ -666,12 +1798,64 @@ class inputwidget:
             print("refresh_listbox ERROR: %s is not listbox"%self.name)
             return
         
-        # Delete and repopulate it
+        # Delete and repopulate it, keeping the selected options
+        selected = [self.tkentry.get(i) for i in self.tkentry.curselection()]
         self.tkentry.delete(0, Tk.END)
+        if len(refreshlist)>0: self.tkentry.insert(Tk.END, *refreshlist)
         for i, option in enumerate(refreshlist):
-                self.tkentry.insert(i+1, option)
+            if option in selected: self.tkentry.selection_set(i)
         return
 
+    def listboxoptions(self):
+        """
+        Returns the options of a listbox input, the entry names of the
+        linked collection if there is one
+        """
+        if self.collection is not None:
+            return self.collection.getitemlist()
+        if isinstance(self.optionlist, str):
+            return eval(evalcode(self.optionlist))
+        return self.optionlist
+
+    def linkcollection(self, collection):
+        """
+        Keeps the listbox options the same as the entry names of
+        collection, a listboxpopupwindows
+        """
+        if self.inputtype != moretypes.listbox:
+            print("linkcollection ERROR: %s is not listbox"%self.name)
+            return
+        if self.collection is collection: return
+        if self.collection is not None:
+            self.collection.unsubscribe(self.collectionchanged)
+        self.collection = collection
+        collection.subscribe(self.collectionchanged)
+        self.collectionchanged('reset', collection.getitemlist())
+
+    def collectionchanged(self, event, *args):
+        """
+        Applies an insert, delete, rename or reset event from the linked
+        collection without touching the other options or the selection
+        """
+        prevstate = self.tkentry.cget('state')
+        self.tkentry.config(state='normal')
+        if event == 'insert':
+            index, name = args
+            self.tkentry.insert(index, name)
+        elif event == 'delete':
+            index, name = args
+            self.tkentry.delete(index)
+        elif event == 'rename':
+            index, oldname, newname = args
+            selected = self.tkentry.selection_includes(index)
+            self.tkentry.delete(index)
+            self.tkentry.insert(index, newname)
+            if selected: self.tkentry.selection_set(index)
+        elif event == 'reset':
+            self.refresh_listbox(args[0])
+        self.tkentry.config(state=prevstate)
+        markdirty(self)
+
 
     # DELETE THIS!  OBSOLETE!
     def onoffframe(self):
@@ -683,8 +1867,15 @@ class inputwidget:
                 child.configure(state='disable')
         return
 
+    @instrumented('onoffctrlelem')
     def onoffctrlelem(self, event):
         currstate = self.getval()
+        # The active state of the controlled inputs may change
+        tracker = getattr(self.parent, 'dirtytracker', None)
+        if tracker is not None:
+            for elem in self.ctrlelem:
+                if 'frame' in elem: tracker.markframe(elem['frame'])
+                if 'input' in elem: tracker.markinput(elem['input'])
         # Handle the bool option first
         if self.inputtype is bool:
             for ielem, elem in enumerate(self.ctrlelem):
@@ -771,55 +1962,158 @@ class inputwidget:
         """
         Link the ctrl elements to the frames/inputs to control
         """
-        for ielem, elem in enumerate(self.ctrlelem):
+        # Link copies so the shared spec.ctrlelem is left untouched
+        linked = []
+        for ielem, elem in enumerate(self.spec.ctrlelem):
             #print(self.name)
             # Attach it to the right thing
+            elem = dict(elem)
             if 'frame' in elem:
-                self.ctrlelem[ielem]['ctrlframe'] = allframes[elem['frame']]
-                self.ctrlelem[ielem]['ctrlinput'] = None
+                elem['ctrlframe'] = allframes[elem['frame']]
+                elem['ctrlinput'] = None
             elif 'input' in elem:
-                self.ctrlelem[ielem]['ctrlframe'] = None
-                self.ctrlelem[ielem]['ctrlinput'] = allinputs[elem['input']]
+                elem['ctrlframe'] = None
+                elem['ctrlinput'] = allinputs[elem['input']]
             else:
                 print("Invalid ctrlelem specification in "+self.name)
+            linked.append(elem)
+        self.ctrlelem = linked
         return
     
     @classmethod
-    def fromdict(cls, frame, d, parent=None, allframes=None, allinputs=None): 
-        # Parse the dict
-        name       = d['name']
-        row        = getdictval(d, 'row',        None)
-        label      = getdictval(d, 'label',      '')
-        defaultval = getdictval(d, 'defaultval', None)
-        optionlist = getdictval(d, 'optionlist', [])
-        labelonly  = getdictval(d, 'labelonly',  False)
-        visible    = getdictval(d, 'visible',    True)
+    def fromdict(cls, frame, d, parent=None, allframes=None, allinputs=None,
+                 layout=None): 
+        return cls.fromspec(frame, inputspec.fromdict(d), parent=parent,
+                            allframes=allframes, allinputs=allinputs,
+                            layout=layout)
+
+    @classmethod
+    def fromspec(cls, frame, spec, parent=None, allframes=None,
+                 allinputs=None, layout=None, defaultval=_fromspec,
+                 optionlist=_fromspec):
         # Set the control frame (for booleans)
         ctrlframe = None
-        if ('ctrlframe' in d) and (allframes is not None):
-            ctrlframe = allframes[d['ctrlframe']]
-        ctrlelem      = getdictval(d, 'ctrlelem',   None)
-        yamlinputtype = getdictval(d, 'inputtype', 'str')
-        if isinstance(yamlinputtype, list):
-            inputtype = [typemap[x.lower()] for x in yamlinputtype]
-        else:
-            inputtype = typemap[yamlinputtype.lower()]
-        mergedboollist = getdictval(d, 'mergedboollist', [])
-        outputdef  = getdictval(d, 'outputdef', {})
-        listboxopt = getdictval(d, 'listboxopt', {})
-        fileopenopt= getdictval(d, 'fileopenopt', {})
-        entryopt   = getdictval(d, 'entryopt', {})
-
+        if (spec.ctrlframe is not None) and (allframes is not None):
+            ctrlframe = allframes[spec.ctrlframe]
         # Return the widget
-        return cls(frame, row, inputtype, name, label, parent=parent,
-                   defaultval=defaultval, optionlist=optionlist,
-                   listboxopt=listboxopt, fileopenopt=fileopenopt,
-                   ctrlframe=ctrlframe,   ctrlelem=ctrlelem,
-                   labelonly=labelonly,   entryopt=entryopt,
-                   outputdef=outputdef, mergedboollist=mergedboollist,
-                   allinputs=allinputs, visible=visible)
+        widget = cls.__new__(cls)
+        widget.build(frame, spec, parent=parent, ctrlframe=ctrlframe,
+                     allinputs=allinputs, layout=layout,
+                     defaultval=defaultval, optionlist=optionlist)
+        return widget
 # -- Done inputwidget --
 
+def samevalue(a, b):
+    """a == b, also for numpy arrays"""
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+class placeholdertk(object):
+    """
+    Stands in for the Tk variable and entry widget of an input which has
+    not been built yet.  Holds the value and state the way Tk would.
+    """
+    def __init__(self, value='', listbox=False):
+        self.value    = value
+        self.listbox  = listbox
+        self.options  = []
+        self.selected = set()
+        self.state    = 'normal'
+
+    def get(self, *args):
+        if self.listbox and len(args)==1: return self.options[int(args[0])]
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def insert(self, index, value):
+        if self.listbox:          self.options.append(value)
+        elif index in (0, '1.0'): self.value = value + self.value
+        else:                     self.value = self.value + value
+
+    def delete(self, *args):
+        if self.listbox:
+            self.options  = []
+            self.selected = set()
+        else:
+            self.value = ''
+
+    def selection_set(self, index):
+        self.selected.add(int(index))
+
+    def selection_clear(self, *args):
+        self.selected = set()
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def cget(self, key):
+        return self.state
+
+    def config(self, state=None, **kwargs):
+        if state is not None: self.state = state
+    configure = config
+
+class placeholderwidget(inputwidget):
+    """
+    An input whose Tk widgets have not been built yet (e.g., one inside a
+    collapsed ToggledFrame).  getval() and setval() work on placeholdertk
+    objects which start out at the default value.
+    """
+    __slots__ = ('initval',)
+
+    def build(self, frame, spec, parent=None, ctrlframe=None, allinputs=None,
+              layout=None, defaultval=_fromspec, optionlist=_fromspec):
+        self.setup(spec, parent, ctrlframe, allinputs, defaultval, optionlist)
+        defaultval = self.defaultval
+        optionlist = self.optionlist
+        inputtype  = spec.inputtype
+        strval     = lambda v: repr(v).strip("'").strip('"')
+        if spec.labelonly or (inputtype == moretypes.mergedboollist):
+            pass
+        elif inputtype is bool:
+            self.var     = placeholdertk(0 if defaultval is None else defaultval)
+            self.tkentry = placeholdertk()
+        elif (inputtype is moretypes.listbox):
+            allopts = eval(evalcode(optionlist)) if isinstance(optionlist,str) else optionlist
+            self.tkentry = placeholdertk(listbox=True)
+            for option in allopts: self.tkentry.insert(Tk.END, option)
+            if defaultval is not None:
+                if not isinstance(defaultval, list): defaultval = [defaultval]
+                for v in defaultval:
+                    if v in allopts:
+                        self.tkentry.selection_set(allopts.index(v))
+        elif (inputtype is str) and (len(optionlist)>0):
+            self.var     = placeholdertk('' if defaultval is None else defaultval)
+            self.tkentry = placeholdertk()
+        elif (inputtype is moretypes.textbox):
+            self.tkentry = placeholdertk(escapestr(defaultval).strip("'").strip('"'))
+        elif (inputtype is moretypes.array):
+            self.tkentry = placeholdertk('' if defaultval is None else formatarray(defaultval))
+        elif (inputtype is moretypes.filename):
+            self.tkentry = placeholdertk('' if defaultval is None else strval(defaultval))
+        elif (isinstance(inputtype, list)):
+            N            = len(inputtype)
+            self.var     = [None]*N
+            self.tkentry = [placeholdertk() for i in range(N)]
+            self.listN   = N if defaultval is None else len(defaultval)
+            if defaultval is not None:
+                for i in range(min(N, len(defaultval))):
+                    self.tkentry[i].value = strval(defaultval[i])
+        else:
+            self.tkentry = placeholdertk(strval(defaultval))
+        self.initval = self.getval()
+
+    def builddefaults(self):
+        """
+        Returns the defaultval and optionlist to build the real widget with
+        """
+        val = self.getval()
+        defaultval = self.defaultval if samevalue(val, self.initval) else val
+        return {'defaultval':defaultval, 'optionlist':self.optionlist}
+
 class popupwindow(Tk.Toplevel, object):
     """
     Creates a pop-up window
@@ -827,7 +2121,8 @@ class popupwindow(Tk.Toplevel, object):
     def __init__(self, parent, master, defdict, stored_inputvars, 
                  extraclosefunc=None, savebutton=True, 
                  savebtxt='Save', closebtxt='Close', entrynum=None,
-                 quitafterinit=False, popupgui=True, hidden=False):
+                 quitafterinit=False, popupgui=True, hidden=False,
+                 lazyframes=True):
         self.scrollframe=scrollframe=True
         if popupgui:
             super(popupwindow, self).__init__(parent)
@@ -860,6 +2155,25 @@ class popupwindow(Tk.Toplevel, object):
         if popupgui==False: print("Initiating no gui")
         if hidden: self.withdraw()
 
+        # Collect the layout and apply it at the end
+        layout = gridlayout()
+
+        # Contents of collapsed toggled frames are built when first shown
+        self.deferredbuild = OrderedDict()
+        lazyframe = findlazyframes(getdictval(defdict, 'frames', []),
+                                   inputs=defdict['inputwidgets']) \
+                    if (lazyframes and popupgui) else {}
+        for widget in defdict['inputwidgets']:
+            lazy = itemlazyframe(widget, lazyframe)
+            if lazy is not None:
+                self.deferredbuild.setdefault(lazy, []).append(
+                    partial(self.makeinputwidget, widget))
+        for button in getdictval(defdict, 'buttons', []) if popupgui else []:
+            lazy = itemlazyframe(button, lazyframe)
+            if lazy is not None:
+                self.deferredbuild.setdefault(lazy, []).append(
+                    partial(self.makebutton, button))
+
         # Add some frames to the pop-up window
         self.popup_subframes     = OrderedDict()
         self.popup_toggledframes = OrderedDict()
@@ -879,6 +2193,9 @@ class popupwindow(Tk.Toplevel, object):
                                                             borderwidth=1)
                     self.popup_subframes[name] = self.popup_toggledframes[name].sub_frame
                     subframelayout = self.popup_toggledframes[name].title_frame
+                    if name in self.deferredbuild:
+                        self.popup_toggledframes[name].onfirstshow = \
+                            partial(self.buildtoggledframe, name)
                 else:
                     self.popup_subframes[name] = Tk.LabelFrame(drawframe, **kwargs)
                     subframelayout = self.popup_subframes[name]
@@ -886,38 +2203,20 @@ class popupwindow(Tk.Toplevel, object):
                 kwargs = {}
                 if 'row' in frame: kwargs['row'] = frame['row']
                 col = 0 if 'col' not in frame else frame['col']
-                subframelayout.grid(column=col, padx=10,pady=10, 
-                                    columnspan=4, sticky='w',
-                                    **kwargs)
+                layout.grid(subframelayout, column=col, padx=10,pady=10, 
+                            columnspan=4, sticky='w', **kwargs)
                 if ('title' in frame) and (not toggled):
-                    Tk.Label(self.popup_subframes[name], 
-                             text=frame['title']).grid(row=0, column=col, 
-                                                       columnspan=4,
-                                                       sticky='w')
+                    layout.grid(Tk.Label(self.popup_subframes[name], 
+                                         text=frame['title']),
+                                row=0, column=col, columnspan=4, sticky='w')
         
         # populate the window
         self.temp_inputvars = OrderedDict()
         for widget in defdict['inputwidgets']:
-            widgetcopy = widget.copy()
-            name       = widgetcopy['name']
-            #widgetcopy['visible']    = popupgui
-            if getdictval(widget, 'labelonly', False) is False: 
-                widgetcopy['defaultval'] = self.stored_inputvars[name]
-            widgetframe = getdictval(widget, 'frame', None)
-            targetframe = self.drawframe if widgetframe is None else self.popup_subframes[widgetframe]
-            if 'optionlist' in widgetcopy:
-                if isinstance(widgetcopy['optionlist'], str):
-                    widgetcopy['optionlist'] = eval(widgetcopy['optionlist'])
-            iwidget = inputwidget.fromdict(targetframe, 
-                                           widgetcopy, parent=parent,
-                                           allinputs=self.temp_inputvars)
-            self.temp_inputvars[name] = iwidget
+            placeholder = itemlazyframe(widget, lazyframe) is not None
+            self.makeinputwidget(widget, layout, placeholder=placeholder)
         # link any widgets necessary
-        for key,  inputvar in self.temp_inputvars.items():
-            if self.temp_inputvars[key].ctrlelem is not None:
-                self.temp_inputvars[key].linkctrlelem(self.popup_subframes, 
-                                                      self.temp_inputvars)
-                self.temp_inputvars[key].onoffctrlelem(None)
+        self.linkctrlelems()
 
         # Append an entry number to name (if necessary)
         if entrynum is not None:
@@ -930,48 +2229,108 @@ class popupwindow(Tk.Toplevel, object):
             if 'buttons' in defdict:
                 Nbuttons = len(defdict['buttons'])
                 for button in defdict['buttons']:
-                    text  = button['text']
-                    cmdstr= button['command']
-                    col   = getdictval(button, 'col', 0)
-                    widgetframe = getdictval(button, 'frame', None)
-                    targetframe = self.drawframe if widgetframe is None else self.popup_subframes[widgetframe]
-                    b  = Tk.Button(master=targetframe, #self.drawframe,
-                                   text=text,command=eval(cmdstr))
-                    if 'row' in button:
-                        b.grid(row=button['row'], column=col,padx=5,sticky='w')
-                    else:
-                        b.grid(column=col, padx=5, sticky='w')
+                    if itemlazyframe(button, lazyframe) is None:
+                        self.makebutton(button, layout)
 
             # Add the save button
             row = len(defdict['inputwidgets'])+Nbuttons+1  #row+3
             col=0
             if savebutton:
-                Tk.Button(self.drawframe,
-                          text=savebtxt,command=self.savevals).grid(row=row, column=0)
+                layout.grid(Tk.Button(self.drawframe,
+                                      text=savebtxt,command=self.savevals),
+                            row=row, column=0)
             col=1
             # Add the close button
-            Tk.Button(self.drawframe,
-                      text=closebtxt, command=self.okclose).grid(row=row, column=col)
-            # col_count, row_count = self.drawframe.grid_size()
-            # for n in range(row_count): 
-            #     self.drawframe.grid_rowconfigure(n, minsize=25, weight=1) 
+            layout.grid(Tk.Button(self.drawframe,
+                                  text=closebtxt, command=self.okclose),
+                        row=row, column=col)
 
             for key, frame in self.popup_subframes.items():
-                col_count, row_count = frame.grid_size()
-                #print('key = %s col = %i row = %i'%(key, col_count, row_count))
-                for n in range(row_count):
-                    frame.grid_rowconfigure(n, minsize=15, weight=1)
+                layout.rowconfigure(frame, minsize=15, weight=1)
+        layout.apply()
         return
 
+    def makeinputwidget(self, widget, layout=None, placeholder=False):
+        parent     = self.parent
+        spec       = inputspec.fromdict(widget)
+        name       = spec.name
+        defaultval = _fromspec
+        if spec.labelonly is False: 
+            defaultval = self.stored_inputvars[name]
+        optionlist = _fromspec
+        if isinstance(spec.optionlist, str):
+            optionlist = eval(evalcode(spec.optionlist))
+        if placeholder:
+            if isinstance(self.temp_inputvars.get(name, None), inputwidget) \
+               and not isinstance(self.temp_inputvars[name], placeholderwidget):
+                return
+            self.temp_inputvars[name] = placeholderwidget.fromspec(None, spec,
+                                                   parent=parent,
+                                                   allinputs=self.temp_inputvars,
+                                                   defaultval=defaultval,
+                                                   optionlist=optionlist)
+            return
+        # Pick up the current value if this replaces a placeholder
+        if isinstance(self.temp_inputvars.get(name, None), placeholderwidget):
+            kwargs     = self.temp_inputvars[name].builddefaults()
+            defaultval = kwargs['defaultval']
+        widgetframe = getdictval(widget, 'frame', None)
+        targetframe = self.drawframe if widgetframe is None else self.popup_subframes[widgetframe]
+        iwidget = inputwidget.fromspec(targetframe, spec, parent=parent,
+                                       allinputs=self.temp_inputvars,
+                                       layout=layout,
+                                       defaultval=defaultval,
+                                       optionlist=optionlist)
+        self.temp_inputvars[name] = iwidget
+        source = getdictval(widget, 'optionsource', None)
+        collections = getattr(parent, 'listboxpopupwindict', {})
+        if source in collections: iwidget.linkcollection(collections[source])
+
+    def makebutton(self, button, layout=None):
+        parent= self.parent
+        text  = button['text']
+        cmdstr= button['command']
+        col   = getdictval(button, 'col', 0)
+        widgetframe = getdictval(button, 'frame', None)
+        targetframe = self.drawframe if widgetframe is None else self.popup_subframes[widgetframe]
+        b  = Tk.Button(master=targetframe, #self.drawframe,
+                       text=text,command=eval(evalcode(cmdstr)))
+        gridwidget(b, layout, row=getdictval(button, 'row', None),
+                   column=col, padx=5, sticky='w')
+
+    def linkctrlelems(self):
+        for key,  inputvar in self.temp_inputvars.items():
+            if inputvar.ctrlelem is not None:
+                inputvar.linkctrlelem(self.popup_subframes, 
+                                      self.temp_inputvars)
+                inputvar.onoffctrlelem(None)
+
+    def buildtoggledframe(self, name):
+        """
+        Builds the deferred contents of the toggled frame name
+        """
+        tasks = self.deferredbuild.pop(name, [])
+        if len(tasks)<1: return
+        layout = gridlayout()
+        for task in tasks: task(layout)
+        for key, frame in self.popup_subframes.items():
+            layout.rowconfigure(frame, minsize=15, weight=1)
+        layout.apply()
+        self.linkctrlelems()
+
+    @recorded('savevals')
     def savevals(self):
         for key, widget in self.stored_inputvars.items():
             val = self.temp_inputvars[key].getval()
             self.stored_inputvars[key] = val
+        tracker = getattr(self.parent, 'dirtytracker', None)
+        if tracker is not None: tracker.markstored(self.stored_inputvars)
         if self.datakeyname is not None:
             return self.stored_inputvars[self.datakeyname]
         else:
             return None
 
+    @recorded('okclose')
     def okclose(self):
         dataname=self.savevals()
         if self.extraclosefunc is not None:
@@ -1002,7 +2361,7 @@ class listboxpopupwindows():
     """
     Creates a widget for editing a list of pop-up windows
     """
-    def __init__(self, parent, frame, listboxdict, popupwindict):
+    def __init__(self, parent, frame, listboxdict, popupwindict, layout=None):
         self.parent     = parent
         self.frame      = frame
         self.popupwindict=popupwindict.copy()
@@ -1019,24 +2378,72 @@ class listboxpopupwindows():
                                      yscrollcommand=self.yscroll.set,  
                                      **self.listboxopt) 
         self.listboxdict= listboxdict.copy()
+        self.name       = getdictval(listboxdict, 'name', None)
+        self.exportcache= {}
         self.alldataentries = OrderedDict()
+        self.observers  = []
 
         self.yscroll['command'] = self.tkentry.yview
+        self.tkentry.bind('<<ListboxSelect>>', self.onselect, add='+')
 
         # Add the objects
-        if self.row is None:  row, col = frame.grid_size()
-        else:                 row = self.row
-        self.yscroll.grid(row=row, column=2, sticky=Tk.NW+Tk.S)
-        self.tklabel.grid(row=row, column=0, sticky='nw', padx=5)
-        self.tkentry.grid(row=row, column=1, sticky='w')
+        if self.row is not None: row = self.row
+        elif layout is None:     row, col = frame.grid_size()
+        else:                    row = layout.getnextrow(frame)
+        gridwidget(self.yscroll, layout, row=row, column=2, sticky=Tk.NW+Tk.S)
+        gridwidget(self.tklabel, layout, row=row, column=0, sticky='nw', padx=5)
+        gridwidget(self.tkentry, layout, row=row, column=1, sticky='w')
         
         # Add the buttons
         newb  = Tk.Button(master=self.frame, text='New',   command=self.new)
         editb = Tk.Button(master=self.frame, text='Edit',  command=self.edit)
         delb  = Tk.Button(master=self.frame, text='Delete',command=self.remove)
-        newb.grid(row=row+1,  column=0)
-        editb.grid(row=row+1, column=1)
-        delb.grid(row=row+1,  column=2)
+        gridwidget(newb,  layout, row=row+1, column=0)
+        gridwidget(editb, layout, row=row+1, column=1)
+        gridwidget(delb,  layout, row=row+1, column=2)
+        self.buttons = [newb, editb, delb]
+        if getdictval(listboxdict, 'tablebutton', False):
+            tableb = Tk.Button(master=self.frame, text='Table',
+                               command=self.showtable)
+            gridwidget(tableb, layout, row=row+1, column=3)
+            self.buttons.append(tableb)
+
+    def destroy(self):
+        """Destroys the Tk widgets"""
+        for w in [self.tklabel, self.yscroll, self.tkentry]+self.buttons:
+            w.destroy()
+
+    def onselect(self, event=None):
+        recordevent(['listbox', self.name], 'select',
+                    [tkextractval(moretypes.listbox, None, self.tkentry)])
+
+    def select(self, names):
+        """Selects the entries names"""
+        self.tkentry.selection_clear(0, Tk.END)
+        allnames = self.getitemlist()
+        for name in names:
+            if name in allnames: self.tkentry.selection_set(allnames.index(name))
+
+    def subscribe(self, callback):
+        """
+        Calls callback(event, *args) whenever the entries change, with
+          'insert', index, name
+          'delete', index, name
+          'rename', index, oldname, newname
+          'reset',  names
+        """
+        if callback not in self.observers: self.observers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.observers: self.observers.remove(callback)
+
+    def notify(self, event, *args):
+        for callback in list(self.observers):
+            try:
+                callback(event, *args)
+            except Tk.TclError:
+                # The subscriber's widget was destroyed
+                self.unsubscribe(callback)
 
     def insertdata(self, storeddata, forcechange=False):
         Ndata = len(self.alldataentries)+1
@@ -1051,6 +2458,8 @@ class listboxpopupwindows():
         # TODO: Should check the name to make sure it's not a duplicate
         self.tkentry.insert(Tk.END, entryname)
         self.alldataentries[entryname] = storeddata.copy()
+        self.markdirty()
+        self.notify('insert', self.tkentry.size()-1, entryname)
 
         # Reset state if necessary
         if statedisabled and forcechange: self.tkentry.config(state=prevstate) 
@@ -1069,8 +2478,19 @@ class listboxpopupwindows():
     def deleteall(self):
         self.tkentry.delete(0, Tk.END)
         self.alldataentries.clear()
+        self.markdirty()
+        self.notify('reset', [])
         return
 
+    def markdirty(self, entryname=None):
+        """
+        Tells the dirtytracker of the parent App that entryname changed,
+        or that entries were added or removed if entryname is None
+        """
+        tracker = getattr(self.parent, 'dirtytracker', None)
+        if tracker is not None: tracker.markentry(self.name, entryname)
+
+    @recorded('populatefromdict')
     def populatefromdict(self, fromdict, deleteprevious=True, 
                          verbose=False, forcechange=False):
         if deleteprevious: 
@@ -1106,7 +2526,101 @@ class listboxpopupwindows():
     def rebuildlist(self):
         itemlist = [key for key, item in self.alldataentries.items()]
         self.tkentry.delete(0, Tk.END)
-        for item in itemlist: self.tkentry.insert(Tk.END, item)
+        if len(itemlist)>0: self.tkentry.insert(Tk.END, *itemlist)
+        self.markdirty()
+        self.notify('reset', itemlist)
+
+    def tablespecs(self):
+        """Returns the inputspecs of the table columns"""
+        return [inputspec.fromdict(d) for d in self.popupwindict['inputwidgets']
+                if not getdictval(d, 'labelonly', False)]
+
+    def totable(self):
+        """
+        Returns all entries as an OrderedDict of numpy columns, one per
+        popup inputwidget
+        """
+        entries = list(self.alldataentries.values())
+        table   = OrderedDict()
+        for spec in self.tablespecs():
+            values = [getdictval(e, spec.name, None) for e in entries]
+            table[spec.name] = tablecolumn(spec.inputtype, values,
+                                           spec.varlenlist)
+        return table
+
+    def fromtable(self, table, deleteprevious=True, forcechange=False):
+        """
+        Adds one entry per row of table, a dict of columns keyed by the
+        popup inputwidget names.  Missing columns get the default values.
+        """
+        specs   = [s for s in self.tablespecs() if s.name in table]
+        columns = [(s.name, columnvalues(s.inputtype, table[s.name],
+                                         s.varlenlist)) for s in specs]
+        Nrows   = len(columns[0][1]) if len(columns)>0 else 0
+        if deleteprevious: self.alldataentries.clear()
+        defaults    = self.getdefaultdict()
+        datakeyname = getdictval(self.popupwindict, 'datakeyname', None)
+        Nprev       = len(self.alldataentries)
+        for i in range(Nrows):
+            storeddata = OrderedDict(defaults)
+            for name, values in columns: storeddata[name] = values[i]
+            entryname = repr(Nprev+i+1) if datakeyname is None else storeddata[datakeyname]
+            self.alldataentries[entryname] = storeddata
+        prevstate = self.tkentry.cget('state')
+        if forcechange: self.tkentry.config(state='normal')
+        self.rebuildlist()
+        if forcechange: self.tkentry.config(state=prevstate)
+        return
+
+    def writecsv(self, filename):
+        """Writes all entries to filename as CSV, one column per input"""
+        table = self.totable()
+        cols  = []
+        for col in table.values():
+            if col.ndim == 2:
+                cols.append([' '.join(r) for r in col.astype(str).tolist()])
+            else:
+                cols.append(col.astype(str).tolist())
+        with open(filename, 'w') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(list(table.keys()))
+            writer.writerows(zip(*cols))
+        return
+
+    def readcsv(self, filename, **kwargs):
+        """Loads the entries from a CSV file written by writecsv()"""
+        with open(filename) as f:
+            rows = list(csv.reader(f))
+        if len(rows)<1: return
+        header = rows[0]
+        cols   = list(zip(*rows[1:])) if len(rows)>1 else [[]]*len(header)
+        table  = OrderedDict([(name, np.array(col, dtype=str))
+                              for name, col in zip(header, cols)])
+        self.fromtable(table, **kwargs)
+        return
+
+    def savenpz(self, filename):
+        """Writes all entries to filename as a numpy .npz file"""
+        np.savez(filename, **self.totable())
+        return
+
+    def loadnpz(self, filename, **kwargs):
+        """Loads the entries from a .npz file written by savenpz()"""
+        with np.load(filename, allow_pickle=False) as data:
+            table = OrderedDict([(k, data[k]) for k in data.files])
+        self.fromtable(table, **kwargs)
+        return
+
+    def savetable(self, filename):
+        """Writes the entries as .npz or CSV, depending on the extension"""
+        if filename.lower().endswith('.npz'): self.savenpz(filename)
+        else:                                 self.writecsv(filename)
+
+    @recorded('loadtable')
+    def loadtable(self, filename, **kwargs):
+        """Loads the entries from a .npz or CSV file"""
+        if filename.lower().endswith('.npz'): self.loadnpz(filename, **kwargs)
+        else:                                 self.readcsv(filename, **kwargs)
 
     def checknamechange(self):
         datakeyname = getdictval(self.popupwindict, 'datakeyname', None)
@@ -1118,11 +2632,29 @@ class listboxpopupwindows():
         # in future for ordered dicts, maybe try 
         # https://stackoverflow.com/questions/16475384/rename-a-dictionary-key
         if len(namechanges)>0:
+            # Rename in place, keeping the order and the selection
+            names    = list(self.alldataentries.keys())
+            renamed  = OrderedDict()
+            for key, item in self.alldataentries.items():
+                renamed[item[datakeyname] if key in namechanges else key] = item
+            self.alldataentries.clear()
+            self.alldataentries.update(renamed)
+            if len(renamed) != len(names):
+                # Some entries now share a name
+                self.rebuildlist()
+                return
+            newnames = list(renamed.keys())
             for name in namechanges:
-                newname = self.alldataentries[name][datakeyname]
-                self.alldataentries[newname] = self.alldataentries.pop(name)
-            self.rebuildlist()
-
+                index    = names.index(name)
+                newname  = newnames[index]
+                selected = self.tkentry.selection_includes(index)
+                self.tkentry.delete(index)
+                self.tkentry.insert(index, newname)
+                if selected: self.tkentry.selection_set(index)
+                self.markdirty()
+                self.notify('rename', index, name, newname)
+
+    @recorded('new')
     def new(self):
         """Create a new input window entry"""
         storeddata = OrderedDict()
@@ -1133,6 +2665,7 @@ class listboxpopupwindows():
                       extraclosefunc=partial(self.insertdata, storeddata))
         return p
 
+    @recorded('edit')
     def edit(self):
         """Edit an entry in the list box"""
         # Get the currently highlighted entry
@@ -1149,6 +2682,7 @@ class listboxpopupwindows():
         #for key, data in p.temp_inputvars.items(): print("edit key %s"%key)
         return p
 
+    @recorded('remove')
     def remove(self, selectednames=None):
         if selectednames is None:
             selected   = tkextractval(moretypes.listbox, None, self.tkentry)
@@ -1160,15 +2694,31 @@ class listboxpopupwindows():
             print("No items to delete")
             return
         for selitem in selected: 
+            if selitem not in self.alldataentries: continue
+            index = list(self.alldataentries.keys()).index(selitem)
             self.alldataentries.pop(selitem)
-        self.rebuildlist()
+            self.tkentry.delete(index)
+            self.markdirty()
+            self.notify('delete', index, selitem)
         return
     
     def getitemlist(self):
         return [key for key, item in self.alldataentries.items()]
 
+    def showtable(self, **kwargs):
+        """Opens a tableview of all of the entries"""
+        return tableview(self.parent, self, **kwargs)
+
+    @recorded('dumpdict')
+    @instrumented('dumpdict')
     def dumpdict(self, tag, subset=[], onlyactive=True, keyfunc=None,
-                 dynamicprefix_keyfunc=None):
+                 dynamicprefix_keyfunc=None, incremental=False):
+        """
+        Returns the output dict for tag from all entries (or subset).
+        With incremental=True, only the entries changed since the last
+        incremental call are re-read, and the dict from that call is
+        patched and returned.
+        """
         sep = '.'
         output = OrderedDict()
         itemlist = self.getitemlist()
@@ -1208,25 +2758,69 @@ class listboxpopupwindows():
             loopsubset = {key:self.alldataentries[key] for key in subset}
         else: 
             loopsubset = self.alldataentries
+        tracker = getattr(self.parent, 'dirtytracker', None)
+        if incremental and (tracker is not None) and (len(subset)<1):
+            return self.patchdump(output, tracker, tag, onlyactive, keyfunc,
+                                  dynamicprefix_keyfunc)
         #for key, storeddata in self.alldataentries.items():
         for key, storeddata in loopsubset.items():
-            p=popupwindow(self.parent, self.frame, self.popupwindict,
-                          storeddata, hidden=True)
-            for k, data in p.temp_inputvars.items(): 
-                if data.isactive() and onlyactive:
-                    if tag in data.outputdef:
-                        if dynamicprefix_keyfunc is not None:
-                            storekey = dynamicprefix_keyfunc(key,
-                                                             p.temp_inputvars,
-                                                             data)
-                        elif keyfunc is not None:
-                            storekey = keyfunc(key, self.listboxdict, data)
-                        else:
+            output.update(self.dumpentry(key, storeddata, tag, onlyactive,
+                                         keyfunc, dynamicprefix_keyfunc))
+        return output
 
-                            storekey = key+'.'+data.outputdef[tag]
-                        output[storekey] = data.getval()
-                    #print("dump key %s"%key+" "+repr(data.getval()))
-            p.destroy()
+    def dumpentry(self, key, storeddata, tag, onlyactive=True, keyfunc=None,
+                  dynamicprefix_keyfunc=None):
+        """Returns the output dict for tag from the entry key"""
+        output = OrderedDict()
+        p=popupwindow(self.parent, self.frame, self.popupwindict,
+                      storeddata, hidden=True)
+        vals, active = bulkgetvals(p.temp_inputvars, getactive=True)
+        for k, data in p.temp_inputvars.items(): 
+            if active[k] and onlyactive:
+                if tag in data.outputdef:
+                    if dynamicprefix_keyfunc is not None:
+                        storekey = dynamicprefix_keyfunc(key,
+                                                         p.temp_inputvars,
+                                                         data)
+                    elif keyfunc is not None:
+                        storekey = keyfunc(key, self.listboxdict, data)
+                    else:
+
+                        storekey = key+'.'+data.outputdef[tag]
+                    output[storekey] = exportval(vals[k])
+                #print("dump key %s"%key+" "+repr(data.getval()))
+        p.destroy()
+        return output
+
+    def patchdump(self, head, tracker, tag, onlyactive, keyfunc,
+                  dynamicprefix_keyfunc):
+        """
+        Rebuilds the cached dumpdict() output, only re-reading the entries
+        which changed (or were replaced) since the last call
+        """
+        ckey  = (tag, onlyactive, keyfunc, dynamicprefix_keyfunc)
+        cache = self.exportcache.get(ckey, None)
+        if cache is None:
+            cache = {'stamp':0, 'entries':{}, 'output':OrderedDict()}
+            self.exportcache[ckey] = cache
+        dirty = tracker.dirtyentries(self.name, cache['stamp']) or []
+        cache['stamp'] = tracker.stamp
+        entries = {}
+        for key, storeddata in self.alldataentries.items():
+            cached = cache['entries'].get(key, None)
+            if (cached is None) or (cached[0] is not storeddata) or \
+               (key in dirty):
+                cached = (storeddata,
+                          self.dumpentry(key, storeddata, tag, onlyactive,
+                                         keyfunc, dynamicprefix_keyfunc))
+            entries[key] = cached
+        cache['entries'] = entries
+        # Patch the previous output in place
+        output = cache['output']
+        output.clear()
+        output.update(head)
+        for key, (storeddata, entryoutput) in entries.items():
+            output.update(entryoutput)
         return output
 
     def getNameFromOutputDef(self, outputtag, outputname):
@@ -1237,6 +2831,69 @@ class listboxpopupwindows():
                     return x['name']
         return None
 
+    def extractfromdict(self, tag, strdict, sep='.'):
+        """
+        Pulls out the entries belonging to this list from strdict (a dict
+        of key: valuestring pairs read from an input file), converts them
+        to the inputtypes in the popup window, and returns a dict which
+        can be passed to populatefromdict().  Used keys are removed from
+        strdict.
+        """
+        output = OrderedDict()
+        outputlist = getdictval(getdictval(self.listboxdict, 'outputlist',
+                                           {}), tag, None)
+        if outputlist is None: return output
+        outputpre  = getdictval(getdictval(self.listboxdict, 'outputprefix',
+                                           {}), tag, '')
+        dynamicprefixkey = getdictval(self.listboxdict, 'dynamicprefixkey',
+                                      None)
+        # Find the keys which list the entries
+        listsuffix = sep+outputlist
+        prefixes   = OrderedDict()
+        if dynamicprefixkey is None:
+            listkey = outputpre+listsuffix
+            if listkey in strdict:
+                prefixes[outputpre] = strdict.pop(listkey).split()
+        else:
+            for key in [k for k in strdict if k.endswith(listsuffix)]:
+                prefixes[key[:-len(listsuffix)]] = strdict.pop(key).split()
+        if len(prefixes)<1: return output
+
+        # Map the outputdef names to the popup inputs
+        outputmap = OrderedDict()
+        datatypes = {}
+        arrayopts = {}
+        for x in self.popupwindict['inputwidgets']:
+            if getdictval(x, 'labelonly', False): continue
+            datatypes[x['name']] = getinputtype(x)
+            arrayopts[x['name']] = getdictval(x, 'arrayopt', {})
+            if ('outputdef' in x) and (tag in x['outputdef']):
+                outputmap[x['outputdef'][tag]] = x['name']
+        datakeyname = getdictval(self.popupwindict, 'datakeyname', None)
+        defaultdict = self.getdefaultdict()
+
+        for prefix, names in prefixes.items():
+            for name in names:
+                entry = defaultdict.copy()
+                if datakeyname is not None: entry[datakeyname] = name
+                if dynamicprefixkey is not None:
+                    prefixtype = datatypes[dynamicprefixkey]
+                    entry[dynamicprefixkey] = [prefix] \
+                        if prefixtype is moretypes.listbox else prefix
+                keystart = [name+sep]
+                if len(prefix)>0: keystart.insert(0, prefix+sep+name+sep)
+                for outputname, inputname in outputmap.items():
+                    for start in keystart:
+                        key = start+outputname
+                        if key in strdict:
+                            entry[inputname] = \
+                                convertinputstr(datatypes[inputname],
+                                                strdict.pop(key),
+                                                arrayopts[inputname])
+                            break
+                output[name] = entry
+        return output
+
     def setentryval(self, entry, key, val, outputtag):
         # Get the casedict
         if entry not in self.alldataentries:
@@ -1253,10 +2910,271 @@ class listboxpopupwindows():
             return
         # Set the value
         casedict[entrykey] = val
+        self.markdirty(entry)
         return
 
 # -- Done listofpopupwindows --
 
+def numsortkey(inputtype, val):
+    """
+    Sort key for val in a bool/int/float column.  Strings are converted
+    with inputtype first, numbers sort before anything which isn't one,
+    and missing values go last.
+    """
+    if isinstance(val, str): val = convertinputstr(inputtype, val)
+    if val is None: return (2, 0.0, '')
+    try:
+        return (0, float(val), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, cellstr(val).lower())
+
+class tableview(Tk.Toplevel, object):
+    """
+    Spreadsheet-style view of all entries in a listboxpopupwindows, one
+    row per entry and one column per popup input.  Only the visible rows
+    are drawn, so no popupwindows are built.  Double-click a cell to edit
+    it, click a column header to sort, and type in the filter box to
+    show only the matching rows.
+    """
+    def __init__(self, parent, listbox, title=None, rowheight=20,
+                 colwidth=100, visiblerows=25):
+        super(tableview, self).__init__(parent)
+        self.wm_title(listbox.label if title is None else title)
+        self.listbox     = listbox
+        self.specs       = listbox.tablespecs()
+        self.colnames    = [spec.name for spec in self.specs]
+        self.rowheight   = rowheight
+        self.colwidth    = colwidth
+        self.nslots      = 0
+        self.cells       = []
+        self.top         = 0
+        self.editor      = None
+        self.sortcol     = None
+        self.sortreverse = False
+
+        # Filter bar
+        bar = Tk.Frame(self)
+        bar.pack(side=Tk.TOP, fill=Tk.X)
+        Tk.Label(bar, text='Filter').pack(side=Tk.LEFT, padx=5)
+        self.filtercol   = Tk.StringVar(value='all')
+        Tk.OptionMenu(bar, self.filtercol, 'all', *self.colnames,
+                      command=self.refilter).pack(side=Tk.RIGHT)
+        self.filterentry = Tk.Entry(bar)
+        self.filterentry.pack(side=Tk.LEFT, fill=Tk.X, expand=True)
+        self.filterentry.bind('<KeyRelease>', self.refilter)
+
+        # Header and the (virtual) body
+        body   = Tk.Frame(self)
+        body.pack(side=Tk.TOP, fill=Tk.BOTH, expand=True)
+        width  = colwidth*len(self.colnames)
+        self.header  = Tk.Canvas(body, height=rowheight, highlightthickness=0,
+                                 width=min(width, 800))
+        self.canvas  = Tk.Canvas(body, height=rowheight*visiblerows,
+                                 width=min(width, 800), background='white',
+                                 highlightthickness=0)
+        self.yscroll = Tk.Scrollbar(body, orient=Tk.VERTICAL,
+                                    command=self.yview)
+        self.xscroll = Tk.Scrollbar(body, orient=Tk.HORIZONTAL,
+                                    command=self.xview)
+        self.canvas.config(xscrollcommand=self.xscroll.set,
+                           scrollregion=(0, 0, width, 1))
+        self.header.config(scrollregion=(0, 0, width, rowheight))
+        self.header.grid(row=0, column=0, sticky='ew')
+        self.canvas.grid(row=1, column=0, sticky='nsew')
+        self.yscroll.grid(row=1, column=1, sticky='ns')
+        self.xscroll.grid(row=2, column=0, sticky='ew')
+        body.rowconfigure(1, weight=1)
+        body.columnconfigure(0, weight=1)
+        self.drawheader()
+
+        self.canvas.bind('<Configure>',       self.resize)
+        self.canvas.bind('<Double-Button-1>', self.edit)
+        self.canvas.bind('<MouseWheel>',
+                         lambda e: self.yview('scroll', -e.delta//120, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self.yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.yview('scroll', 1, 'units'))
+        self.reload()
+
+    def reload(self):
+        """Re-reads the entries from the listbox"""
+        self.names     = list(self.listbox.alldataentries.keys())
+        self.dispcache = {}   # column -> display strings
+        self.findcache = {}   # column -> lowercase strings for the filter
+        self.keycache  = {}   # column -> sort keys
+        self.refilter()
+
+    def column(self, icol):
+        """Returns the display strings of column icol"""
+        if icol not in self.dispcache:
+            name    = self.colnames[icol]
+            entries = self.listbox.alldataentries
+            self.dispcache[icol] = [cellstr(getdictval(entries[n], name, None))
+                                    for n in self.names]
+        return self.dispcache[icol]
+
+    def sortkeys(self, icol):
+        """Returns the precomputed sort keys of column icol"""
+        if icol not in self.keycache:
+            spec    = self.specs[icol]
+            entries = self.listbox.alldataentries
+            if spec.inputtype in (bool, int, float):
+                keys = [numsortkey(spec.inputtype,
+                                   getdictval(entries[n], spec.name, None))
+                        for n in self.names]
+            else:
+                keys = [x.lower() for x in self.column(icol)]
+            self.keycache[icol] = keys
+        return self.keycache[icol]
+
+    def invalidate(self, icol):
+        for cache in (self.dispcache, self.findcache, self.keycache):
+            cache.pop(icol, None)
+
+    def refilter(self, *args):
+        """Recomputes the visible rows from the sort and filter"""
+        rows = list(range(len(self.names)))
+        if self.sortcol is not None:
+            rows.sort(key=self.sortkeys(self.sortcol).__getitem__,
+                      reverse=self.sortreverse)
+        text = self.filterentry.get().strip().lower()
+        if text != '':
+            fcol  = self.filtercol.get()
+            icols = range(len(self.colnames)) if fcol == 'all' else \
+                    [self.colnames.index(fcol)]
+            for icol in icols:
+                if icol not in self.findcache:
+                    self.findcache[icol] = [x.lower() for x in self.column(icol)]
+            finds = [self.findcache[icol] for icol in icols]
+            rows  = [r for r in rows if any([text in f[r] for f in finds])]
+        self.rows = rows
+        self.yview('moveto', 0)
+
+    def sort(self, icol):
+        if self.sortcol == icol:
+            self.sortreverse = not self.sortreverse
+        else:
+            self.sortcol, self.sortreverse = icol, False
+        self.drawheader()
+        self.refilter()
+
+    def drawheader(self):
+        self.header.delete('all')
+        for icol, name in enumerate(self.colnames):
+            x = icol*self.colwidth
+            if icol == self.sortcol: name += ' v' if self.sortreverse else ' ^'
+            tag = 'col%i'%icol
+            self.header.create_rectangle(x, 0, x+self.colwidth, self.rowheight,
+                                         fill='gray85', tags=tag)
+            self.header.create_text(x+4, self.rowheight//2, anchor='w',
+                                    text=name, tags=tag)
+            self.header.tag_bind(tag, '<Button-1>',
+                                 lambda e, icol=icol: self.sort(icol))
+
+    def resize(self, event):
+        """Makes a pool of cell items for the rows which fit in the window"""
+        nslots = max(1, event.height//self.rowheight)
+        if nslots == self.nslots: return
+        self.nslots = nslots
+        self.canvas.delete('cell')
+        width = self.colwidth*len(self.colnames)
+        self.cells = []
+        for slot in range(nslots):
+            y = slot*self.rowheight
+            self.canvas.create_line(0, y+self.rowheight, width, y+self.rowheight,
+                                    fill='gray90', tags='cell')
+            self.cells.append([self.canvas.create_text(icol*self.colwidth+4,
+                                                       y+self.rowheight//2,
+                                                       anchor='w', tags='cell')
+                               for icol in range(len(self.colnames))])
+        self.yview('scroll', 0, 'units')
+
+    def yview(self, *args):
+        """Scrollbar command which moves the first visible row"""
+        nrows = len(self.rows)
+        if args[0] == 'moveto':
+            top = int(float(args[1])*nrows)
+        else:
+            step = self.nslots if args[2].startswith('page') else 1
+            top  = self.top + int(args[1])*step
+        self.top = max(0, min(top, nrows-self.nslots))
+        self.redraw()
+        if nrows > 0:
+            self.yscroll.set(float(self.top)/nrows,
+                             float(self.top+self.nslots)/nrows)
+        else:
+            self.yscroll.set(0, 1)
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.header.xview(*args)
+
+    def redraw(self):
+        """Fills the cell pool from the visible rows"""
+        self.canceledit()
+        maxchars = max(1, self.colwidth//7)
+        columns  = [self.column(icol) for icol in range(len(self.colnames))]
+        for slot, items in enumerate(self.cells):
+            irow = self.top+slot
+            row  = self.rows[irow] if irow < len(self.rows) else None
+            for icol, item in enumerate(items):
+                text = '' if row is None else columns[icol][row][:maxchars]
+                self.canvas.itemconfigure(item, text=text)
+
+    def edit(self, event):
+        """Puts an entry over the cell which was double-clicked"""
+        slot = int(self.canvas.canvasy(event.y)//self.rowheight)
+        icol = int(self.canvas.canvasx(event.x)//self.colwidth)
+        irow = self.top+slot
+        if (irow >= len(self.rows)) or (icol >= len(self.colnames)): return
+        self.canceledit()
+        row    = self.rows[irow]
+        entry  = Tk.Entry(self.canvas)
+        entry.insert(0, self.column(icol)[row])
+        self.editor = (entry, row, icol,
+                       self.canvas.create_window(icol*self.colwidth,
+                                                 slot*self.rowheight,
+                                                 anchor='nw', window=entry,
+                                                 width=self.colwidth,
+                                                 height=self.rowheight))
+        entry.bind('<Return>', self.commitedit)
+        entry.bind('<Escape>', lambda e: self.canceledit())
+        entry.focus_set()
+
+    def commitedit(self, event=None):
+        """Converts the edited text to the column inputtype and stores it"""
+        entry, row, icol, window = self.editor
+        spec = self.specs[icol]
+        val  = convertinputstr(spec.inputtype, entry.get(), spec.arrayopt)
+        if (spec.inputtype in (bool, int, float)) and isinstance(val, str):
+            print("%s is not a valid %s for %s"%(val, spec.inputtype.__name__,
+                                                 spec.name))
+            entry.bell()
+            return
+        self.listbox.alldataentries[self.names[row]][spec.name] = val
+        self.listbox.markdirty(self.names[row])
+        self.canceledit()
+        if spec.name == getdictval(self.listbox.popupwindict, 'datakeyname',
+                                   None):
+            # Renamed entry
+            self.listbox.checknamechange()
+            self.reload()
+        elif (icol == self.sortcol) or (self.filterentry.get().strip() != ''):
+            # The row may have moved, or no longer match
+            self.invalidate(icol)
+            top = self.top
+            self.refilter()
+            self.yview('scroll', top, 'units')
+        else:
+            self.invalidate(icol)
+            self.redraw()
+
+    def canceledit(self):
+        if self.editor is None: return
+        entry, row, icol, window = self.editor
+        self.editor = None
+        self.canvas.delete(window)
+        entry.destroy()
+
 class messagewindow():
     def __init__(self, toproot, mesg, autowidth=True, height=5, maxwidth=150,
                  title='', activetext=False):
@@ -1280,6 +3198,546 @@ class messagewindow():
     def quit(self):
         self.mesgwin.destroy()
         
+class logconsole():
+    """
+    A window for long or streamed output.  write() may be called from any
+    thread: the chunks are queued and appended in batches every
+    flushinterval ms.  Only the last maxlines lines are kept.
+    """
+    def __init__(self, toproot, title='', height=20, width=100,
+                 maxlines=10000, flushinterval=50, maxhits=1000):
+        self.toproot       = toproot
+        self.queue         = queue.Queue()
+        self.lines         = deque(maxlen=maxlines)
+        self.maxlines      = maxlines
+        self.partial       = ''
+        self.flushinterval = flushinterval
+        self.maxhits       = maxhits
+        self.hits          = []
+        self.hitindex      = -1
+        self.lastpattern   = None
+        self.closed        = False
+
+        self.mesgwin     = Tk.Toplevel(toproot)
+        if len(title)>0: self.mesgwin.wm_title(title)
+        self.mesgwin.protocol("WM_DELETE_WINDOW", self.quit)
+        self.mesgwin.grid_rowconfigure(0, weight=1)
+        self.mesgwin.grid_columnconfigure(0, weight=1)
+        self.text_widget = Tk.Text(self.mesgwin, height=height, width=width,
+                                   wrap='none', state='disabled',
+                                   bg='light gray')
+        self.text_widget.tag_configure('match', background='yellow')
+        self.text_widget.tag_configure('current', background='orange')
+        self.scroll_bar  = Tk.Scrollbar(self.mesgwin,
+                                        command=self.text_widget.yview,
+                                        orient="vertical")
+        self.scroll_bar.grid(row=0, column=1, sticky="ns")
+        self.text_widget.grid(row=0, column=0, columnspan=4, sticky='nsew')
+        self.text_widget.configure(yscrollcommand=self.scroll_bar.set)
+
+        self.searchvar   = Tk.StringVar()
+        self.searchentry = Tk.Entry(self.mesgwin, textvariable=self.searchvar)
+        self.searchentry.grid(row=1, column=0, sticky='ew')
+        self.searchentry.bind('<Return>', lambda event: self.findnext())
+        Tk.Button(self.mesgwin, text="Find",
+                  command=self.findnext).grid(row=1, column=1)
+        self.button = Tk.Button(self.mesgwin, command=self.quit, text="Close")
+        self.button.grid(row=1, column=2)
+        self.afterid = self.mesgwin.after(self.flushinterval, self.poll)
+
+    def write(self, chunk):
+        """Queues chunk to be appended (safe from any thread)"""
+        if not self.closed: self.queue.put(chunk)
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+    def poll(self):
+        self.afterid = None
+        if self.closed: return
+        self.drain()
+        self.afterid = self.mesgwin.after(self.flushinterval, self.poll)
+
+    def drain(self):
+        """Appends everything queued so far in one insert"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(chunks)<1: return
+        data  = ''.join(chunks)
+        lines = (self.partial+data).split('\n')
+        self.partial = lines.pop()
+        self.lines.extend(lines)
+        # Keep the bottom in view if it was in view
+        atbottom = self.text_widget.yview()[1] >= 0.999
+        self.text_widget.configure(state='normal')
+        if len(lines) >= self.maxlines:
+            # Nothing already shown is kept, so only insert what is
+            self.text_widget.delete('1.0', Tk.END)
+            self.clearhits()
+            self.text_widget.insert(Tk.END, '\n'.join(list(self.lines)+
+                                                      [self.partial]))
+        else:
+            self.text_widget.insert(Tk.END, data)
+        # Drop the lines which fell out of the ring buffer
+        nlines = int(self.text_widget.index('end-1c').split('.')[0])-1
+        if nlines > self.maxlines:
+            excess = nlines-self.maxlines
+            self.text_widget.delete('1.0', '%i.0'%(excess+1))
+            # Move the hits up with their lines
+            kept = [(l-excess, s, e) for l, s, e in self.hits if l > excess]
+            self.hitindex -= len(self.hits)-len(kept)
+            self.hits = kept
+            if self.hitindex < 0: self.hitindex = -1
+        self.text_widget.configure(state='disabled')
+        if atbottom: self.text_widget.see(Tk.END)
+
+    def clearhits(self):
+        """Forgets the matches, so findnext() searches again"""
+        self.hits        = []
+        self.hitindex    = -1
+        self.lastpattern = None
+
+    def search(self, pattern, regex=False, nocase=True):
+        """
+        Highlights the matches of pattern in the kept lines, and returns
+        them as a list of (line number, start column, end column)
+        """
+        flags = re.IGNORECASE if nocase else 0
+        try:
+            prog = re.compile(pattern if regex else re.escape(pattern), flags)
+        except re.error as e:
+            print("Bad search pattern %s: %s"%(pattern, str(e)))
+            return []
+        self.drain()
+        self.text_widget.tag_remove('match',   '1.0', Tk.END)
+        self.text_widget.tag_remove('current', '1.0', Tk.END)
+        self.hits = []
+        if len(pattern)>0:
+            for i, line in enumerate(list(self.lines)+[self.partial]):
+                for m in prog.finditer(line):
+                    if m.end() == m.start(): continue
+                    self.hits.append((i+1, m.start(), m.end()))
+                    if len(self.hits) >= self.maxhits: break
+                if len(self.hits) >= self.maxhits: break
+        for l, s, e in self.hits:
+            self.text_widget.tag_add('match', '%i.%i'%(l, s), '%i.%i'%(l, e))
+        self.hitindex = -1
+        return self.hits
+
+    def findnext(self):
+        """Moves to the next match of the search box text"""
+        pattern = self.searchvar.get()
+        if self.lastpattern != pattern:
+            self.lastpattern = pattern
+            self.search(pattern)
+        if len(self.hits)<1: return
+        self.hitindex = (self.hitindex+1)%len(self.hits)
+        l, s, e = self.hits[self.hitindex]
+        self.text_widget.tag_remove('current', '1.0', Tk.END)
+        self.text_widget.tag_add('current', '%i.%i'%(l, s), '%i.%i'%(l, e))
+        self.text_widget.see('%i.%i'%(l, s))
+
+    def quit(self):
+        self.closed = True
+        if self.afterid is not None:
+            self.mesgwin.after_cancel(self.afterid)
+            self.afterid = None
+        self.mesgwin.destroy()
+
+def setnonblocking(fd):
+    try:
+        os.set_blocking(fd, False)
+    except AttributeError:
+        # python 2
+        import fcntl
+        fcntl.fcntl(fd, fcntl.F_SETFL,
+                    fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+def removestalesocket(path):
+    """Removes the Unix socket path if no server is listening on it"""
+    if not (os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode)):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.remove(path)
+    finally:
+        sock.close()
+
+def checkparams(func, params):
+    """Raises TypeError if func can't be called with the JSON-RPC params"""
+    if not isinstance(params, (list, dict)):
+        raise TypeError("params must be a list or an object")
+    if hasattr(inspect, 'signature'):
+        bind = inspect.signature(func).bind
+    else:
+        bind = partial(inspect.getcallargs, func)
+    if isinstance(params, dict): bind(**params)
+    else:                        bind(*params)
+
+class rpcprotocol(asyncio.Protocol if asyncio is not None else object):
+    """One client connection to an rpcserver, one JSON request per line"""
+    def __init__(self, server):
+        self.server    = server
+        self.transport = None
+        self.buffer    = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        lines = (self.buffer+data).split(b'\n')
+        self.buffer = lines.pop()
+        queued = False
+        for line in lines:
+            if line.strip():
+                self.server.requests.put((self, line))
+                queued = True
+        if queued: self.server.wakeup()
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def send(self, data):
+        if self.transport is not None: self.transport.write(data)
+
+class rpcserver(object):
+    """
+    JSON-RPC 2.0 server for driving an App from other processes.  It
+    listens on the Unix socket path, or on host:port, with one request
+    (or one batch, a list of requests) per line.  The socket is handled
+    by an asyncio loop in a background thread, which wakes the Tk thread
+    through a pipe when requests arrive (where Tk can watch files, else
+    Tk polls every pollinterval ms).  Clients can send many requests
+    without waiting for the replies, which come back in order.
+
+    A batch runs in one go, with no Tk events in between, and is all or
+    nothing: it stops at the first call which fails, the inputs and
+    listbox entries are put back as they were before the batch, and every
+    call in it gets an error reply.  An empty batch is an invalid request.
+    """
+    methods = ('getval', 'setval', 'getDictFromInputs', 'setinputfromdict',
+               'setinputfromstrdict', 'populatefromdict', 'dumpdict',
+               'getitemlist', 'statehash', 'update')
+    # Methods which change the App, so batches with these are rolled back
+    changers = ('setval', 'setinputfromdict', 'setinputfromstrdict',
+                'populatefromdict')
+
+    def __init__(self, app, path=None, host='127.0.0.1', port=0,
+                 pollinterval=5):
+        if asyncio is None:
+            raise RuntimeError("rpcserver needs asyncio")
+        self.app          = app
+        self.path         = path
+        self.host         = host
+        self.port         = port
+        self.pollinterval = pollinterval
+        self.requests     = queue.Queue()
+        self.loop         = asyncio.new_event_loop()
+        self.server       = None
+        self.afterid      = None
+        self.pipe         = None
+        self.ready        = threading.Event()
+        self.thread       = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait()
+        if self.server is None:
+            raise RuntimeError("rpcserver could not listen on %s"%
+                               repr(self.address))
+        try:
+            self.pipe = os.pipe()
+            for fd in self.pipe: setnonblocking(fd)
+            app.tk.createfilehandler(self.pipe[0], Tk.READABLE, self.onwakeup)
+        except (AttributeError, RuntimeError, OSError, Tk.TclError):
+            # No file handlers (e.g. on Windows), so poll instead
+            self.closepipe()
+            self.afterid = app.after(self.pollinterval, self.tick)
+
+    @property
+    def address(self):
+        return self.path if self.path is not None else (self.host, self.port)
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        factory = lambda: rpcprotocol(self)
+        try:
+            if self.path is not None:
+                removestalesocket(self.path)
+                create = self.loop.create_unix_server(factory, self.path)
+            else:
+                create = self.loop.create_server(factory, self.host, self.port)
+            self.server = self.loop.run_until_complete(create)
+            if self.path is None:
+                self.port = self.server.sockets[0].getsockname()[1]
+        except Exception as e:
+            print("rpcserver: %s"%repr(e))
+        self.ready.set()
+        if self.server is not None: self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self):
+        if self.afterid is not None:
+            self.app.after_cancel(self.afterid)
+            self.afterid = None
+        if self.pipe is not None:
+            try:
+                self.app.tk.deletefilehandler(self.pipe[0])
+            except Tk.TclError:
+                pass
+            self.closepipe()
+        if not self.thread.is_alive(): return
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def closepipe(self):
+        if self.pipe is None: return
+        for fd in self.pipe: os.close(fd)
+        self.pipe = None
+
+    def wakeup(self):
+        """Called from the asyncio thread after queueing requests"""
+        pipe = self.pipe
+        if pipe is None: return
+        try:
+            os.write(pipe[1], b'x')
+        except OSError:
+            # Full (so a wake-up is pending already) or closed
+            pass
+
+    def onwakeup(self, fd, mask):
+        # Empty the pipe first, so no wake-up for a later request is lost
+        try:
+            while os.read(fd, 4096): pass
+        except OSError:
+            pass
+        self.poll()
+
+    def tick(self):
+        self.poll()
+        self.afterid = self.app.after(self.pollinterval, self.tick)
+
+    def poll(self):
+        """Runs everything received so far, and sends the replies"""
+        replies = OrderedDict()
+        while True:
+            try:
+                conn, line = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            reply = self.handleline(line)
+            if reply is not None:
+                replies.setdefault(conn, []).append(reply.encode('utf-8')+b'\n')
+        for conn, data in replies.items():
+            self.loop.call_soon_threadsafe(conn.send, b''.join(data))
+
+    def handleline(self, line):
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            return json.dumps(self.error(None, -32700, 'Parse error: %s'%str(e)))
+        if request == []:
+            return json.dumps(self.error(None, -32600,
+                                         'Invalid request: empty batch'))
+        if isinstance(request, list):
+            replies = self.handlebatch(request)
+            replies = [r for r in replies if r is not None]
+            if len(replies)<1: return None
+        else:
+            replies = self.handle(request)
+            if replies is None: return None
+        return json.dumps(replies, default=jsondefault)
+
+    def error(self, reqid, code, message):
+        return {'jsonrpc':'2.0', 'id':reqid,
+                'error':{'code':code, 'message':message}}
+
+    def handlebatch(self, requests):
+        """
+        Runs the requests in a batch, rolling all of them back if one
+        fails.  Returns the replies (None for notifications).
+        """
+        changes = any([isinstance(r, dict) and (r.get('method') in self.changers)
+                       for r in requests])
+        # Nothing to put back unless something can change
+        before  = self.snapshot() if changes else None
+        replies = []
+        for i, r in enumerate(requests):
+            reply, failed = self.call(r)
+            if failed: break
+            replies.append(reply)
+        else:
+            return [reply if 'id' in r else None
+                    for r, reply in zip(requests, replies)]
+        # Put everything back, and fail every call in the batch
+        if before is not None: self.rollback(before)
+        replies = []
+        for j, r in enumerate(requests):
+            if not (isinstance(r, dict) and ('id' in r)): continue
+            if j == i:
+                replies.append(reply)
+            else:
+                replies.append(self.error(r['id'], -32001,
+                                          'Rolled back, request %i in the '
+                                          'batch failed'%i))
+        return replies
+
+    def snapshot(self):
+        """Returns the input values and listbox entries, for rollback()"""
+        app     = self.app
+        entries = OrderedDict((name, copy.deepcopy(lb.alldataentries))
+                              for name, lb in app.listboxpopupwindict.items())
+        return bulkgetvals(app.inputvars), entries
+
+    def rollback(self, snapshot):
+        """Puts back the input values and listbox entries of snapshot"""
+        app = self.app
+        vals, entries = snapshot
+        # Listboxes first, so the listbox inputs have their options
+        for name, lb in app.listboxpopupwindict.items():
+            if name not in entries: continue
+            lb.alldataentries.clear()
+            lb.alldataentries.update(entries[name])
+            prevstate = lb.tkentry.cget('state')
+            lb.tkentry.config(state='normal')
+            lb.rebuildlist()
+            lb.tkentry.config(state=prevstate)
+        current = bulkgetvals(app.inputvars)
+        items   = [(app.inputvars[k], v, False) for k, v in vals.items()
+                   if (k in app.inputvars) and (v is not None) and
+                   (not app.inputvars[k].labelonly) and
+                   (not samevalue(v, current.get(k, None)))]
+        bulksetvals(items, forcechange=True)
+
+    def handle(self, request):
+        """Runs one request and returns its reply (None for notifications)"""
+        reply, failed = self.call(request)
+        if isinstance(request, dict) and ('id' not in request): return None
+        return reply
+
+    def call(self, request):
+        """Runs one request, returns its reply and whether it failed"""
+        if not isinstance(request, dict) or ('method' not in request):
+            return self.error(None, -32600, 'Invalid request'), True
+        reqid  = request.get('id', None)
+        method = request['method']
+        params = request.get('params', [])
+        if method not in self.methods:
+            return self.error(reqid, -32601, 'Method not found: %s'%method), True
+        func = getattr(self, 'rpc_'+method)
+        try:
+            checkparams(func, params)
+        except TypeError as e:
+            return self.error(reqid, -32602, 'Invalid params: %s'%str(e)), True
+        try:
+            if isinstance(params, dict): value = func(**params)
+            else:                        value = func(*params)
+        except Exception as e:
+            return self.error(reqid, -32000, repr(e)), True
+        return {'jsonrpc':'2.0', 'id':reqid, 'result':value}, False
+
+    # -- The methods --
+    def rpc_getval(self, name):
+        return exportval(self.app.inputvars[name].getval())
+
+    def rpc_setval(self, name, val, forcechange=False):
+        self.app.inputvars[name].setval(val, forcechange=forcechange)
+
+    def rpc_getDictFromInputs(self, tag, onlyactive=True):
+        return self.app.getDictFromInputs(tag, onlyactive=onlyactive)
+
+    def rpc_setinputfromdict(self, tag, inputdict):
+        return self.app.setinputfromdict(tag, inputdict)
+
+    def rpc_setinputfromstrdict(self, tag, strdict, forcechange=True):
+        return self.app.setinputfromstrdict(tag, strdict,
+                                            forcechange=forcechange)
+
+    def rpc_populatefromdict(self, listbox, fromdict, deleteprevious=True,
+                             forcechange=False):
+        self.app.listboxpopupwindict[listbox].populatefromdict(fromdict,
+                                             deleteprevious=deleteprevious,
+                                             forcechange=forcechange)
+
+    def rpc_dumpdict(self, listbox, tag, subset=[], onlyactive=True):
+        return self.app.listboxpopupwindict[listbox].dumpdict(tag,
+                                                    subset=subset,
+                                                    onlyactive=onlyactive)
+
+    def rpc_getitemlist(self, listbox):
+        return self.app.listboxpopupwindict[listbox].getitemlist()
+
+    def rpc_statehash(self):
+        return self.app.statehash()
+
+    def rpc_update(self):
+        """Applies the pending computed inputs and redraws"""
+        self.app.computed.update()
+        self.app.update_idletasks()
+
+class rpcclient(object):
+    """
+    Blocking client for rpcserver.  address is a Unix socket path or a
+    (host, port) tuple.
+    """
+    def __init__(self, address, timeout=None):
+        if isinstance(address, tuple):
+            self.sock = socket.create_connection(address, timeout)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(address)
+        self.file  = self.sock.makefile('rb')
+        self.reqid = 0
+
+    def request(self, method, params):
+        self.reqid += 1
+        return {'jsonrpc':'2.0', 'id':self.reqid, 'method':method,
+                'params':params}
+
+    def result(self, reply):
+        if 'error' in reply:
+            raise RuntimeError("%s: %s"%(reply['error']['code'],
+                                         reply['error']['message']))
+        return reply['result']
+
+    def call(self, method, *params):
+        """Calls method and returns its result"""
+        return self.callmany([(method, list(params))])[0]
+
+    def callmany(self, calls):
+        """
+        Sends all of calls, a list of (method, params), then waits for the
+        replies and returns the results
+        """
+        data = ''.join(json.dumps(self.request(m, p), default=jsondefault)+'\n'
+                       for m, p in calls)
+        self.sock.sendall(data.encode('utf-8'))
+        return [self.result(json.loads(self.file.readline().decode('utf-8')))
+                for c in calls]
+
+    def batch(self, calls):
+        """Runs all of calls as one batch on the Tk thread"""
+        request = [self.request(m, p) for m, p in calls]
+        self.sock.sendall((json.dumps(request, default=jsondefault)+'\n').encode('utf-8'))
+        replies = json.loads(self.file.readline().decode('utf-8'))
+        if isinstance(replies, dict): return self.result(replies)
+        return [self.result(r) for r in sorted(replies, key=lambda r: r['id'])]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
 def donothing(toproot):
     filewin = Tk.Toplevel(toproot)
     button = Tk.Button(filewin, text="Do nothing button")
@@ -1295,6 +3753,57 @@ def pullvals(inputs, statuslabel=None):
     return
 
 
+def findlazyframes(frames, listboxes=[], inputs=[]):
+    """
+    Returns a dict mapping each frame name to the collapsed toggled frame
+    (initstate 0) it sits in, or None.  The contents of those can be
+    built when the toggled frame is first shown.  Toggled frames holding
+    listbox pop-up windows or inputs with an optionsource, or frames
+    enabled/disabled by a ctrlframe or ctrlelem, are always built.
+    """
+    parentframe = {}
+    for frame in frames:
+        parentframe[frame['name']] = getdictval(frame, 'frame', None)
+    startframes = []
+    for listboxdict in listboxes:
+        if 'frame' in listboxdict:
+            startframes.append(listboxdict['frame'].split()[0])
+    for widget in inputs:
+        # Listboxes taking their options from a collection are linked to it
+        if ('optionsource' in widget) and ('frame' in widget):
+            startframes.append(widget['frame'].split()[0])
+        # onoffctrlelem only reaches the Tk children of these frames
+        startframes.append(getdictval(widget, 'ctrlframe', None))
+        for elem in getdictval(widget, 'ctrlelem', None) or []:
+            startframes.append(getdictval(elem, 'frame', None))
+    keepframes = set()
+    for name in startframes:
+        while (name is not None) and (name in parentframe):
+            keepframes.add(name)
+            name = parentframe[name]
+    lazyframe = {}
+    for frame in frames:
+        name    = frame['name']
+        parent  = parentframe[name]
+        lazy    = None if parent is None else lazyframe[parent]
+        if getdictval(frame, 'toggled', False) and \
+           (not getdictval(frame, 'initstate', 0)) and \
+           (name not in keepframes):
+            lazy = name
+        lazyframe[name] = lazy
+    return lazyframe
+
+def itemlazyframe(d, lazyframe):
+    """
+    Returns the collapsed toggled frame that item d sits in, or None
+    """
+    if 'frame' not in d: return None
+    framename = d['frame'].split()
+    if (len(framename)>1) and (framename[1]=='header_frame'):
+        # The header shows even when the frame is collapsed
+        return None
+    return getdictval(lazyframe, framename[0], None)
+
 def listindexwithkey(dictlist, keyval, searchkey='name'):
     """
     Finds the index of item with searchkey=keyval in list dictlist
@@ -1343,6 +3852,997 @@ def update(d, u, searchkey='name'):
     return d
 
 
+def localconfigfiles(localconfigdir):
+    """
+    Returns the yaml files in localconfigdir which get loaded
+    """
+    if not os.path.exists(localconfigdir): return []
+    # Load only "real modules", in a repeatable order
+    return [os.path.join(localconfigdir, fname)
+            for fname in sorted(os.listdir(localconfigdir))
+            if not fname.startswith('.') and not fname.startswith('__')
+            and fname.endswith('.yaml')]
+
+# Parsed overlay files, fname -> ((mtime, size), parsed dict)
+overlaycache = {}
+
+def parseyamlfile(fname):
+    """Parses the yaml file fname into plain python dicts and lists"""
+    if useruemel: Loader=yaml.load
+    else:         Loader=yaml.safe_load
+    with open(fname) as fp:
+        return plainyaml(Loader(fp))
+
+def loadoverlays(files, cachefile=None, maxworkers=8, processes=False):
+    """
+    Parses the yaml overlay files in a thread (or process) pool, and
+    returns the parsed dicts in the order of files.  Files whose mtime
+    and size match the ones in memory or in cachefile (from an earlier
+    session) are not parsed again.
+    """
+    stamps    = [filestamp(fname)[1:] for fname in files]
+    diskcache = {}
+    if (cachefile is not None) and os.path.exists(cachefile):
+        try:
+            with open(cachefile) as fp:
+                diskcache = json.load(fp)
+        except (IOError, OSError, ValueError):
+            diskcache = {}
+    results = [None]*len(files)
+    toparse = []
+    for i, fname in enumerate(files):
+        if (fname in overlaycache) and (overlaycache[fname][0] == stamps[i]):
+            results[i] = overlaycache[fname][1]
+        elif (fname in diskcache) and (tuple(diskcache[fname][0]) == stamps[i]):
+            results[i] = diskcache[fname][1]
+            overlaycache[fname] = (stamps[i], results[i])
+        else:
+            toparse.append(i)
+    if len(toparse)>0:
+        parsefiles = [files[i] for i in toparse]
+        # ruamel's YAML object can't be shared between threads
+        Executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        if (Executor is None) or (useruemel and not processes) or \
+           (len(parsefiles)<2):
+            parsed = [parseyamlfile(fname) for fname in parsefiles]
+        else:
+            with Executor(max_workers=min(maxworkers, len(parsefiles))) as pool:
+                parsed = list(pool.map(parseyamlfile, parsefiles))
+        for i, result in zip(toparse, parsed):
+            results[i] = result
+            overlaycache[files[i]] = (stamps[i], result)
+        if cachefile is not None:
+            writeoverlaycache(cachefile, files, stamps, results)
+    # Copies, since update() merges into (and modifies) them
+    return [copy.deepcopy(result) for result in results]
+
+def writeoverlaycache(cachefile, files, stamps, results):
+    """Saves the parsed overlays for the next session"""
+    tmp = '%s.%i.tmp'%(cachefile, os.getpid())
+    try:
+        with open(tmp, 'w') as fp:
+            json.dump(dict([(fname, [stamps[i], results[i]])
+                            for i, fname in enumerate(files)]), fp)
+        getattr(os, 'replace', os.rename)(tmp, cachefile)
+    except (IOError, OSError, TypeError, ValueError):
+        # Read-only directory or something json can't hold, skip caching
+        if os.path.exists(tmp): os.remove(tmp)
+
+def loadschema(configyaml, localconfigdir='', scriptpath='',
+               overlaycachefile='.tkyamlgui_overlaycache.json'):
+    """
+    Loads configyaml, any includes, and the yaml files in localconfigdir
+    (see loadoverlays()).  Returns the merged dict and the list of files
+    read.
+    """
+    if useruemel: Loader=yaml.load
+    else:         Loader=yaml.safe_load
+    with open(configyaml) as fp:
+        yamldict = Loader(fp)
+    sources = [configyaml]
+
+    # Load any includes
+    if ('includes' in yamldict) and isinstance(yamldict['includes'],list):
+        for fname in yamldict['includes']:
+            loadfile = os.path.join(scriptpath,fname)
+            with open(loadfile) as fp:
+                updatedict = Loader(fp)
+            yamldict = update(yamldict, updatedict)
+            sources.append(loadfile)
+
+    # Load any additional local yaml configuration 
+    loadfiles = localconfigfiles(localconfigdir)
+    cachefile = None
+    if (len(loadfiles)>0) and (overlaycachefile is not None):
+        cachefile = os.path.join(localconfigdir, overlaycachefile)
+    for loadfile, updatedict in zip(loadfiles,
+                                    loadoverlays(loadfiles, cachefile)):
+        #print("Updating with "+loadfile)
+        yamldict = update(yamldict, updatedict)
+        sources.append(loadfile)
+    return yamldict, sources
+
+def filestamp(fname):
+    """Returns (fname, mtime, size) used to check if fname changed"""
+    st = os.stat(fname)
+    return (fname, st.st_mtime, st.st_size)
+
+def plainyaml(d):
+    """
+    Converts the loaded yaml d into plain python dicts, lists and scalars
+    """
+    if isinstance(d, collectionsabc.Mapping):
+        return dict([(plainyaml(k), plainyaml(v)) for k, v in d.items()])
+    if isinstance(d, (list, tuple)):
+        return [plainyaml(x) for x in d]
+    if isinstance(d, bool) or d is None: return d
+    for basetype in (int, float, str):
+        if isinstance(d, basetype): return basetype(d)
+    return d
+
+def typesource(inputtype):
+    """Returns the python source for inputtype"""
+    if isinstance(inputtype, list):
+        return '['+', '.join([typesource(x) for x in inputtype])+']'
+    if isinstance(inputtype, moretypes):
+        return 'moretypes.'+inputtype.name
+    return inputtype.__name__
+
+def specsource(spec):
+    """Returns the python source which constructs inputspec spec"""
+    entryopt = dict(spec.entryopt)
+    if spec.varlenlist: entryopt['varlenlist'] = spec.varlenlist
+    args = [repr(spec.name)]
+    args.append('row=%r'%(spec.row,))
+    args.append('inputtype=%s'%typesource(spec.inputtype))
+    for key in ['label', 'defaultval', 'optionlist', 'listboxopt',
+                'fileopenopt', 'ctrlframe']:
+        args.append('%s=%r'%(key, getattr(spec, key)))
+    args.append('ctrlelem=%r'%(None if spec.ctrlelem is None else
+                                list(spec.ctrlelem),))
+    for key in ['labelonly', 'visible']:
+        args.append('%s=%r'%(key, getattr(spec, key)))
+    args.append('entryopt=%r'%entryopt)
+    args.append('outputdef=%r'%spec.outputdef)
+    args.append('mergedboollist=%r'%[list(x) for x in spec.mergedboollist])
+    args.append('arrayopt=%r'%spec.arrayopt)
+    return 'inputspec('+(',\n    '.join(args))+')'
+
+def compileschema(yamldict, outfile, sources=[], localconfigdir=''):
+    """
+    Writes the merged schema yamldict to the python module outfile, with
+    the inputspecs constructed inline and the button commands compiled.
+    App(compiledschema=outfile) imports it while sources are unchanged.
+    """
+    yamldict = plainyaml(yamldict)
+    lines = ['# Generated by tkyamlgui.compileschema() -- do not edit',
+             '# Load with tkyamlgui.loadcompiledschema(), which provides the',
+             '# tkyamlgui names used here',
+             '',
+             'sources = %r'%[filestamp(f) for f in sources],
+             'localconfigdir = %r'%localconfigdir,
+             'localconfigfiles = %r'%sorted(localconfigfiles(localconfigdir)),
+             '',
+             'yamldict = %r'%yamldict,
+             '',
+             '# -- input specs --',
+             'intern = inputspec.intern']
+    for i, widget in enumerate(getdictval(yamldict, 'inputwidgets', [])):
+        lines.append("intern(yamldict['inputwidgets'][%i], %s)"
+                     %(i, specsource(inputspec(**inputspec.parsedict(widget)))))
+    for key, popup in getdictval(yamldict, 'popupwindow', {}).items():
+        for i, widget in enumerate(popup['inputwidgets']):
+            lines.append("intern(yamldict['popupwindow'][%r]['inputwidgets'][%i], %s)"
+                         %(key, i,
+                           specsource(inputspec(**inputspec.parsedict(widget)))))
+    lines += ['', '# -- button commands --', 'buttoncommands = {}']
+    for i, button in enumerate(getdictval(yamldict, 'buttons', [])):
+        # Check the syntax now
+        compile(button['command'], '<yaml expression>', 'eval')
+        lines.append("buttoncommands[id(yamldict['buttons'][%i])] = "
+                     "lambda self: (%s)"%(i, button['command']))
+    with open(outfile, 'w') as fp:
+        fp.write('\n'.join(lines)+'\n')
+    return outfile
+
+def loadcompiledschema(modfile, localconfigdir=''):
+    """
+    Imports the module written by compileschema().  Returns None if it
+    does not exist or any of its sources changed.
+    """
+    if not os.path.exists(modfile): return None
+    modname = os.path.splitext(os.path.basename(modfile))[0]
+    names   = dict([(k, v) for k, v in globals().items()
+                    if not k.startswith('__')])
+    try:
+        if sys.version_info[0] < 3:
+            import types
+            module = types.ModuleType(modname)
+            module.__dict__.update(names)
+            with open(modfile) as fp:
+                exec(compile(fp.read(), modfile, 'exec'), module.__dict__)
+        else:
+            # Goes through the import system so the bytecode is cached
+            import importlib.util
+            modspec = importlib.util.spec_from_file_location(modname, modfile)
+            module  = importlib.util.module_from_spec(modspec)
+            module.__dict__.update(names)
+            modspec.loader.exec_module(module)
+        if (module.localconfigdir != localconfigdir) or \
+           (module.localconfigfiles != sorted(localconfigfiles(localconfigdir))):
+            return None
+        for stamp in module.sources:
+            if filestamp(stamp[0]) != tuple(stamp): return None
+    except Exception as e:
+        print("Could not load %s: %s"%(modfile, repr(e)))
+        return None
+    return module
+
+
+def jsondefault(obj):
+    """Converts the non-JSON types found in the inputs"""
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, set):        return sorted(obj)
+    if isinstance(obj, moretypes):  return obj.name
+    return repr(obj)
+
+def funcid(func):
+    """
+    Returns a JSON-able name for func, which tells apart the same method
+    bound to different (named) objects, and partials of it
+    """
+    if isinstance(func, partial):
+        return [funcid(func.func), list(func.args), func.keywords or {}]
+    name  = getattr(func, '__name__', repr(func))
+    owner = getattr(func, '__self__', None)
+    if owner is None:
+        return getattr(func, '__module__', '')+'.'+name
+    if isinstance(owner, Tk.Tk):
+        # The App, whose state is already in the hash
+        return '%s.%s'%(type(owner).__name__, name)
+    ownername = vars(owner).get('name', None) if hasattr(owner, '__dict__') \
+                else None
+    if not isinstance(ownername, str):
+        # Only the same object gives the same name
+        ownername = '%s@%x'%(type(owner).__name__, id(owner))
+    return '%s.%s[%s]'%(type(owner).__name__, name, ownername)
+
+def canonicaljson(obj):
+    """Returns obj as a canonical JSON string, e.g., for hashing"""
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'),
+                      default=jsondefault)
+
+def contenthash(obj):
+    """Returns the sha256 hex digest of canonicaljson(obj)"""
+    return hashlib.sha256(canonicaljson(obj).encode('utf-8')).hexdigest()
+
+def jsonroundtrip(obj):
+    """
+    Returns obj as it comes back from JSON: arrays and tuples become
+    lists, and dicts OrderedDicts
+    """
+    return json.loads(json.dumps(obj, default=jsondefault),
+                      object_pairs_hook=OrderedDict)
+
+class deckcache(object):
+    """
+    On-disk cache of export results (anything JSON serializable), keyed
+    by content hash.  Each result is one file in cachedir, and the least
+    recently used files are removed once the total size is above
+    maxbytes.  Safe to share between sessions and processes.
+    """
+    def __init__(self, cachedir, maxbytes=100*1024*1024):
+        self.cachedir = cachedir
+        self.maxbytes = maxbytes
+        if not os.path.isdir(cachedir): os.makedirs(cachedir)
+
+    def filename(self, key):
+        return os.path.join(self.cachedir, key+'.json')
+
+    def get(self, key, default=None):
+        """Returns the result stored under key, or default"""
+        fname = self.filename(key)
+        try:
+            with open(fname) as f:
+                result = json.load(f, object_pairs_hook=OrderedDict)
+            os.utime(fname, None)    # Mark as recently used
+        except (IOError, OSError, ValueError):
+            return default
+        return result
+
+    def put(self, key, result):
+        """Stores result under key, then trims the cache"""
+        fname = self.filename(key)
+        tmp   = '%s.%i.tmp'%(fname, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(result, f, default=jsondefault)
+            getattr(os, 'replace', os.rename)(tmp, fname)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            print("Cannot cache %s: %s"%(key, str(e)))
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+        self.trim()
+
+    def trim(self):
+        """Removes the least recently used results beyond maxbytes"""
+        files = []
+        for fname in os.listdir(self.cachedir):
+            if not fname.endswith('.json'): continue
+            try:
+                st = os.stat(os.path.join(self.cachedir, fname))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, fname))
+        total = sum([f[1] for f in files])
+        for mtime, size, fname in sorted(files):
+            if total <= self.maxbytes: break
+            try:
+                os.remove(os.path.join(self.cachedir, fname))
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for fname in os.listdir(self.cachedir):
+            if fname.endswith('.json'):
+                os.remove(os.path.join(self.cachedir, fname))
+
+class lrucache(object):
+    """A dict which keeps only the maxsize most recently used items"""
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.data    = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        if key not in self.data: return default
+        val = self.data.pop(key)
+        self.data[key] = val
+        return val
+
+    def put(self, key, val):
+        self.data.pop(key, None)
+        self.data[key] = val
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+def memoplot(depends):
+    """
+    Decorator for App methods which compute plot data from the inputs in
+    depends (input names, outputdef keys or listbox pop-up names), e.g.
+        @memoplot(['turbine_x', 'turbine_y'])
+        def turbinepositions(self, scale=1.0): ...
+    The result is cached, see App.plotdata()
+    """
+    def decorator(func):
+        name = getattr(func, '__qualname__', func.__name__)
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            return self.plotdata(name, partial(func, self), depends,
+                                 *args, **kwargs)
+        return wrapper
+    return decorator
+
+def schemaitemkey(d):
+    """Returns the name used to match d between two versions of a schema"""
+    return getdictval(d, 'name', getdictval(d, 'text', None))
+
+def diffschema(olddict, newdict, section):
+    """
+    Compares the list of dicts in section of two yamldicts.  Returns the
+    names of the (added, removed, changed) items.
+    """
+    old = OrderedDict([(schemaitemkey(d), d) for d in getdictval(olddict, section, [])])
+    new = OrderedDict([(schemaitemkey(d), d) for d in getdictval(newdict, section, [])])
+    added   = [k for k in new if k not in old]
+    removed = [k for k in old if k not in new]
+    changed = [k for k in new if (k in old) and
+               (canonicaljson(plainyaml(old[k])) != canonicaljson(plainyaml(new[k])))]
+    return added, removed, changed
+
+class schemawatcher(object):
+    """
+    Polls the files returned by getfiles() with after(), and calls
+    callback() when any of them is changed, added or removed
+    """
+    def __init__(self, root, getfiles, callback, interval=1000):
+        self.root     = root
+        self.getfiles = getfiles
+        self.callback = callback
+        self.interval = interval
+        self.stamps   = self.scan()
+        self.afterid  = root.after(interval, self.poll)
+
+    def scan(self):
+        stamps = {}
+        for fname in self.getfiles():
+            try:
+                stamps[fname] = filestamp(fname)[1:]
+            except OSError:
+                stamps[fname] = None
+        return stamps
+
+    def poll(self):
+        stamps = self.scan()
+        if stamps != self.stamps:
+            self.stamps = stamps
+            try:
+                self.callback()
+            except Exception as e:
+                print("Schema reload failed: %s"%repr(e))
+            # Pick up any includes or overlays the reload added
+            self.stamps = self.scan()
+        self.afterid = self.root.after(self.interval, self.poll)
+
+    def stop(self):
+        if self.afterid is not None: self.root.after_cancel(self.afterid)
+        self.afterid = None
+
+class searchindex(object):
+    """
+    Index over the name, label and outputdef values (which include the
+    help text) of every input in a yamldict, including the inputs of the
+    pop-up windows.  Queries of 3 or more characters intersect trigram
+    lists, shorter ones use the 1 and 2 character prefixes of each word.
+    """
+    def __init__(self, yamldict):
+        self.records  = []
+        self.trigrams = {}
+        self.prefixes = {}
+        for widget in getdictval(yamldict, 'inputwidgets', []):
+            self.add(widget)
+        for key, win in getdictval(yamldict, 'popupwindow', {}).items():
+            for widget in getdictval(win, 'inputwidgets', []):
+                self.add(widget, popup=key)
+
+    def add(self, widget, popup=None):
+        name   = widget['name']
+        label  = str(getdictval(widget, 'label', ''))
+        fields = [name, label]+[str(v) for v in
+                                getdictval(widget, 'outputdef', {}).values()]
+        text   = '\n'.join(fields).lower()
+        i      = len(self.records)
+        self.records.append({'name':name, 'label':label, 'popup':popup,
+                             'text':text})
+        for j in range(len(text)-2):
+            self.trigrams.setdefault(text[j:j+3], set()).add(i)
+        for word in re.split(r'[\W_]+', text):
+            for n in (1, 2):
+                if len(word)>=n:
+                    self.prefixes.setdefault(word[:n], set()).add(i)
+
+    def rank(self, i, query):
+        name  = self.records[i]['name'].lower()
+        label = self.records[i]['label'].lower()
+        if name == query:           order = 0
+        elif name.startswith(query): order = 1
+        elif query in name:         order = 2
+        elif query in label:        order = 3
+        else:                       order = 4
+        return (order, i)
+
+    def search(self, query, limit=50):
+        """Returns the records matching query, best first"""
+        query = query.strip().lower()
+        if len(query)<1: return []
+        if len(query)<3:
+            ids = self.prefixes.get(query, set())
+        else:
+            lists = [self.trigrams.get(query[j:j+3], None)
+                     for j in range(len(query)-2)]
+            if None in lists: return []
+            lists.sort(key=len)
+            ids = [i for i in lists[0].intersection(*lists[1:])
+                   if query in self.records[i]['text']]
+        ids = heapq.nsmallest(limit, ids, key=lambda i: self.rank(i, query))
+        return [self.records[i] for i in ids]
+
+# Tk classes of widgets which take typed text
+textwidgetclasses = ('Text', 'Entry', 'TEntry', 'Spinbox', 'TSpinbox',
+                     'TCombobox')
+
+class searchwindow(Tk.Toplevel, object):
+    """
+    Search box over the inputs of an App.  Enter or double click on a
+    result jumps to that input.
+    """
+    def __init__(self, app, limit=50):
+        super(searchwindow, self).__init__(app)
+        self.wm_title('Find input')
+        self.app     = app
+        self.limit   = limit
+        self.results = []
+        self.query   = Tk.StringVar()
+        self.tkentry = Tk.Entry(self, textvariable=self.query, width=50)
+        self.tkentry.pack(fill=Tk.X, padx=5, pady=5)
+        self.listbox = Tk.Listbox(self, height=15, exportselection=False)
+        self.listbox.pack(fill=Tk.BOTH, expand=True, padx=5, pady=5)
+        self.tkentry.bind('<KeyRelease>', self.refresh)
+        self.tkentry.bind('<Return>',     self.jump)
+        self.tkentry.bind('<Down>',       lambda event: self.move(1))
+        self.tkentry.bind('<Up>',         lambda event: self.move(-1))
+        self.tkentry.bind('<Escape>',     lambda event: self.destroy())
+        self.listbox.bind('<Return>',     self.jump)
+        self.listbox.bind('<Double-Button-1>', self.jump)
+        self.tkentry.focus_set()
+
+    def refresh(self, event=None):
+        if (event is not None) and (event.keysym in ('Up', 'Down', 'Return')):
+            return
+        self.results = self.app.searchindex.search(self.query.get(),
+                                                   limit=self.limit)
+        self.listbox.delete(0, Tk.END)
+        items = []
+        for r in self.results:
+            where = '' if r['popup'] is None else '  [%s]'%r['popup']
+            items.append('%s - %s%s'%(r['name'], r['label'].strip(), where))
+        if len(items)>0:
+            self.listbox.insert(Tk.END, *items)
+            self.listbox.selection_set(0)
+
+    def move(self, step):
+        if len(self.results)<1: return
+        sel = self.listbox.curselection()
+        i   = min(max((sel[0] if sel else -1)+step, 0), len(self.results)-1)
+        self.listbox.selection_clear(0, Tk.END)
+        self.listbox.selection_set(i)
+        self.listbox.see(i)
+
+    def jump(self, event=None):
+        sel = self.listbox.curselection()
+        if (len(self.results)<1) or (len(sel)<1): return
+        r = self.results[sel[0]]
+        self.app.jumpto(r['name'], popup=r['popup'])
+
+class dirtytracker(object):
+    """
+    Tracks which inputs (and so which frames and tabs) and which listbox
+    popup entries of an App changed, using Tk variable traces, widget
+    events and setval().  Every change gets a new stamp, so each consumer
+    can ask what changed since the stamp it last saw.
+    """
+    bindtag = 'tkyamlguiDirty'
+    events  = ('<KeyRelease>', '<ButtonRelease>', '<<ListboxSelect>>',
+               '<<Paste>>', '<<Cut>>')
+
+    def __init__(self, root, inputvars, listboxes, yamldict):
+        self.root       = root
+        self.inputvars  = inputvars
+        self.listboxes  = listboxes
+        self.stamp      = 0
+        self.inputstamp = {}   # input name -> stamp of the last change
+        self.entrystamp = {}   # (listbox name, entry name) -> stamp
+        self.liststamp  = {}   # listbox name -> stamp of the last add/remove
+        self.paths      = {}   # Tk widget path -> input name
+        self.listeners  = []   # called with the name of each changed input
+        self.setschema(yamldict)
+        for seq in self.events:
+            root.bind_class(self.bindtag, seq, self.onevent)
+
+    def setschema(self, yamldict):
+        """Finds where each input lives in yamldict"""
+        self.frameparent = {}
+        for frame in getdictval(yamldict, 'frames', []):
+            self.frameparent[frame['name']] = (getdictval(frame, 'frame', None),
+                                               getdictval(frame, 'tab', None))
+        self.inputframe = {}
+        for widget in getdictval(yamldict, 'inputwidgets', []):
+            frame = getdictval(widget, 'frame', None)
+            self.inputframe[widget['name']] = (None if frame is None else frame.split()[0],
+                                               getdictval(widget, 'tab', None))
+
+    def touch(self):
+        self.stamp += 1
+        return self.stamp
+
+    def register(self, iwidget):
+        """Watches the Tk widgets and variables of iwidget for changes"""
+        name    = iwidget.name
+        var     = iwidget.var if isinstance(iwidget.var, list) else [iwidget.var]
+        entries = iwidget.tkentry if isinstance(iwidget.tkentry, list) else [iwidget.tkentry]
+        for entry in entries:
+            if not isinstance(entry, Tk.Misc): continue
+            self.paths[str(entry)] = name
+            entry.bindtags((self.bindtag,)+entry.bindtags())
+        callback = lambda *args: self.markinput(name)
+        for v in var:
+            if not isinstance(v, Tk.Variable): continue
+            if hasattr(v, 'trace_add'): v.trace_add('write', callback)
+            else:                       v.trace('w', callback)
+        self.markinput(name)
+
+    def onevent(self, event):
+        name = self.paths.get(str(event.widget), None)
+        if name is not None: self.markinput(name)
+
+    def markinput(self, iwidget):
+        """Marks the input (an inputwidget of the App or a name) as changed"""
+        if isinstance(iwidget, inputwidget):
+            if self.inputvars.get(iwidget.name, None) is not iwidget: return
+            iwidget = iwidget.name
+        self.inputstamp[iwidget] = self.touch()
+        for listener in self.listeners: listener(iwidget)
+
+    def markframe(self, framename):
+        """Marks every input in framename and its subframes as changed"""
+        stamp = self.touch()
+        for name, (frame, tab) in self.inputframe.items():
+            if framename in self.framechain(frame):
+                self.inputstamp[name] = stamp
+
+    def markentry(self, listname, entryname=None):
+        """
+        Marks entryname of listbox listname as changed, or the whole list
+        if entryname is None
+        """
+        if entryname is None: self.liststamp[listname] = self.touch()
+        else:                 self.entrystamp[(listname, entryname)] = self.touch()
+
+    def markstored(self, storeddata):
+        """Marks the listbox entry which holds the dict storeddata"""
+        for listname, listbox in self.listboxes.items():
+            for entryname, data in listbox.alldataentries.items():
+                if data is storeddata:
+                    self.markentry(listname, entryname)
+                    return
+
+    def framechain(self, frame):
+        """Returns frame and all of the frames it is nested in"""
+        chain = []
+        while (frame is not None) and (frame not in chain):
+            chain.append(frame)
+            frame = self.frameparent.get(frame, (None, None))[0]
+        return chain
+
+    def frametab(self, frame, tab=None):
+        for f in self.framechain(frame):
+            tab = self.frameparent[f][1] if f in self.frameparent else tab
+        return tab
+
+    def inputtab(self, name):
+        frame, tab = self.inputframe.get(name, (None, None))
+        return self.frametab(frame, tab)
+
+    def dirtyinputs(self, since=0):
+        """Returns the names of the inputs changed after stamp since"""
+        return [name for name, stamp in self.inputstamp.items() if stamp > since]
+
+    def dirtyframes(self, since=0):
+        frames = set()
+        for name in self.dirtyinputs(since):
+            frames.update(self.framechain(self.inputframe.get(name, (None, None))[0]))
+        return frames
+
+    def dirtytabs(self, since=0):
+        return set([self.inputtab(name) for name in self.dirtyinputs(since)])
+
+    def dirtyentries(self, listname, since=0):
+        """
+        Returns the names of the changed entries of listbox listname, or
+        None if entries were added or removed since then
+        """
+        if self.liststamp.get(listname, 0) > since: return None
+        return [entry for (lname, entry), stamp in self.entrystamp.items()
+                if (lname == listname) and (stamp > since)]
+
+class computedinputs(object):
+    """
+    Inputs whose value is an expression over other inputs, given by the
+    computed: key in the yaml, e.g.
+        - name:     area
+          computed: "np.pi*(diameter/2)**2"
+    The expressions are compiled when the schema is loaded.  A change to
+    an input queues only the computed inputs downstream of it, and these
+    are recomputed together, in dependency order, when the event loop is
+    next idle.
+    """
+    namespace = {'np':np}
+
+    def __init__(self, root, inputvars, yamldict):
+        self.root      = root
+        self.inputvars = inputvars
+        self.pending   = set()
+        self.afterid   = None
+        self.updating  = False
+        self.setschema(yamldict)
+
+    def setschema(self, yamldict):
+        """Compiles the expressions and sorts them, checking for cycles"""
+        widgets = getdictval(yamldict, 'inputwidgets', [])
+        names   = set(w['name'] for w in widgets)
+        self.exprs = OrderedDict()
+        self.code  = {}
+        self.deps  = {}
+        for w in widgets:
+            if 'computed' not in w: continue
+            name, expr = w['name'], str(w['computed'])
+            try:
+                code = evalcode(expr)
+                tree = ast.parse(expr, mode='eval')
+            except SyntaxError as e:
+                raise ValueError("Bad computed expression for %s: %s"%(name,
+                                                                      str(e)))
+            self.exprs[name] = expr
+            self.code[name]  = code
+            # Only bare names, also inside comprehensions and lambdas, but
+            # not attributes like the pi in np.pi
+            deps = []
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name) and (node.id in names) and \
+                   (node.id not in deps):
+                    deps.append(node.id)
+            self.deps[name]  = deps
+        self.order = self.toposort()
+        # input name -> computed inputs which use it
+        self.users = {}
+        for name, deps in self.deps.items():
+            for dep in deps: self.users.setdefault(dep, set()).add(name)
+        self.pending.clear()
+
+    def toposort(self):
+        """Returns the computed inputs in the order to compute them"""
+        order, state = [], {}
+        for start in self.exprs:
+            if start in state: continue
+            state[start] = 'visiting'
+            stack = [(start, iter(self.deps[start]))]
+            while stack:
+                name, deps = stack[-1]
+                dep = next(deps, None)
+                if dep is None:
+                    stack.pop()
+                    state[name] = 'done'
+                    order.append(name)
+                elif dep not in self.exprs or state.get(dep) == 'done':
+                    continue
+                elif state.get(dep) == 'visiting':
+                    cycle = [n for n, d in stack]
+                    cycle = cycle[cycle.index(dep):]+[dep]
+                    raise ValueError("Computed inputs form a cycle: %s"%
+                                     ' -> '.join(cycle))
+                else:
+                    state[dep] = 'visiting'
+                    stack.append((dep, iter(self.deps[dep])))
+        return order
+
+    def downstream(self, name):
+        """Returns every computed input which depends on name"""
+        found, todo = set(), [name]
+        while todo:
+            for user in self.users.get(todo.pop(), ()):
+                if user not in found:
+                    found.add(user)
+                    todo.append(user)
+        return found
+
+    def onchange(self, name):
+        """Queues the computed inputs downstream of the input name"""
+        if self.updating or (name not in self.users): return
+        self.pending.update(self.downstream(name))
+        if self.afterid is None:
+            self.afterid = self.root.after_idle(self.update)
+
+    def recompute(self):
+        """Recomputes all computed inputs now"""
+        self.pending.update(self.exprs)
+        self.update()
+
+    def update(self):
+        """Recomputes the queued computed inputs"""
+        if self.afterid is not None:
+            try:
+                self.root.after_cancel(self.afterid)
+            except Tk.TclError:
+                pass
+        self.afterid = None
+        pending, self.pending = self.pending, set()
+        self.updating = True
+        try:
+            for name in self.order:
+                if name not in pending: continue
+                if (name not in self.inputvars) or \
+                   any(dep not in self.inputvars for dep in self.deps[name]):
+                    continue
+                # As globals, so comprehensions and lambdas see them too
+                env = dict(self.namespace)
+                env.update((dep, self.inputvars[dep].getval())
+                           for dep in self.deps[name])
+                try:
+                    val = eval(self.code[name], env)
+                except Exception as e:
+                    print("Cannot compute %s = %s: %s"%(name, self.exprs[name],
+                                                        repr(e)))
+                    continue
+                if isinstance(val, np.generic): val = val.item()
+                iwidget = self.inputvars[name]
+                if exportval(iwidget.getval()) == exportval(val): continue
+                iwidget.setval(val, forcechange=True)
+        finally:
+            self.updating = False
+        return
+
+_nodefault = object()
+
+class workspace(object):
+    """
+    Several cases, each a set of input values, listbox pop-up entries and
+    pop-up window data, in one App.  All cases share the App's schema and
+    widgets: only the active case is in the widgets, and switching cases
+    sets the inputs which differ.  The other cases only keep the values
+    which differ from the defaults.
+    """
+    def __init__(self, app, name='Case 1'):
+        self.app      = app
+        self.defaults = None
+        self.cases    = OrderedDict([(name, None)])  # None for the active case
+        self.active   = name
+        self.count    = 1
+        self.casevar  = None
+
+    def setdefaults(self):
+        """Takes the current values of the App as the defaults"""
+        self.defaults = self.getvals()
+
+    def getvals(self):
+        self.app.finishbuild()
+        computed = getattr(self.app, 'computed', None)
+        skip     = computed.exprs if computed is not None else {}
+        vals     = bulkgetvals(self.app.inputvars)
+        return OrderedDict((k, v) for k, v in vals.items()
+                           if (k not in skip) and
+                           (not self.app.inputvars[k].labelonly))
+
+    @staticmethod
+    def same(a, b):
+        return (b is not _nodefault) and (exportval(a) == exportval(b))
+
+    def capture(self, vals=None, copyentries=False):
+        """
+        Returns the compact state of the active case.  Unless copyentries
+        is True, the listbox and pop-up entries are handed over to it.
+        """
+        if vals is None: vals = self.getvals()
+        take  = deepcopyentries if copyentries else OrderedDict
+        state = {}
+        inputs = OrderedDict((k, v) for k, v in vals.items()
+                             if not self.same(v, self.defaults.get(k, _nodefault)))
+        if len(inputs)>0: state['inputs'] = inputs
+        listboxes = OrderedDict((name, take(lb.alldataentries)) for name, lb
+                                in self.app.listboxpopupwindict.items()
+                                if len(lb.alldataentries)>0)
+        if len(listboxes)>0: state['listboxes'] = listboxes
+        popups = OrderedDict((key, take(d)) for key, d
+                             in self.app.popup_storteddata.items() if len(d)>0)
+        if len(popups)>0: state['popups'] = popups
+        return state
+
+    def restore(self, state, current):
+        """Puts state in the widgets, which hold the values current"""
+        app = self.app
+        # Listboxes first, so the listbox inputs have their options
+        for name, lb in app.listboxpopupwindict.items():
+            lb.alldataentries.clear()
+            lb.alldataentries.update(getdictval(state, 'listboxes', {}).get(name, {}))
+            prevstate = lb.tkentry.cget('state')
+            lb.tkentry.config(state='normal')
+            lb.rebuildlist()
+            lb.tkentry.config(state=prevstate)
+        for key, stored in app.popup_storteddata.items():
+            stored.clear()
+            stored.update(getdictval(state, 'popups', {}).get(key, {}))
+        vals = OrderedDict(self.defaults)
+        vals.update(getdictval(state, 'inputs', {}))
+        items = [(app.inputvars[k], v, False) for k, v in vals.items()
+                 if (k in app.inputvars) and
+                 not self.same(v, current.get(k, _nodefault))]
+        bulksetvals(items, forcechange=True)
+        for key in app.linkedctrl:
+            app.inputvars[key].onoffctrlelem(None)
+        if getattr(app, 'computed', None) is not None:
+            app.computed.recompute()
+
+    def names(self):
+        return list(self.cases.keys())
+
+    def newname(self):
+        while True:
+            self.count += 1
+            name = 'Case %i'%self.count
+            if name not in self.cases: return name
+
+    def new(self, name=None, copyfrom=None):
+        """
+        Adds a case with the default values, or a copy of the case
+        copyfrom, and returns its name.  Does not switch to it.
+        """
+        if name is None: name = self.newname()
+        if name in self.cases:
+            print("Case %s already exists"%name)
+            return None
+        self.getvals()
+        if copyfrom is None:             state = {}
+        elif copyfrom == self.active:    state = self.capture(copyentries=True)
+        else:
+            state = dict(self.cases[copyfrom])
+            for key in ('listboxes', 'popups'):
+                if key in state:
+                    state[key] = OrderedDict((k, deepcopyentries(d))
+                                             for k, d in state[key].items())
+        self.cases[name] = state
+        self.refreshmenu()
+        return name
+
+    def duplicate(self, name=None):
+        """Adds a copy of the active case and switches to it"""
+        name = self.new(name, copyfrom=self.active)
+        if name is not None: self.switch(name)
+        return name
+
+    def switch(self, name):
+        """Makes name the case in the widgets"""
+        if name == self.active: return
+        if name not in self.cases:
+            print("No case %s"%name)
+            return
+        current = self.getvals()
+        self.cases[self.active] = self.capture(current)
+        self.restore(self.cases[name], current)
+        self.cases[name] = None
+        self.active = name
+        self.refreshmenu()
+
+    def delete(self, name=None):
+        """Removes the case name (the active one by default)"""
+        if name is None: name = self.active
+        if len(self.cases) < 2:
+            print("Cannot delete the only case")
+            return
+        if name == self.active:
+            names = self.names()
+            i = names.index(name)
+            self.switch(names[i+1] if i+1 < len(names) else names[i-1])
+        self.cases.pop(name)
+        self.refreshmenu()
+
+    def rename(self, name, newname):
+        if newname in self.cases:
+            print("Case %s already exists"%newname)
+            return
+        self.cases = OrderedDict(((newname if k == name else k), v)
+                                 for k, v in self.cases.items())
+        if self.active == name: self.active = newname
+        self.refreshmenu()
+
+    def refreshmenu(self):
+        """Lists the cases in the App's Cases menu, if it has one"""
+        menu = self.app.casemenu
+        if menu is None: return
+        if self.casevar is None: self.casevar = Tk.StringVar(self.app)
+        menu.delete(4, Tk.END)
+        for name in self.cases:
+            menu.add_radiobutton(label=name, value=name,
+                                 variable=self.casevar,
+                                 command=partial(self.switch, name))
+        self.casevar.set(self.active)
+
+def deepcopyentries(d):
+    """Copy of an OrderedDict of entry dicts, e.g., alldataentries"""
+    return OrderedDict((k, copy.deepcopy(v)) for k, v in d.items())
+
+def markdirty(iwidget):
+    """Tells the dirtytracker of the parent App that iwidget changed"""
+    tracker = getattr(iwidget.parent, 'dirtytracker', None)
+    if tracker is not None: tracker.markinput(iwidget)
 
 class App(Tk.Tk, object):
     """
@@ -1352,16 +4852,30 @@ class App(Tk.Tk, object):
                  localconfigdir='', scriptpath='',
                  title='TK Yaml GUI', leftframew=525, withdraw=False,
                  dorightframe=True, geometry="1050x625", leftframeh=580,
+                 bulklayout=True, progressive=False, buildtimeslice=0.02,
+                 progresscallback=None, lazyframes=True, compiledschema=None,
+                 instrument=False, instrumentdump=None,
+                 deckcachedir=None, deckcachesize=100*1024*1024,
+                 watchschema=False, watchinterval=1000, plotcachesize=32,
+                 rpcsocket=None, rpcport=None,
                  *args, **kwargs):
         super(App, self).__init__(*args, **kwargs)
+        # Optional Tcl call and stall instrumentation
+        self.instrument = None
+        if instrument or (instrumentdump is not None):
+            self.instrument = tclinstrument(self, dumpfile=instrumentdump)
+            self.updateplot = instrumented('updateplot')(self.updateplot)
         if withdraw: self.withdraw()
+        self.tooltipmanager = ToolTipManager(self)
         self.leftframew = leftframew
         self.wm_title(title)
         self.geometry(geometry)
         # Set up the menu bar
+        self.casemenu = None
         if menufunc is not None:   menufunc(self)
         else:                      self.menubar(self)
         self.bind("<Configure>", self.onconfigure)
+        self.bind("<Control-f>", self.onfindkey)
         self.masterframe = VerticalScrolledFrame(self, extraconfigfunc=None)
         self.masterframe.pack(fill=Tk.BOTH, expand=True) # fill window
         # Set up the status bar
@@ -1393,30 +4907,26 @@ class App(Tk.Tk, object):
         self.leftframe=Tk.Frame(self.masterframe, width=leftframew) #530
         self.leftframe.pack(side=Tk.LEFT, fill=Tk.BOTH, expand=True)
 
-        # Load the yaml input file
-        with open(configyaml) as fp:
-            if useruemel: Loader=yaml.load
-            else:         Loader=yaml.safe_load
-            yamldict = Loader(fp)
-
-        # Load any includes
-        if ('includes' in yamldict) and isinstance(yamldict['includes'],list):
-            for fname in yamldict['includes']:
-                updatedict = Loader(open(os.path.join(scriptpath,fname)))
-                yamldict = update(yamldict, updatedict)
-
-        # Load any additional local yaml configuration 
-        if os.path.exists(localconfigdir):
-            for fname in os.listdir(localconfigdir):
-                # Load only "real modules"
-                if not fname.startswith('.') and \
-                   not fname.startswith('__') and fname.endswith('.yaml'):
-                    loadfile = os.path.join(localconfigdir, fname)
-                    updatedict = Loader(open(loadfile))
-                    #print("Updating with "+loadfile)
-                    yamldict = update(yamldict, updatedict)
+        # Load the yaml input file, or the compiled version of it
+        compiled = None
+        if compiledschema is not None:
+            compiled = loadcompiledschema(compiledschema, localconfigdir)
+        if compiled is None:
+            yamldict, sources = loadschema(configyaml, localconfigdir,
+                                           scriptpath)
+            if compiledschema is not None:
+                compileschema(yamldict, compiledschema, sources=sources,
+                              localconfigdir=localconfigdir)
+            self.compiledcommands = {}
+        else:
+            yamldict = compiled.yamldict
+            sources  = [stamp[0] for stamp in compiled.sources]
+            self.compiledcommands = compiled.buttoncommands
         # save yamldict
         self.yamldict=yamldict
+        inputspec.internschema(yamldict)
+        self.schemaargs    = (configyaml, localconfigdir, scriptpath)
+        self.schemasources = sources
 
         # -- Set up the tabs --
         self.alltabslist = yamldict['tabs']
@@ -1424,100 +4934,109 @@ class App(Tk.Tk, object):
         self.notebook.pack(side=Tk.LEFT, fill=Tk.BOTH, expand=True)
         #self.notebook.grid(row=0, column=0, sticky='nsew')
 
-        # -- Set up the frames --
-        self.subframes = OrderedDict()
-        self.toggledframes = OrderedDict()
-        if 'frames' in yamldict:
-            for frame in yamldict['frames']:
-                name = frame['name']
-                if 'tab' in frame:
-                    tab  = self.notebook.tab(frame['tab'])
-                elif 'frame' in frame:
-                    tab  = self.subframes[frame['frame']]
-                else:
-                    print('frame %s does not have tab or frame specification')
-                    sys.exit(1)
-                toggled = True if (('toggled' in frame) and frame['toggled']) else False
-                kwargs = {} if 'kwargs' not in frame else frame['kwargs']
-                if toggled:
-                    title = '' if ('title' not in frame) else frame['title']
-                    state = 0 if ('initstate' not in frame) else frame['initstate']
-                    self.toggledframes[name] = ToggledFrame(tab, text=title, 
-                                                            relief="raised", 
-                                                            initstate=state,
-                                                            borderwidth=1)
-                    self.subframes[name] = self.toggledframes[name].sub_frame
-                    subframelayout = self.toggledframes[name].title_frame
-                else:
-                    self.subframes[name] = Tk.LabelFrame(tab, **kwargs)
-                    subframelayout = self.subframes[name]
-                col = 0 if 'col' not in frame else frame['col']
-                if 'row' in frame:
-                    subframelayout.grid(column=col, row=frame['row'],
-                                        padx=10,pady=10, 
-                                        columnspan=4, sticky='w')
-                else:
-                    subframelayout.grid(column=col, padx=10,pady=10,
-                                            columnspan=4, sticky='w') 
-                if ('title' in frame) and (not toggled):
-                    Tk.Label(subframelayout, 
-                             text=frame['title']).grid(row=0, column=0, 
-                                                       columnspan=4,
-                                                       sticky='w')
-                #print('Done with frame '+name)
-
-        # -- Set up the input widgets --
-        self.inputvars = OrderedDict()
+        self.subframes           = OrderedDict()
+        self.toggledframes       = OrderedDict()
+        self.inputvars           = OrderedDict()
+        self.listboxpopupwindict = OrderedDict()
+        self.popup_storteddata   = OrderedDict()
+        self.buttonwidgets       = OrderedDict()
+        self.dirtytracker = dirtytracker(self, self.inputvars,
+                                         self.listboxpopupwindict, yamldict)
+        self.searchindex  = searchindex(yamldict)
+        self.computed     = computedinputs(self, self.inputvars, yamldict)
+        self.dirtytracker.listeners.append(self.computed.onchange)
+        self.workspace    = workspace(self)
+        self.exportcache  = {}
+        self.schemahash   = None
+        self.plotcache    = lrucache(plotcachesize)
+        self.plotinputmap = {}
+        self.deckcache    = None
+        if deckcachedir is not None:
+            self.deckcache = deckcache(deckcachedir, maxbytes=deckcachesize)
+
+        # -- Collect everything to build, in schema order --
+        # Each task is (tab name, function taking the grid layout)
+        buildtasks = []
+        frametab   = {}
+        for frame in getdictval(yamldict, 'frames', []):
+            if 'tab' in frame:     frametab[frame['name']] = frame['tab']
+            elif 'frame' in frame: frametab[frame['name']] = frametab[frame['frame']]
+            buildtasks.append((getdictval(frametab, frame['name'], None),
+                               partial(self.makeframe, frame)))
+        itemtab = lambda d: frametab[d['frame'].split()[0]] if 'frame' in d \
+                  else getdictval(d, 'tab', None)
+        # Contents of collapsed toggled frames are built when first shown
+        self.deferredbuild = OrderedDict()
+        lazyframe = findlazyframes(getdictval(yamldict, 'frames', []),
+                                   getdictval(yamldict, 'listboxpopupwindows',
+                                              []),
+                                   yamldict['inputwidgets']) \
+                    if lazyframes else {}
         for widget in yamldict['inputwidgets']:
-            name  = widget['name']
-            frame = self.tabframeselector(widget)
-            iwidget = inputwidget.fromdict(frame, widget, parent=self,
-                                           allframes=self.subframes,
-                                           allinputs=self.inputvars)
-            self.inputvars[name] = iwidget
-        
-        # -- Set up the listbox pop-up windows --
-        if 'listboxpopupwindows' in yamldict:
-            self.listboxpopupwindict = OrderedDict()
-            for listboxdict in yamldict['listboxpopupwindows']:
-                frame  = self.tabframeselector(listboxdict)
-                name   = listboxdict['name']
-                popupdict = yamldict['popupwindow'][listboxdict['popupinput']]
-                self.listboxpopupwindict[name] = listboxpopupwindows(self, frame, listboxdict, popupdict)
-
+            lazy = itemlazyframe(widget, lazyframe)
+            if lazy is not None:
+                self.deferredbuild.setdefault(lazy, []).append(
+                    partial(self.makeinputwidget, widget))
+                buildtasks.append((itemtab(widget),
+                                   partial(self.makeinputwidget, widget,
+                                           placeholder=True)))
+                continue
+            buildtasks.append((itemtab(widget),
+                               partial(self.makeinputwidget, widget)))
+        for listboxdict in getdictval(yamldict, 'listboxpopupwindows', []):
+            buildtasks.append((itemtab(listboxdict),
+                               partial(self.makelistboxpopup, listboxdict)))
         # -- Initialize the startup pop-up windows --
-        self.popup_storteddata = OrderedDict()
         if 'popupwindow' in yamldict:
             for key, win in yamldict['popupwindow'].items():
                 if win['loadonstart'] == True:
                     self.popup_storteddata[key] = OrderedDict()
-                    if withdraw: self.launchpopupwin(key, hidden=True)
-
-        # -- Set up the buttons --
-        if 'buttons' in yamldict:
-            for button in yamldict['buttons']:
-                frame = self.tabframeselector(button)
-                text  = button['text']
-                cmdstr= button['command']
-                kwargs= getdictval(button, 'buttonoptions', {})
-                b  = Tk.Button(master=frame, text=text, command=eval(cmdstr), 
-                               **kwargs)
-                # Set up the grid layout
-                col = getdictval(button, 'col', 0)
-                gridopts = getdictval(button, 'gridoptions',{})
-                if 'row' in button:          gridopts['row'] = button['row']
-                if 'sticky' not in gridopts: gridopts['sticky'] = 'w'
-                if 'padx'   not in gridopts: gridopts['padx']   = 5
-                b.grid(column=col, **gridopts)
-                # Add a tool tip
-                if 'help' in button:
-                    CreateToolTip(b, button['help'])
-
-        # link any widgets necessary
-        for key,  inputvar in self.inputvars.items():
-            if self.inputvars[key].ctrlelem is not None:
-                self.inputvars[key].linkctrlelem(self.subframes, self.inputvars)
-                self.inputvars[key].onoffctrlelem(None)
+                    if withdraw:
+                        buildtasks.append((None, lambda layout, key=key:
+                                           self.launchpopupwin(key,
+                                                               hidden=True)))
+        for button in getdictval(yamldict, 'buttons', []):
+            lazy = itemlazyframe(button, lazyframe)
+            if lazy is not None:
+                self.deferredbuild.setdefault(lazy, []).append(
+                    partial(self.makebutton, button))
+                continue
+            buildtasks.append((itemtab(button),
+                               partial(self.makebutton, button)))
+
+        # -- Build the widgets --
+        self.bulklayout       = bulklayout
+        self.buildtimeslice   = buildtimeslice
+        self.progresscallback = progresscallback
+        self.buildcomplete    = False
+        self.buildafterid     = None
+        self.linkedctrl       = set()
+        self.buildtotal       = len(buildtasks)
+        self.buildqueue       = deque()
+        if progressive:
+            # Build the first tab now and queue the rest for idle time
+            firsttab = self.alltabslist[0] if self.alltabslist else None
+            first    = [t[1] for t in buildtasks if t[0]==firsttab]
+            self.buildqueue.extend([t[1] for t in buildtasks
+                                    if t[0]!=firsttab])
+            self.runbuildtasks(first)
+            self.linkctrlelems(onlyready=True)
+            self.reportbuildprogress()
+            self.buildafterid = self.after_idle(self.buildchunk)
+        else:
+            self.buildqueue.extend([t[1] for t in buildtasks])
+            self.finishbuild()
+        self.schemawatcher = None
+        if watchschema:
+            self.schemawatcher = schemawatcher(self, self.getschemafiles,
+                                               self.reloadschema,
+                                               interval=watchinterval)
+        # Optional JSON-RPC server for scripts
+        self.rpcserver = None
+        if rpcsocket is not None:
+            self.rpcserver = rpcserver(self, path=rpcsocket)
+        elif rpcport is not None:
+            self.rpcserver = rpcserver(self, port=rpcport)
 
         # -- Button demonstrating pullvals --
         # button = Tk.Button(master=self.notebook.tab('Tab 1'),text="Pullvals", 
@@ -1535,9 +5054,409 @@ class App(Tk.Tk, object):
 
         # Test the list box populate command
         #listboxpopupwindict['listboxpopup1'].populatefromdict(yamldict['setlistboxfromdict']['listboxpopup1'])
-        self.formatgridrows()
         return
 
+    def makeframe(self, frame, layout=None):
+        name = frame['name']
+        if 'tab' in frame:
+            tab  = self.notebook.tab(frame['tab'])
+        elif 'frame' in frame:
+            tab  = self.subframes[frame['frame']]
+        else:
+            print('frame %s does not have tab or frame specification'%name)
+            sys.exit(1)
+        toggled = True if (('toggled' in frame) and frame['toggled']) else False
+        kwargs = {} if 'kwargs' not in frame else frame['kwargs']
+        if toggled:
+            title = '' if ('title' not in frame) else frame['title']
+            state = 0 if ('initstate' not in frame) else frame['initstate']
+            self.toggledframes[name] = ToggledFrame(tab, text=title, 
+                                                    relief="raised", 
+                                                    initstate=state,
+                                                    borderwidth=1)
+            self.toggledframes[name].framename = name
+            self.subframes[name] = self.toggledframes[name].sub_frame
+            subframelayout = self.toggledframes[name].title_frame
+            if name in self.deferredbuild:
+                self.toggledframes[name].onfirstshow = \
+                    partial(self.buildtoggledframe, name)
+        else:
+            self.subframes[name] = Tk.LabelFrame(tab, **kwargs)
+            subframelayout = self.subframes[name]
+        col = 0 if 'col' not in frame else frame['col']
+        gridwidget(subframelayout, layout, 
+                   row=getdictval(frame, 'row', None), column=col,
+                   padx=10, pady=10, columnspan=4, sticky='w')
+        if ('title' in frame) and (not toggled):
+            gridwidget(Tk.Label(subframelayout, text=frame['title']),
+                       layout, row=0, column=0, columnspan=4, sticky='w')
+
+    def makeinputwidget(self, widget, layout=None, placeholder=False):
+        name = widget['name']
+        spec = inputspec.fromdict(widget)
+        if placeholder:
+            # The frame may have been expanded and built already
+            if isinstance(self.inputvars.get(name, None), inputwidget) and \
+               not isinstance(self.inputvars[name], placeholderwidget):
+                return
+            self.inputvars[name] = placeholderwidget.fromspec(None, spec,
+                                                  parent=self,
+                                                  allframes=self.subframes,
+                                                  allinputs=self.inputvars)
+            return
+        # Pick up the current value if this replaces a placeholder
+        kwargs = {}
+        if isinstance(self.inputvars.get(name, None), placeholderwidget):
+            kwargs = self.inputvars[name].builddefaults()
+        frame = self.tabframeselector(widget)
+        iwidget = inputwidget.fromspec(frame, spec, parent=self,
+                                       allframes=self.subframes,
+                                       allinputs=self.inputvars,
+                                       layout=layout, **kwargs)
+        self.inputvars[name] = iwidget
+        self.dirtytracker.register(iwidget)
+        source = getdictval(widget, 'optionsource', None)
+        if source in self.listboxpopupwindict:
+            iwidget.linkcollection(self.listboxpopupwindict[source])
+
+    def buildtoggledframe(self, name):
+        """
+        Builds the deferred contents of the toggled frame name
+        """
+        tasks = self.deferredbuild.pop(name, [])
+        if len(tasks)<1: return
+        self.runbuildtasks(tasks)
+        # Relink so the controls point at the real widgets
+        self.linkedctrl.clear()
+        self.linkctrlelems(onlyready=not self.buildcomplete)
+
+    def makelistboxpopup(self, listboxdict, layout=None):
+        frame  = self.tabframeselector(listboxdict)
+        name   = listboxdict['name']
+        popupdict = self.yamldict['popupwindow'][listboxdict['popupinput']]
+        self.listboxpopupwindict[name] = listboxpopupwindows(self, frame,
+                                                             listboxdict,
+                                                             popupdict,
+                                                             layout=layout)
+        # Link the listbox inputs which take their options from it
+        for widget in getdictval(self.yamldict, 'inputwidgets', []):
+            if getdictval(widget, 'optionsource', None) != name: continue
+            iwidget = self.inputvars.get(widget['name'], None)
+            if (iwidget is not None) and \
+               not isinstance(iwidget, placeholderwidget):
+                iwidget.linkcollection(self.listboxpopupwindict[name])
+
+    def makebutton(self, button, layout=None):
+        frame = self.tabframeselector(button)
+        text  = button['text']
+        cmdstr= button['command']
+        kwargs= getdictval(button, 'buttonoptions', {})
+        if id(button) in self.compiledcommands:
+            command = self.compiledcommands[id(button)](self)
+        else:
+            command = eval(evalcode(cmdstr))
+        b  = Tk.Button(master=frame, text=text, **kwargs)
+        b.recordkey = schemaitemkey(button)
+        b.configure(command=recordedcommand(b, command))
+        self.buttonwidgets[schemaitemkey(button)] = b
+        # Set up the grid layout
+        col = getdictval(button, 'col', 0)
+        gridopts = getdictval(button, 'gridoptions',{})
+        if 'row' in button:          gridopts['row'] = button['row']
+        if 'sticky' not in gridopts: gridopts['sticky'] = 'w'
+        if 'padx'   not in gridopts: gridopts['padx']   = 5
+        gridwidget(b, layout, column=col, **gridopts)
+        # Add a tool tip
+        if 'help' in button:
+            CreateToolTip(b, button['help'])
+
+    def getschemafiles(self):
+        """Returns the schema files to watch"""
+        configyaml, localconfigdir, scriptpath = self.schemaargs
+        overlays = localconfigfiles(localconfigdir)
+        return [f for f in self.schemasources if f not in overlays] + overlays
+
+    def onfindkey(self, event):
+        """Ctrl+F opens the search window, unless typing in a text field"""
+        # Text and Entry have their own Ctrl+F (cursor forward)
+        if isinstance(event.widget, Tk.Misc) and \
+           event.widget.winfo_class() in textwidgetclasses:
+            return
+        searchwindow(self)
+        return "break"
+
+    def destroyinput(self, name):
+        """Removes input name and destroys its Tk widgets"""
+        iwidget = self.inputvars.pop(name)
+        if isinstance(iwidget, placeholderwidget): return
+        for attr in ('tklabel', 'tkentry', 'yscroll', 'button'):
+            items = getattr(iwidget, attr)
+            for item in (items if isinstance(items, list) else [items]):
+                # ScrolledText lives in its own frame
+                item = getattr(item, 'frame', item)
+                if isinstance(item, Tk.Misc): item.destroy()
+
+    def destroyframe(self, name):
+        """Destroys frame name (and everything in it)"""
+        if name in self.toggledframes:
+            self.toggledframes.pop(name).destroy()
+        elif name in self.subframes:
+            self.subframes[name].destroy()
+        self.subframes.pop(name, None)
+
+    def reloadschema(self):
+        """
+        Reloads the schema files, then destroys and rebuilds only the
+        frames, inputs, buttons and listboxes which changed.  Inputs which
+        are rebuilt keep their current values.  Changes to the tabs need
+        a restart.
+        """
+        configyaml, localconfigdir, scriptpath = self.schemaargs
+        newdict, sources = loadschema(configyaml, localconfigdir, scriptpath)
+        # Check the computed inputs before anything is taken down
+        computedinputs(self, self.inputvars, newdict)
+        olddict = self.yamldict
+        if canonicaljson(plainyaml(getdictval(newdict, 'tabs', []))) != \
+           canonicaljson(plainyaml(getdictval(olddict, 'tabs', []))):
+            print("The tabs changed, restart to see them")
+        # Build everything still deferred so every input has real widgets
+        self.finishbuild()
+        for name in list(self.deferredbuild): self.buildtoggledframe(name)
+        vals = bulkgetvals(self.inputvars)
+
+        frameadd, framedel, framechg = diffschema(olddict, newdict, 'frames')
+        inputadd, inputdel, inputchg = diffschema(olddict, newdict, 'inputwidgets')
+        buttonadd, buttondel, buttonchg = diffschema(olddict, newdict, 'buttons')
+        lboxadd, lboxdel, lboxchg = diffschema(olddict, newdict,
+                                               'listboxpopupwindows')
+        # Frames nested in a changed frame get rebuilt too
+        rebuildframes = set(framedel+framechg)
+        newframes = getdictval(newdict, 'frames', [])
+        oldframes = getdictval(olddict, 'frames', [])
+        for frames in (oldframes, newframes):
+            for frame in frames:
+                if getdictval(frame, 'frame', None) in rebuildframes:
+                    rebuildframes.add(frame['name'])
+        inframe = lambda d: (d['frame'].split()[0] in rebuildframes) \
+                  if 'frame' in d else False
+        newitems = lambda section, names: [d for d in getdictval(newdict, section, [])
+                                           if (schemaitemkey(d) in names) or inframe(d)]
+        inputs    = newitems('inputwidgets', inputadd+inputchg)
+        buttons   = newitems('buttons', buttonadd+buttonchg)
+        listboxes = newitems('listboxpopupwindows', lboxadd+lboxchg)
+
+        # -- Take down the old widgets --
+        oldrows = {}
+        for d in getdictval(olddict, 'inputwidgets', []):
+            name = d['name']
+            if (name in inputdel+inputchg) or inframe(d):
+                if name not in self.inputvars: continue
+                tklabel = self.inputvars[name].tklabel
+                if isinstance(tklabel, Tk.Misc) and tklabel.winfo_manager():
+                    oldrows[name] = tklabel.grid_info()['row']
+                self.destroyinput(name)
+        for d in getdictval(olddict, 'buttons', []):
+            key = schemaitemkey(d)
+            if ((key in buttondel+buttonchg) or inframe(d)) and \
+               (key in self.buttonwidgets):
+                self.buttonwidgets.pop(key).destroy()
+        entries = {}
+        for d in getdictval(olddict, 'listboxpopupwindows', []):
+            name = d['name']
+            if ((name in lboxdel+lboxchg) or inframe(d)) and \
+               (name in self.listboxpopupwindict):
+                entries[name] = self.listboxpopupwindict[name].alldataentries
+                self.listboxpopupwindict.pop(name).destroy()
+        for frame in oldframes:
+            if frame['name'] in rebuildframes: self.destroyframe(frame['name'])
+
+        # -- Build the new ones --
+        inputspec.evictschema(olddict)
+        inputspec.internschema(newdict)
+        self.yamldict = newdict
+        self.schemasources = sources
+        layout = gridlayout() if self.bulklayout else None
+        for frame in newframes:
+            if (frame['name'] in frameadd) or (frame['name'] in rebuildframes):
+                self.makeframe(frame, layout)
+        for d in inputs:
+            # Keep the rebuilt inputs where they were
+            if ('row' not in d) and (d['name'] in oldrows):
+                d = dict(d, row=oldrows[d['name']])
+            self.makeinputwidget(d, layout)
+        # Put inputvars back in schema order, so the exports keep theirs
+        order = [d['name'] for d in newdict['inputwidgets']
+                 if d['name'] in self.inputvars]
+        inorder = set(order)
+        items = [(name, self.inputvars[name]) for name in order] + \
+                [(k, v) for k, v in self.inputvars.items() if k not in inorder]
+        self.inputvars.clear()
+        self.inputvars.update(items)
+        for d in listboxes:
+            self.makelistboxpopup(d, layout)
+            if d['name'] in entries:
+                self.listboxpopupwindict[d['name']].alldataentries.update(entries[d['name']])
+                self.listboxpopupwindict[d['name']].rebuildlist()
+        for d in buttons: self.makebutton(d, layout)
+        if layout is not None: layout.apply()
+        # Listboxes which were kept use the new popup definitions
+        for name, listbox in self.listboxpopupwindict.items():
+            popupinput = listbox.listboxdict['popupinput']
+            listbox.popupwindict = newdict['popupwindow'][popupinput].copy()
+
+        # -- Put back the values and controls --
+        for d in inputs:
+            name = d['name']
+            if (name in vals) and (vals[name] is not None):
+                try:
+                    self.inputvars[name].setval(vals[name], forcechange=True)
+                except Exception as e:
+                    print("Could not keep the value of %s: %s"%(name, repr(e)))
+        self.linkedctrl.clear()
+        self.linkctrlelems()
+        self.dirtytracker.setschema(newdict)
+        self.searchindex = searchindex(newdict)
+        self.plotinputmap.clear()
+        self.computed.setschema(newdict)
+        self.computed.recompute()
+        # New inputs start from their defaults in every case
+        for name in inputadd:
+            if (name in self.inputvars) and not self.inputvars[name].labelonly:
+                self.workspace.defaults[name] = self.inputvars[name].getval()
+        self.exportcache.clear()
+        self.schemahash = None
+        return
+
+    def showframes(self, frame):
+        """
+        Expands the toggled frames around frame, building their contents
+        if needed
+        """
+        for f in reversed(self.dirtytracker.framechain(frame)):
+            if f in self.toggledframes:
+                if not self.toggledframes[f].show.get():
+                    self.toggledframes[f].setstate(1)
+            self.buildtoggledframe(f)
+
+    def showwidget(self, tab, widget):
+        """Selects tab, scrolls to widget and focuses it"""
+        if tab is not None:
+            self.notebook.select(str(self.notebook.tab(tab)))
+            self.update_idletasks()
+            self.notebook.tab(tab).scrollto(widget)
+        widget.focus_set()
+
+    def jumpto(self, name, popup=None):
+        """
+        Shows the input name: selects its tab, expands the toggled frames
+        it is in, scrolls to it and focuses it.  Inputs of the pop-up
+        window popup go to the listbox using that pop-up, or open it.
+        """
+        self.finishbuild()
+        if popup is not None: return self.jumptopopup(name, popup)
+        if name not in self.inputvars: return
+        frame, tab = self.dirtytracker.inputframe.get(name, (None, None))
+        self.showframes(frame)
+        iwidget = self.inputvars[name]
+        entries = iwidget.tkentry if isinstance(iwidget.tkentry, list) \
+                  else [iwidget.tkentry]
+        targets = [w for w in entries+[iwidget.tklabel]
+                   if isinstance(w, Tk.Misc)]
+        if len(targets)<1: return
+        self.showwidget(self.dirtytracker.frametab(frame, tab), targets[0])
+        return iwidget
+
+    def jumptopopup(self, name, popup):
+        for listbox in self.listboxpopupwindict.values():
+            if listbox.listboxdict['popupinput'] != popup: continue
+            frame = getdictval(listbox.listboxdict, 'frame', None)
+            frame = None if frame is None else frame.split()[0]
+            self.showframes(frame)
+            self.showwidget(self.dirtytracker.frametab(frame,
+                                getdictval(listbox.listboxdict, 'tab', None)),
+                            listbox.tkentry)
+            return listbox
+        if popup not in self.popup_storteddata: return
+        win = self.launchpopupwin(popup)
+        for f in list(win.deferredbuild): win.buildtoggledframe(f)
+        for f in win.popup_toggledframes.values(): f.setstate(1)
+        iwidget = win.temp_inputvars.get(name, None)
+        entry   = None if iwidget is None else iwidget.tkentry
+        if isinstance(entry, list): entry = entry[0]
+        if isinstance(entry, Tk.Misc):
+            if win.scrollframe: win.scrolledframe.scrollto(entry)
+            entry.focus_set()
+        return win
+
+    def runbuildtasks(self, tasks):
+        layout = gridlayout() if self.bulklayout else None
+        for task in tasks: task(layout)
+        if layout is not None: layout.apply()
+
+    def buildchunk(self):
+        """
+        Build queued widgets for up to buildtimeslice seconds, then
+        reschedule so the event loop can run in between
+        """
+        self.buildafterid = None
+        if self.buildcomplete: return
+        tstart = time.time()
+        layout = gridlayout() if self.bulklayout else None
+        while self.buildqueue and (time.time()-tstart < self.buildtimeslice):
+            self.buildqueue.popleft()(layout)
+        if layout is not None: layout.apply()
+        if self.buildqueue:
+            self.linkctrlelems(onlyready=True)
+            self.reportbuildprogress()
+            self.buildafterid = self.after(1, self.buildchunk)
+        else:
+            self.completebuild()
+
+    def finishbuild(self):
+        """
+        Build anything still queued right away
+        """
+        if self.buildcomplete: return
+        if self.buildafterid is not None:
+            self.after_cancel(self.buildafterid)
+            self.buildafterid = None
+        tasks = list(self.buildqueue)
+        self.buildqueue.clear()
+        self.runbuildtasks(tasks)
+        self.completebuild()
+
+    def completebuild(self):
+        self.buildcomplete = True
+        self.linkctrlelems()
+        self.computed.recompute()
+        if self.workspace.defaults is None: self.workspace.setdefaults()
+        self.workspace.refreshmenu()
+        self.formatgridrows()
+        self.reportbuildprogress()
+
+    def reportbuildprogress(self):
+        if self.progresscallback is not None:
+            self.progresscallback(self.buildtotal-len(self.buildqueue),
+                                  self.buildtotal)
+
+    def linkctrlelems(self, onlyready=False):
+        """
+        Link any widgets with ctrlelem.  If onlyready, link only the ones
+        whose frames and inputs have been built.
+        """
+        for key,  inputvar in self.inputvars.items():
+            if inputvar.ctrlelem is None: continue
+            if onlyready:
+                if key in self.linkedctrl: continue
+                targets = [(elem['frame'], self.subframes) if 'frame' in elem
+                           else (getdictval(elem, 'input', None),
+                                 self.inputvars)
+                           for elem in inputvar.spec.ctrlelem]
+                if not all(t in d for t, d in targets): continue
+            inputvar.linkctrlelem(self.subframes, self.inputvars)
+            inputvar.onoffctrlelem(None)
+            self.linkedctrl.add(key)
+
     def tabframeselector(self, d):
         if 'frame' in d:  
             framename = d['frame'].split()
@@ -1563,9 +5482,11 @@ class App(Tk.Tk, object):
                 tab.grid_rowconfigure(n, minsize=minsize)
 
     def refresh_popupwindow_listbox(self, listboxpopuptarget):
+        self.finishbuild()
         return self.listboxpopupwindict[listboxpopuptarget].getitemlist()
 
     def mirrorinputs(self, source, target):
+        self.finishbuild()
         # Get the input 
         val=self.inputvars[source].getval()
         self.inputvars[target].setval(val)
@@ -1573,6 +5494,7 @@ class App(Tk.Tk, object):
     def getoutputdefdict(self, tag, allinputs=None):
         tagdict = OrderedDict()
         if allinputs is None:
+            self.finishbuild()
             allinputs=self.inputvars
         for key, inputvar in allinputs.items():
             if tag in inputvar.outputdef:
@@ -1580,18 +5502,66 @@ class App(Tk.Tk, object):
                 tagdict[outputkey] = allinputs[key]
         return tagdict
 
+    @recorded('setinputfromdict')
     def setinputfromdict(self, tag, inputdict):
         extradict=inputdict.copy()
         # Get the dictionary
         tagdict = self.getoutputdefdict(tag)
+        items   = []
         for key, item in inputdict.items():
             if key in tagdict:
-                tagdict[key].setval(item, 
-                                    strinput=isinstance(item,str),
-                                    forcechange=True)
+                items.append((tagdict[key], item, isinstance(item,str)))
                 extradict.pop(key)
+        bulksetvals(items, forcechange=True)
         return extradict  # Return any unused entries
 
+    @recorded('setinputfromstrdict')
+    def setinputfromstrdict(self, tag, strdict, forcechange=True):
+        """
+        Sets the inputs and listbox pop-up entries from strdict, a dict of
+        key: valuestring pairs (e.g., from parseinputfile()).  Values are
+        converted using the inputtype of the matching outputdef tags.
+        Returns a dict of the unused entries.
+        """
+        self.finishbuild()
+        extradict = OrderedDict(strdict)
+        # Convert the main inputs
+        tagdict   = self.getoutputdefdict(tag)
+        inputdict = OrderedDict()
+        for key, inp in tagdict.items():
+            if key in extradict:
+                inputdict[key] = convertinputstr(inp.inputtype,
+                                                 extradict.pop(key),
+                                                 inp.arrayopt)
+        # Pull out the listbox pop-up entries
+        listboxdata = OrderedDict()
+        for name, listbox in self.listboxpopupwindict.items():
+            if 'dynamicprefixkey' in listbox.listboxdict: continue
+            listboxdata[name] = listbox.extractfromdict(tag, extradict)
+        for name, listbox in self.listboxpopupwindict.items():
+            if 'dynamicprefixkey' not in listbox.listboxdict: continue
+            listboxdata[name] = listbox.extractfromdict(tag, extradict)
+        # Apply everything
+        self.setinputfromdict(tag, inputdict)
+        for name, entries in listboxdata.items():
+            if len(entries)>0:
+                self.listboxpopupwindict[name].populatefromdict(entries,
+                                                    forcechange=forcechange)
+        return extradict  # Return any unused entries
+
+    @recorded('loadinputfile')
+    def loadinputfile(self, inputfile, tag, verbose=False):
+        """
+        Loads a key = value input file into the GUI using the outputdef
+        tags.  Returns a dict of the unused entries.
+        """
+        extradict = self.setinputfromstrdict(tag,
+                                             OrderedDict(parseinputfile(inputfile)))
+        if verbose:
+            for key, val in extradict.items():
+                print("Unused input: %s = %s"%(key, val))
+        return extradict
+
     def onconfigure(self,event=None):
         # Clear and resize figure
         canvaswidget=self.figcanvas.get_tk_widget()
@@ -1611,13 +5581,17 @@ class App(Tk.Tk, object):
         self.fig.clf()
         ax=self.fig.add_subplot(111)
         ax.clear()
-        t   = np.arange(0, 3, .01)
-        ax.plot(t, t+input1)
+        t, y = self.plotdata('updateplot', self.plotcurve, ['input_1'])
+        ax.plot(t, y)
         ax.set_title('replot i='+repr(input1))
         #self.figcanvas.draw()
         #self.figcanvas.show()
         return
 
+    def plotcurve(self):
+        t = np.arange(0, 3, .01)
+        return t, t+self.inputvars['input_1'].getval()
+
     def menubar(self, root):
         """ 
         Adds a menu bar to root
@@ -1636,6 +5610,24 @@ class App(Tk.Tk, object):
         filemenu.add_command(label="Exit", command=root.quit)
         menubar.add_cascade(label="File", menu=filemenu)
 
+        # Edit menu
+        editmenu = Tk.Menu(menubar, tearoff=0)
+        editmenu.add_command(label="Find input...", accelerator="Ctrl+F",
+                             command=partial(searchwindow, root))
+        menubar.add_cascade(label="Edit", menu=editmenu)
+
+        # Cases menu, the cases are listed after the separator
+        self.casemenu = Tk.Menu(menubar, tearoff=0)
+        self.casemenu.add_command(label="New case",
+                                  command=lambda: root.workspace.switch(
+                                      root.workspace.new()))
+        self.casemenu.add_command(label="Duplicate case",
+                                  command=lambda: root.workspace.duplicate())
+        self.casemenu.add_command(label="Delete case",
+                                  command=lambda: root.workspace.delete())
+        self.casemenu.add_separator()
+        menubar.add_cascade(label="Cases", menu=self.casemenu)
+
         # Help menu
         helpmenu = Tk.Menu(menubar, tearoff=0)
         helpmenu.add_command(label="Help Index", command=partial(donothing, root))
@@ -1650,24 +5642,178 @@ class App(Tk.Tk, object):
         val = inp.getval()
         return val
 
-    def getDictFromInputs(self, tag, onlyactive=True):
+    @recorded('getDictFromInputs')
+    def getDictFromInputs(self, tag, onlyactive=True, incremental=False):
         """
-        Create a dict based on tag in outputdefs
+        Create a dict based on tag in outputdefs.  With incremental=True,
+        only the inputs changed since the last incremental call are
+        re-read, and the dict from that call is patched and returned (so
+        don't modify it).
         """
+        self.finishbuild()
+        if incremental: return self.patchinputdict(tag, onlyactive)
         output = OrderedDict()
+        vals, active = bulkgetvals(self.inputvars, getactive=True)
         for key, var in self.inputvars.items():
-            if (not var.isactive()) and onlyactive: 
+            if (not active[key]) and onlyactive: 
                 #print("Skipping "+key)
                 continue
             if tag in var.outputdef:
                 outputkey = var.outputdef[tag]
-                output[outputkey] = self.getInputVal(var)
+                output[outputkey] = exportval(vals[key])
         return output
 
+    def patchinputdict(self, tag, onlyactive=True):
+        """
+        Updates the cached getDictFromInputs() output for tag with the
+        inputs which changed since the last call
+        """
+        ckey    = (tag, onlyactive)
+        cache   = self.exportcache.get(ckey, None)
+        tracker = self.dirtytracker
+        if cache is None:
+            cache = {'stamp':0, 'parts':{}, 'output':OrderedDict()}
+            self.exportcache[ckey] = cache
+            names = list(self.inputvars.keys())
+        else:
+            names = tracker.dirtyinputs(cache['stamp'])
+            if len(names)<1: return cache['output']
+            # mergedboollists follow their bool inputs
+            names += [key for key, var in self.inputvars.items()
+                      if var.inputtype == moretypes.mergedboollist]
+        cache['stamp'] = tracker.stamp
+        subset = OrderedDict([(key, self.inputvars[key]) for key in names
+                              if key in self.inputvars])
+        vals, active = bulkgetvals(subset, getactive=True)
+        parts   = cache['parts']
+        newkeys = False
+        for key, var in subset.items():
+            part = None
+            if (active[key] or not onlyactive) and (tag in var.outputdef):
+                part = (var.outputdef[tag], exportval(vals[key]))
+            old  = parts.get(key, None)
+            if (old is None) or (part is None) or (old[0] != part[0]):
+                newkeys = newkeys or (old != part)
+            parts[key] = part
+        output = cache['output']
+        if newkeys:
+            # Keys came or went, rebuild in input order
+            output.clear()
+            for key in self.inputvars:
+                if parts.get(key, None) is not None:
+                    output[parts[key][0]] = parts[key][1]
+        else:
+            for key in subset:
+                if parts[key] is not None: output[parts[key][0]] = parts[key][1]
+        return output
+
+    def statehash(self):
+        """
+        Returns a hash of the schema, all input values and active flags, and
+        all listbox pop-up entries.  Each input and listbox is hashed on
+        its own, and only read and hashed again once the dirtytracker saw
+        it change, so code which writes alldataentries directly must call
+        markdirty() on the listbox.
+        """
+        self.finishbuild()
+        tracker = self.dirtytracker
+        if self.schemahash is None:
+            self.schemahash = contenthash(plainyaml(self.yamldict))
+            self.hashparts  = {'stamp':-1, 'inputs':{}, 'listboxes':{}}
+        parts = self.hashparts
+        since = parts['stamp']
+        if since == tracker.stamp: return parts['hash']
+        # Inputs which changed, or are new
+        hashes = parts['inputs']
+        dirty  = OrderedDict((name, w) for name, w in self.inputvars.items()
+                             if (name not in hashes) or
+                             (tracker.inputstamp.get(name, 0) > since))
+        if len(dirty)>0:
+            vals, active = bulkgetvals(dirty, getactive=True)
+            for name in dirty:
+                hashes[name] = contenthash([name, vals[name], active[name]])
+        # Listboxes with added, removed or changed entries
+        changed = set([name for (name, entry), stamp in tracker.entrystamp.items()
+                       if stamp > since])
+        lbhashes = parts['listboxes']
+        for name, listbox in self.listboxpopupwindict.items():
+            if (name in lbhashes) and (name not in changed) and \
+               (tracker.liststamp.get(name, 0) <= since):
+                continue
+            lbhashes[name] = contenthash([name,
+                                          list(listbox.alldataentries.items())])
+        parts['stamp'] = tracker.stamp
+        parts['hash']  = contenthash([self.schemahash,
+                                      [hashes[name] for name in self.inputvars],
+                                      [lbhashes[name] for name
+                                       in self.listboxpopupwindict]])
+        return parts['hash']
+
+    def cachedexport(self, func, *args, **kwargs):
+        """
+        Returns func(*args, **kwargs), an export of the current state (e.g.,
+        self.getDictFromInputs), from the deck cache if the same state was
+        exported the same way before
+        """
+        if self.deckcache is None: return func(*args, **kwargs)
+        key = contenthash([self.statehash(), funcid(func), args, kwargs])
+        result = self.deckcache.get(key)
+        if result is None:
+            # Return what a hit would, i.e., the JSON round trip of result
+            result = jsonroundtrip(func(*args, **kwargs))
+            self.deckcache.put(key, result)
+        return result
+
+    def plotinputs(self, depends):
+        """
+        Returns what depends (input names, outputdef keys or listbox pop-up
+        names) refer to, as a list of (input name, None) or (None, listbox
+        name)
+        """
+        key = tuple(depends)
+        if key not in self.plotinputmap:
+            outputkeys = {}
+            for name, iwidget in self.inputvars.items():
+                for tag, val in iwidget.outputdef.items():
+                    if tag != 'help': outputkeys.setdefault(str(val), name)
+            names = []
+            for dep in depends:
+                if dep in self.inputvars:  names.append((dep, None))
+                elif dep in outputkeys:    names.append((outputkeys[dep], None))
+                elif dep in self.listboxpopupwindict: names.append((None, dep))
+                else:
+                    raise ValueError("plotdata: %s is not an input, outputdef "
+                                     "key or listbox pop-up"%dep)
+            self.plotinputmap[key] = names
+        return self.plotinputmap[key]
+
+    def plotdata(self, name, func, depends, *args, **kwargs):
+        """
+        Returns func(*args, **kwargs), data for the plot name which only
+        reads what is in depends (input names, outputdef keys or listbox
+        pop-up names).  The results are cached by the current values of
+        those and the args, with the least recently used ones dropped, so
+        func only runs again when one of them changes.  Do not modify the
+        returned data.
+        """
+        vals = []
+        for inputname, listname in self.plotinputs(depends):
+            if inputname is not None:
+                vals.append(exportval(self.inputvars[inputname].getval()))
+            else:
+                entries = self.listboxpopupwindict[listname].alldataentries
+                vals.append(list(entries.items()))
+        key = contenthash([name, args, kwargs, vals])
+        if key in self.plotcache: return self.plotcache.get(key)
+        result = func(*args, **kwargs)
+        self.plotcache.put(key, result)
+        return result
+
     def getHelpFromInputs(self, outputtag, helptag, onlyactive=True):
         """
         Extract the help fields from inputs
         """
+        self.finishbuild()
         output = OrderedDict()
         for key, var in self.inputvars.items():
             if (not var.isactive()) and onlyactive: 
@@ -1678,9 +5824,19 @@ class App(Tk.Tk, object):
         return output
         
 
+    @recorded('launchpopupwin')
     def launchpopupwin(self, key, **kwargs):
         return popupwindow(self, self,  self.yamldict['popupwindow'][key], 
                            self.popup_storteddata[key], **kwargs)
+
+    def destroy(self):
+        # Stop the RPC server, so its socket file is removed
+        server = vars(self).get('rpcserver', None)
+        if server is not None:
+            server.stop()
+            self.rpcserver = None
+        if 'yamldict' in vars(self): inputspec.evictschema(self.yamldict)
+        super(App, self).destroy()
         
 if __name__ == "__main__":
     App().mainloop()